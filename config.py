@@ -15,6 +15,8 @@ STREAK_POINTS = 10
 COMBO_POINTS = 28
 
 OBSERVATION_N = BOARD_SIZE * BOARD_SIZE + MAX_SHAPE_SIZE * MAX_SHAPE_SIZE * 3 + 1
+# The number of actions: a shape choice and a location, as the entries of an action mask.
+ACTION_N = NUM_SHAPES * BOARD_SIZE * BOARD_SIZE
 
 # reward config
 REWARD_INVALID_SHAPE = -3
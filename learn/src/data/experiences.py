@@ -1,13 +1,75 @@
+import json
+import os
+from os import path
+from threading import Thread
+from typing import Any, Callable, Optional
+
 import numpy as np
 
-from jaxtyping import Float, Int, jaxtyped
+from jaxtyping import Bool, Float, Int
 
 import torch
-from typeguard import typechecked
-from woodoku.env import observation_space_d, action_space_d
+from numpy.typing import DTypeLike
+from learn.src.data.snapshot import map_arrays, prefetch_arrays, read_arrays, write_arrays
+from learn.src.typechecking import typecheck
+from woodoku.env import PACKED_OBSERVATION_N, Observation, observation_space_d, action_space_d
+
+# A state, action, reward and next state.
+Experience = tuple[
+    Float[np.ndarray, "*state"],  # type: ignore[type-arg]
+    Int[np.ndarray, "*action"],  # type: ignore[type-arg]
+    float,
+    Float[np.ndarray, "*state"],  # type: ignore[type-arg]
+]
+# Experiences stacked along a batch axis.
+ExperienceBatch = tuple[
+    Float[np.ndarray, "batch *observation_space_d"],  # type: ignore[type-arg]
+    Int[np.ndarray, "batch *action_space_d"],  # type: ignore[type-arg]
+    Float[np.ndarray, "batch"],  # type: ignore[type-arg]
+    Float[np.ndarray, "batch *observation_space_d"],  # type: ignore[type-arg]
+]
+
+
+def empty_batch(size: int) -> ExperienceBatch:
+    """Arrays to sample `size` experiences into, of the dtypes `sample_from_experience` returns."""
+    return (
+        np.empty((size, *observation_space_d)),
+        np.empty((size, *action_space_d), dtype=np.int_),
+        np.empty(size),
+        np.empty((size, *observation_space_d)),
+    )
+
+
+def _draw_distinct(draw: Callable[[int], np.ndarray], size: int) -> np.ndarray:  # type: ignore[type-arg]
+    """
+    Draw `size` distinct values, calling `draw(n)` for about n more at a time.
+
+    The values are kept in the order they are first drawn in, so taking the first `size` is still a uniform sample. This
+    takes O(size) as long as few draws repeat a value, unlike `np.random.choice(..., replace=False)` which takes O(n).
+    """
+    chosen = np.empty(0, dtype=np.int_)
+    while len(chosen) < size:
+        drawn = np.concatenate([chosen, draw(size - len(chosen))])
+        _, first = np.unique(drawn, return_index=True)
+        chosen = drawn[np.sort(first)]
+    return chosen[:size]
+
+
+def sample_distinct(stored: int, sample_size: int) -> Int[np.ndarray, "batch"]:  # type: ignore[type-arg]
+    """Choose `sample_size` distinct indices of `stored`, or all of them if there are fewer."""
+    sample_size = min(stored, sample_size)
+    if 2 * sample_size > stored:
+        # too many draws would repeat, a permutation of the few experiences is cheaper
+        indices: Int[np.ndarray, "batch"] = np.random.permutation(stored)[:sample_size]  # type: ignore[type-arg]
+        return indices
+    return _draw_distinct(lambda n: np.random.randint(stored, size=n), sample_size)
+
 
+# The file of a disk-backed buffer holding everything but its arrays, which are each in their own .npy file.
+_META_FILE = "meta.json"
 
-class ExperienceReplay:
+
+class ExperienceReplay:  # pylint: disable=too-many-instance-attributes
     """
     A class to store experiences replay buffer for WoodokuLearn reinforcement learning training.
 
@@ -18,64 +80,447 @@ class ExperienceReplay:
     Actions can be discrete here so we use int
     Rewards although discrete in this case, but we will need to operate reward with float, so we will use float from the start
 
+    Given a directory, the buffer is disk-backed: every array is a `np.memmap` of a .npy file in the directory, so the
+    buffer can be larger than RAM and the OS page cache keeps the hot parts in memory. Creating a buffer on a directory
+    that already holds one reopens it as of its last `flush`, to resume training.
+
+    Any buffer can also be saved to a snapshot directory and loaded back, see `save` and `load`.
+
     Attributes:
         length: The length of the buffer.
         index: The index to store the next experience.
         is_full: Whether the buffer is full.
+        directory: The directory of a disk-backed buffer, None if it is in memory.
         state: The state array.
         action: The action array.
         reward: The reward array.
         next_state: The next state array.
+        done: Whether each experience ended its episode, such that its next state is not to be bootstrapped from.
     """
 
-    def __init__(self, length: int) -> None:
+    # the attributes, besides the arrays, that a disk-backed buffer saves on flush
+    _persisted: tuple[str, ...] = ("index", "is_full")
+
+    def __init__(self, length: int, observation_dtype: DTypeLike = np.float64, directory: Optional[str] = None) -> None:
         self.length = length
         self.index = 0
         self.is_full = False
-        self.state = np.zeros((length, *observation_space_d))
-        self.action = np.zeros((length, *action_space_d), dtype=np.int_)
-        self.reward = np.zeros(length)
-        self.next_state = np.zeros((length, *observation_space_d))
+        self.directory = directory
+        self._arrays: dict[str, np.ndarray] = {}  # type: ignore[type-arg]
+        self._reopen = directory is not None and path.exists(path.join(directory, _META_FILE))
+        if directory is not None and self._reopen:
+            self._load_meta(directory)
+        elif directory is not None:
+            os.makedirs(directory, exist_ok=True)
+        self._allocate(observation_dtype)
+        if directory is not None and not self._reopen:
+            self.flush()
 
-    def collect(
-        self,
-        experience: tuple[  # type: ignore[type-arg]
-            Float[np.ndarray, "*state"],
-            Int[np.ndarray, "*action"],
-            float,
-            Float[np.ndarray, "*state"],
-        ],
-    ) -> None:
+    def _allocate(self, observation_dtype: DTypeLike) -> None:
+        """Allocate the arrays the experiences are stored in."""
+        self.state = self._zeros("state", (self.length, *observation_space_d), observation_dtype)
+        self.action = self._zeros("action", (self.length, *action_space_d), np.int_)
+        self.reward = self._zeros("reward", (self.length,), np.float64)
+        self.next_state = self._zeros("next_state", (self.length, *observation_space_d), observation_dtype)
+        self.done = self._zeros("done", (self.length,), bool)
+
+    def _zeros(self, name: str, shape: tuple[int, ...], dtype: DTypeLike) -> np.ndarray:  # type: ignore[type-arg]
+        """
+        A zeroed array, or the file `name`.npy of the directory mapped in memory if the buffer is disk-backed. The array
+        is registered for snapshots under `name`, which is also the attribute it is to be stored in.
+
+        Raises:
+            ValueError: If the buffer is reopened and the file holds an array of another shape or dtype.
+        """
+        self._arrays[name] = self._open_array(name, shape, dtype)
+        return self._arrays[name]
+
+    def _open_array(self, name: str, shape: tuple[int, ...], dtype: DTypeLike) -> np.ndarray:  # type: ignore[type-arg]
+        if self.directory is None:
+            return np.zeros(shape, dtype=dtype)
+        file = path.join(self.directory, f"{name}.npy")
+        if not self._reopen:
+            # the file is sparse, so nothing is written until experiences are
+            created: np.memmap = np.lib.format.open_memmap(  # type: ignore[no-untyped-call,type-arg]
+                file, mode="w+", dtype=dtype, shape=shape
+            )
+            return created
+        array: np.memmap = np.load(file, mmap_mode="r+")  # type: ignore[type-arg]
+        if array.shape != shape or array.dtype != np.dtype(dtype):
+            raise ValueError(
+                f"{file} holds a {array.dtype} array of shape {array.shape}, not {np.dtype(dtype)} {shape}"
+            )
+        return array
+
+    def _attach_arrays(self, arrays: dict[str, np.ndarray]) -> None:  # type: ignore[type-arg]
+        """Store experiences in `arrays` instead of the arrays of the same names."""
+        for name, array in arrays.items():
+            setattr(self, name, array)
+        self._arrays.update(arrays)
+
+    def flush(self) -> None:
+        """
+        Write a disk-backed buffer to its directory, such that reopening it resumes from here. Does nothing in memory.
+        """
+        if self.directory is None:
+            return
+        for array in self._arrays.values():
+            if isinstance(array, np.memmap):
+                array.flush()
+        self._write_meta(self.directory)
+
+    def save(self, directory: str, compress: bool = False) -> None:
+        """
+        Write a snapshot of the buffer to `directory`, one chunk of one array at a time, so that saving never holds a
+        second copy of the buffer in memory.
+
+        Args:
+            directory: The directory to write the snapshot in, created if needed.
+            compress: Whether to gzip the arrays. A compressed snapshot is smaller but cannot be loaded lazily.
+        """
+        write_arrays(self._arrays, directory, compress)
+        self._write_meta(directory)
+
+    def load(self, directory: str, lazy: bool = False) -> Optional[Thread]:
+        """
+        Restore the snapshot written by `save` in `directory`, which must be of a buffer of this type and length.
+
+        Args:
+            directory: The directory of the snapshot.
+            lazy: Whether to map the uncompressed snapshot copy-on-write instead of copying it in. The buffer can then
+                be sampled at once: its pages are read as sampling reaches them, while a thread reads them all in
+                ahead. The snapshot is never modified by what is collected afterwards. A disk-backed buffer cannot be
+                loaded lazily, as its files would never get the snapshot.
+
+        Returns:
+            The thread reading the snapshot in if lazy, otherwise None as the snapshot is already read in.
+
+        Raises:
+            ValueError: If the snapshot is of another type or length of buffer, or of arrays of other shapes or dtypes,
+                or if lazy and the buffer is disk-backed.
+        """
+        if lazy and self.directory is not None:
+            raise ValueError("a disk-backed buffer cannot be loaded lazily, its files would not get the snapshot")
+        self._load_meta(directory)
+        if not lazy:
+            read_arrays(self._arrays, directory)
+            return None
+        self._attach_arrays(map_arrays(self._arrays, directory))
+        return prefetch_arrays(self._arrays)
+
+    def _write_meta(self, directory: str) -> None:
+        meta: dict[str, Any] = {"type": type(self).__name__, "length": self.length}
+        meta.update({name: getattr(self, name) for name in self._persisted})
+        # write then rename, so that a crash never leaves a half written file
+        file = path.join(directory, _META_FILE)
+        with open(file + ".tmp", "w", encoding="utf-8") as meta_file:
+            json.dump(meta, meta_file)
+        os.replace(file + ".tmp", file)
+
+    def _load_meta(self, directory: str) -> None:
+        """
+        Raises:
+            ValueError: If the directory holds another type or length of buffer.
+        """
+        with open(path.join(directory, _META_FILE), encoding="utf-8") as meta_file:
+            meta = json.load(meta_file)
+        if (meta["type"], meta["length"]) != (type(self).__name__, self.length):
+            raise ValueError(
+                f"{directory} holds a {meta['type']} of length {meta['length']}, "
+                f"not a {type(self).__name__} of length {self.length}"
+            )
+        for name in self._persisted:
+            setattr(self, name, meta[name])
+
+    def __len__(self) -> int:
+        """The number of experiences that can be sampled."""
+        return self.length if self.is_full else self.index
+
+    def collect(self, experience: Experience, done: bool = False) -> None:
         state, action, reward, next_state = experience
         self.state[self.index] = state
         self.action[self.index] = action
         self.reward[self.index] = reward
         self.next_state[self.index] = next_state
+        self.done[self.index] = done
         # index wraps around such that old experience auto expire
         self.index = (self.index + 1) % self.length
         if self.index == 0:
             self.is_full = True
 
-    # NOTE: example of type annotation for jaxtyped function
-    @jaxtyped  # type: ignore[misc]
-    @typechecked
-    def sample_from_experience(
-        self, sample_size: int
-    ) -> tuple[
+    def collect_batch(
+        self, experiences: ExperienceBatch, dones: Optional[Bool[np.ndarray, "N"]] = None  # type: ignore[type-arg]
+    ) -> None:
+        """
+        Collect N experiences, such as one step of N environments, as N calls to `collect` would, but with one slice
+        assignment per array, or two where the block wraps around the end of the buffer.
+
+        Args:
+            experiences: The states, actions, rewards and next states, stacked.
+            dones: Whether each experience ended its episode, none did if None.
+        """
+        count = len(experiences[2])
+        # of a block longer than the buffer, only the last experiences would survive
+        skipped = max(count - self.length, 0)
+        first = (self.index + skipped) % self.length
+        head = min(count - skipped, self.length - first)
+        self._write_block(slice(first, first + head), slice(skipped, skipped + head), experiences, dones)
+        self._write_block(slice(0, count - skipped - head), slice(skipped + head, count), experiences, dones)
+
+        if self.index + count >= self.length:
+            self.is_full = True
+        self.index = (self.index + count) % self.length
+
+    def _write_block(
+        self,
+        slots: slice,
+        rows: slice,
+        experiences: ExperienceBatch,
+        dones: Optional[Bool[np.ndarray, "N"]],  # type: ignore[type-arg]
+    ) -> None:
+        states, actions, rewards, next_states = experiences
+        self.state[slots] = states[rows]
+        self.action[slots] = actions[rows]
+        self.reward[slots] = rewards[rows]
+        self.next_state[slots] = next_states[rows]
+        self.done[slots] = False if dones is None else dones[rows]
+
+    # NOTE: example of type annotation for jaxtyped function, see learn.src.typechecking to switch the checks off
+    @typecheck
+    def sample_from_experience(self, sample_size: int) -> tuple[
         Float[torch.Tensor, "batch *observation_space_d"],
         Int[torch.Tensor, "batch *action_space_d"],
         Float[torch.Tensor, "batch"],
         Float[torch.Tensor, "batch *observation_space_d"],
     ]:
-        if not self.is_full:
-            sample_size = min(self.index, sample_size)
-        sample_indices = np.random.choice(
-            self.index if not self.is_full else self.length,
-            size=sample_size,
-            replace=False,
+        state, action, reward, next_state = empty_batch(min(sample_size, len(self)))
+        self.sample_into((state, action, reward, next_state))
+        # the arrays are new, so the tensors can share their memory rather than copy it
+        return torch.from_numpy(state), torch.from_numpy(action), torch.from_numpy(reward), torch.from_numpy(next_state)
+
+    def sample_into(self, out: ExperienceBatch, done: Optional[Bool[np.ndarray, "batch"]] = None) -> int:  # type: ignore[type-arg]
+        """
+        Sample distinct experiences into the first rows of `out`, as many as it has rows or fewer if the buffer holds
+        fewer. The experiences are drawn in O(rows), whatever the length of the buffer.
+
+        Args:
+            out: The arrays to write into, such as reused ones from `empty_batch` or views of preallocated tensors.
+            done: An array to write whether each experience ended its episode into, if given.
+
+        Returns:
+            The number of experiences sampled.
+        """
+        indices = self._sample_indices(len(out[0]))
+        state, action, reward, next_state = out
+        count = len(indices)
+        self._gather(indices, (state[:count], action[:count], reward[:count], next_state[:count]))
+        if done is not None:
+            done[:count] = self.done[indices]
+        return count
+
+    def _sample_indices(self, sample_size: int) -> Int[np.ndarray, "batch"]:  # type: ignore[type-arg]
+        """Choose `sample_size` distinct experiences, or all of them if there are fewer."""
+        return sample_distinct(len(self), sample_size)
+
+    def _gather(self, indices: Int[np.ndarray, "batch"], out: ExperienceBatch) -> None:  # type: ignore[type-arg]
+        """Write the experiences at `indices` into `out`, converting them from whatever dtypes they are stored in."""
+        state, action, reward, next_state = out
+        state[...] = self.state[indices]
+        action[...] = self.action[indices]
+        reward[...] = self.reward[indices]
+        next_state[...] = self.next_state[indices]
+
+
+class CompactExperienceReplay(ExperienceReplay):  # pylint: disable=too-many-instance-attributes
+    """
+    An experience replay buffer that stores every observation once, in a compact dtype.
+
+    An episode is a chain of experiences where the next state of one is the state of the next. Slot i of `state` holds
+    the state of the experience at slot i, and its next state is the state held by slot i + 1. When an experience does
+    not continue the previous one, the next state of the previous one keeps its own slot, flagged as not starting an
+    experience, so each episode boundary costs one slot.
+
+    Sampling returns the same float64 states and rewards and int actions as ExperienceReplay. With uint8 observations an
+    experience takes 166 bytes instead of the 2545 bytes of ExperienceReplay.
+
+    Attributes:
+        length: The number of slots of the buffer.
+        index: The slot holding the next state of the last experience.
+        is_full: Whether the buffer has wrapped around.
+        state: The state array, also holding the next states.
+        action: The action array.
+        reward: The reward array.
+        done: Whether each experience ended its episode.
+        starts_experience: Whether each slot holds the state of an experience, rather than only a next state.
+    """
+
+    _persisted = ExperienceReplay._persisted + ("_count", "_pending")
+
+    def __init__(self, length: int, observation_dtype: DTypeLike = np.uint8, directory: Optional[str] = None) -> None:
+        self._count = 0
+        self._pending = False
+        super().__init__(length, observation_dtype, directory)
+        # integer observations saturate, like Observation.encode does for the streak
+        dtype = np.dtype(observation_dtype)
+        self._max_value = np.iinfo(dtype).max if np.issubdtype(dtype, np.integer) else np.inf
+
+    def _allocate(self, observation_dtype: DTypeLike) -> None:
+        self.state = self._allocate_observations(observation_dtype)
+        # the shape choice and the coordinates all fit in a byte
+        self.action = self._zeros("action", (self.length, *action_space_d), np.int8)
+        # the rewards are integers, which float32 holds exactly
+        self.reward = self._zeros("reward", (self.length,), np.float32)
+        self.done = self._zeros("done", (self.length,), bool)
+        self.starts_experience: Bool[np.ndarray, "length"] = self._zeros(  # type: ignore[type-arg]
+            "starts_experience", (self.length,), bool
         )
-        state = torch.tensor(self.state[sample_indices])
-        action = torch.tensor(self.action[sample_indices])
-        reward = torch.tensor(self.reward[sample_indices])
-        next_state = torch.tensor(self.next_state[sample_indices])
-        return state, action, reward, next_state
+
+    def _allocate_observations(self, observation_dtype: DTypeLike) -> np.ndarray:  # type: ignore[type-arg]
+        """Allocate the array each slot stores its observation in."""
+        return self._zeros("state", (self.length, *observation_space_d), observation_dtype)
+
+    def _encode(self, state: Float[np.ndarray, "*state"]) -> np.ndarray:  # type: ignore[type-arg]
+        """The observation as a slot stores it."""
+        return np.minimum(state, self._max_value).astype(self.state.dtype)
+
+    def _decode(
+        self, slots: np.ndarray, out: Float[np.ndarray, "batch *observation_space_d"]  # type: ignore[type-arg]
+    ) -> None:
+        """Write the observations of stored slots into `out`."""
+        out[...] = slots
+
+    def __len__(self) -> int:
+        return self._count
+
+    def collect(self, experience: Experience, done: bool = False) -> None:
+        state, action, reward, next_state = experience
+        stored_state = self._encode(state)
+        if self._pending and np.array_equal(self.state[self.index], stored_state):
+            # the experience continues the previous one, whose next state is already stored
+            slot = self.index
+        else:
+            slot = (self.index + 1) % self.length if self._pending else self.index
+            self.state[slot] = stored_state
+        next_slot = (slot + 1) % self.length
+
+        self.action[slot] = action
+        self.reward[slot] = reward
+        self.done[slot] = done
+        self.state[next_slot] = self._encode(next_state)
+        self._count += int(not self.starts_experience[slot]) - int(self.starts_experience[next_slot])
+        self.starts_experience[slot] = True
+        # the experience that started at next_slot, if any, has lost its state
+        self.starts_experience[next_slot] = False
+
+        # index wraps around such that old experience auto expire
+        if next_slot <= slot or slot < self.index:
+            self.is_full = True
+        self.index = next_slot
+        self._pending = True
+
+    def collect_batch(
+        self, experiences: ExperienceBatch, dones: Optional[Bool[np.ndarray, "N"]] = None  # type: ignore[type-arg]
+    ) -> None:
+        """
+        Collect N experiences as N calls to `collect` would, with one assignment per array for each block of up to
+        `length // 2` experiences, which take at most `length` slots and so never wrap onto their own slots. Only
+        consecutive experiences share their observations, so the experiences of an environment should follow each other
+        rather than be interleaved with those of others.
+        """
+        states, actions, rewards, next_states = experiences
+        block = max(self.length // 2, 1)
+        for start in range(0, len(rewards), block):
+            rows = slice(start, start + block)
+            self._collect_block(
+                (states[rows], actions[rows], rewards[rows], next_states[rows]), None if dones is None else dones[rows]
+            )
+
+    def _collect_block(
+        self, experiences: ExperienceBatch, dones: Optional[Bool[np.ndarray, "N"]]  # type: ignore[type-arg]
+    ) -> None:
+        states, actions, rewards, next_states = experiences
+        if len(rewards) == 0:
+            return
+        stored_states, stored_next_states = self._encode(states), self._encode(next_states)
+        positions = self._block_positions(stored_states, stored_next_states)
+        slots, next_slots = positions % self.length, (positions + 1) % self.length
+        touched = np.union1d(slots, next_slots)
+        starts_before = int(self.starts_experience[touched].sum())
+
+        self.state[slots] = stored_states
+        self.state[next_slots] = stored_next_states
+        self.action[slots] = actions
+        self.reward[slots] = rewards
+        self.done[slots] = False if dones is None else dones
+        # the experiences that started at the next slots, if any, have lost their states
+        self.starts_experience[next_slots] = False
+        self.starts_experience[slots] = True
+        self._count += int(self.starts_experience[touched].sum()) - starts_before
+
+        # index wraps around such that old experience auto expire
+        if positions[-1] + 1 >= self.length:
+            self.is_full = True
+        self.index = int(next_slots[-1])
+        self._pending = True
+
+    def _block_positions(
+        self, stored_states: np.ndarray, stored_next_states: np.ndarray  # type: ignore[type-arg]
+    ) -> Int[np.ndarray, "N"]:  # type: ignore[type-arg]
+        """The slot each experience of a block takes, counted on from `index` without wrapping around."""
+        # whether each experience continues the previous one, whose next state is then its state
+        continues = np.empty(len(stored_states), dtype=bool)
+        continues[0] = self._pending and np.array_equal(self.state[self.index], stored_states[0])
+        continues[1:] = (stored_states[1:] == stored_next_states[:-1]).all(axis=tuple(range(1, stored_states.ndim)))
+        # an experience takes the slot after the next state of the previous one, or that slot if it continues it
+        steps = (~continues).astype(np.int_)
+        steps[1:] += 1
+        steps[0] &= self._pending
+        positions: Int[np.ndarray, "N"] = self.index + np.cumsum(steps)  # type: ignore[type-arg]
+        return positions
+
+    def _sample_indices(self, sample_size: int) -> Int[np.ndarray, "batch"]:  # type: ignore[type-arg]
+        sample_size = min(self._count, sample_size)
+        if 2 * sample_size > self._count:
+            slots = np.flatnonzero(self.starts_experience)
+            chosen: Int[np.ndarray, "batch"] = np.random.permutation(len(slots))[:sample_size]  # type: ignore[type-arg]
+            indices: Int[np.ndarray, "batch"] = slots[chosen]  # type: ignore[type-arg]
+            return indices
+        filled = self.length if self.is_full else self.index + 1
+
+        def draw(n: int) -> np.ndarray:  # type: ignore[type-arg]
+            # an episode boundary costs one slot, so at least half the filled slots start an experience
+            slots: np.ndarray = np.random.randint(filled, size=2 * n)  # type: ignore[type-arg]
+            drawn: np.ndarray = slots[self.starts_experience[slots]]  # type: ignore[type-arg]
+            return drawn
+
+        return _draw_distinct(draw, sample_size)
+
+    def _gather(self, indices: Int[np.ndarray, "batch"], out: ExperienceBatch) -> None:  # type: ignore[type-arg]
+        state, action, reward, next_state = out
+        self._decode(self.state[indices], state)
+        action[...] = self.action[indices]
+        reward[...] = self.reward[indices]
+        self._decode(self.state[(indices + 1) % self.length], next_state)
+
+
+class PackedExperienceReplay(CompactExperienceReplay):
+    """
+    A CompactExperienceReplay that stores every observation packed by `Observation.pack`, in 21 bytes.
+
+    The board and shape cells must be 0 or 1 and the streak is saturated at 255, which holds for every observation of
+    the game. A sampled batch is unpacked in one call, and an experience takes 30 bytes.
+    """
+
+    def __init__(self, length: int, directory: Optional[str] = None) -> None:
+        super().__init__(length, np.uint8, directory)
+
+    def _allocate_observations(self, observation_dtype: DTypeLike) -> np.ndarray:  # type: ignore[type-arg]
+        return self._zeros("state", (self.length, PACKED_OBSERVATION_N), observation_dtype)
+
+    def _encode(self, state: Float[np.ndarray, "*state"]) -> np.ndarray:  # type: ignore[type-arg]
+        return Observation.pack(state)
+
+    def _decode(
+        self, slots: np.ndarray, out: Float[np.ndarray, "batch *observation_space_d"]  # type: ignore[type-arg]
+    ) -> None:
+        Observation.unpack(slots, out)
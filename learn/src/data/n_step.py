@@ -0,0 +1,77 @@
+from collections import deque
+from typing import Union
+from jaxtyping import Bool, Float, Int
+
+import numpy as np
+import torch
+
+from learn.src.data.experiences import ExperienceBatch, ExperienceReplay
+
+# One step of N environments: states, actions, rewards, next states and done flags.
+_Step = tuple[
+    Float[np.ndarray, "N *observation_space_d"],  # type: ignore[type-arg]
+    Int[np.ndarray, "N *action_space_d"],  # type: ignore[type-arg]
+    Float[np.ndarray, "N"],  # type: ignore[type-arg]
+    Float[np.ndarray, "N *observation_space_d"],  # type: ignore[type-arg]
+    Bool[np.ndarray, "N"],  # type: ignore[type-arg]
+]
+
+
+class NStepCollector:
+    """
+    Fold the steps of N environments stepped together into n-step experiences, and collect them into a replay buffer.
+
+    The experience of step t of an environment gets the discounted return of steps t to t + n - 1 as its reward and the
+    next state of step t + n - 1 as its next state, so its Q target is reward + gamma ** n * max Q(next state). When the
+    episode ends within those n steps, the return stops at its last step and the experience is collected as done, so
+    that it is not bootstrapped from. Step t is collected once step t + n - 1 is given, and the n - 1 last steps given
+    are never collected.
+
+    Attributes:
+        replay: The buffer the experiences are collected into.
+        n_step: The number of steps folded into each experience.
+        gamma: The discount factor, such as the `gamma` of `DQN_Network`.
+        discount: gamma ** n_step, the discount of the next state of a folded experience.
+    """
+
+    def __init__(self, replay: ExperienceReplay, n_step: int, gamma: Union[float, torch.Tensor]) -> None:
+        self.replay = replay
+        self.n_step = n_step
+        self.gamma = float(gamma)
+        self.discount = self.gamma**n_step
+        self._steps: deque[_Step] = deque(maxlen=n_step)
+
+    def collect_batch(self, experiences: ExperienceBatch, dones: Bool[np.ndarray, "N"]) -> None:  # type: ignore[type-arg]
+        """
+        Add a step of the N environments, the same N every time, and collect the step n - 1 steps before it, folded.
+        Environments that are done are expected to be reset, as `VecWoodokuGameEnv` does.
+
+        Args:
+            experiences: The states, actions, rewards and next states of the environments, stacked.
+            dones: Whether each environment's episode ended with this step.
+        """
+        states, actions, rewards, next_states = experiences
+        # copied, since vectorized environments tend to reuse their output arrays
+        self._steps.append(
+            (
+                states.copy(),
+                actions.copy(),
+                np.array(rewards, dtype=np.float64),
+                next_states.copy(),
+                np.array(dones, dtype=bool),
+            )
+        )
+        if len(self._steps) < self.n_step:
+            return
+
+        rewards_n = np.stack([step[2] for step in self._steps])
+        dones_n = np.stack([step[4] for step in self._steps])
+        # whether the episode of each step's first experience is still running at each of the n steps
+        running = np.concatenate([np.ones_like(dones_n[:1]), np.cumprod(~dones_n[:-1], axis=0)]).astype(bool)
+        discounts = self.gamma ** np.arange(self.n_step)[:, None]
+        returns = (discounts * rewards_n * running).sum(axis=0)
+        done = dones_n.any(axis=0)
+
+        # the next state of a done experience is never bootstrapped from, so any next state will do
+        first_states, first_actions = self._steps[0][0], self._steps[0][1]
+        self.replay.collect_batch((first_states, first_actions, returns, self._steps[-1][3]), done)
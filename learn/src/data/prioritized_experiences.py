@@ -0,0 +1,134 @@
+from typing import Optional
+
+import numpy as np
+import torch
+from jaxtyping import Bool, Float, Int
+from numpy.typing import DTypeLike
+
+from learn.src.data.experiences import ExperienceBatch, ExperienceReplay, Experience, empty_batch
+from learn.src.data.sum_tree import SumTree
+from learn.src.typechecking import typecheck
+
+
+class PrioritizedExperienceReplay(ExperienceReplay):
+    """
+    An experience replay buffer that samples experiences proportionally to their priority, as in prioritized experience
+    replay (Schaul et al., 2016).
+
+    The priority of an experience is (|TD error| + epsilon) ** alpha, kept in a sum tree so that sampling a batch and
+    updating its priorities take O(batch * log length). A new experience gets the largest priority seen so far, so that
+    it is sampled at least once before its TD error is known. Experiences expire as in ExperienceReplay.
+
+    Sampling draws one experience from each of `sample_size` equal segments of the total priority, so an experience can
+    be drawn more than once in a batch. `sample_from_experience` and `sample_into` sample this way too, without the
+    importance-sampling weights `sample_prioritized` gives.
+
+    Attributes:
+        alpha: How much the priorities skew sampling, from 0 (uniform) to 1 (proportional to the TD error).
+        beta: How much the importance-sampling weights correct the skew, from 0 (not at all) to 1 (fully). It is usually
+            annealed to 1 over training.
+        epsilon: The priority of an experience of TD error 0, so that it can still be sampled.
+        max_priority: The largest |TD error| + epsilon seen so far.
+        priorities: The nodes of the sum tree of the priorities.
+    """
+
+    _persisted = ExperienceReplay._persisted + ("max_priority",)
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        length: int,
+        *,
+        alpha: float = 0.6,
+        beta: float = 0.4,
+        epsilon: float = 1e-6,
+        observation_dtype: DTypeLike = np.float64,
+        directory: Optional[str] = None,
+    ) -> None:
+        self.alpha = alpha
+        self.beta = beta
+        self.epsilon = epsilon
+        self.max_priority = 1.0
+        super().__init__(length, observation_dtype, directory)
+
+    def _allocate(self, observation_dtype: DTypeLike) -> None:
+        super()._allocate(observation_dtype)
+        self.priorities = self._zeros("priorities", (SumTree.size(self.length),), np.float64)
+        self._tree = SumTree(self.length, self.priorities)
+
+    def _attach_arrays(self, arrays: dict[str, np.ndarray]) -> None:  # type: ignore[type-arg]
+        super()._attach_arrays(arrays)
+        self._tree = SumTree(self.length, self.priorities)
+
+    def collect(self, experience: Experience, done: bool = False) -> None:
+        slot = self.index
+        super().collect(experience, done)
+        self._tree.update(np.array([slot]), np.array([self.max_priority**self.alpha]))
+
+    def collect_batch(
+        self, experiences: ExperienceBatch, dones: Optional[Bool[np.ndarray, "N"]] = None  # type: ignore[type-arg]
+    ) -> None:
+        total = len(experiences[2])
+        count = min(total, self.length)
+        slots = (self.index + total - count + np.arange(count)) % self.length
+        super().collect_batch(experiences, dones)
+        self._tree.update(slots, np.full(count, self.max_priority**self.alpha))
+
+    def _sample_indices(self, sample_size: int) -> Int[np.ndarray, "batch"]:  # type: ignore[type-arg]
+        sample_size = min(sample_size, len(self))
+        segment = self._tree.total / max(sample_size, 1)
+        return self._tree.find((np.arange(sample_size) + np.random.random_sample(sample_size)) * segment)
+
+    def importance_weights(self, indices: Int[np.ndarray, "batch"]) -> Float[np.ndarray, "batch"]:  # type: ignore[type-arg]
+        """
+        The importance-sampling weights of sampled experiences, (length * P(i)) ** -beta, divided by the largest of the
+        batch so that they only ever scale updates down. An empty batch, as sampled from an empty buffer, has none.
+        """
+        if len(indices) == 0:
+            return np.zeros(0)
+        probabilities = self._tree.get(indices) / self._tree.total
+        weights: Float[np.ndarray, "batch"] = (len(self) * probabilities) ** -self.beta  # type: ignore[type-arg]
+        weights /= weights.max()
+        return weights
+
+    @typecheck
+    def sample_prioritized(self, sample_size: int) -> tuple[
+        Float[torch.Tensor, "batch *observation_space_d"],
+        Int[torch.Tensor, "batch *action_space_d"],
+        Float[torch.Tensor, "batch"],
+        Float[torch.Tensor, "batch *observation_space_d"],
+        Float[torch.Tensor, "batch"],
+        Int[np.ndarray, "batch"],  # type: ignore[type-arg]
+    ]:
+        """
+        Sample experiences proportionally to their priority.
+
+        Returns:
+            The states, actions, rewards and next states as `sample_from_experience` returns them, the importance-
+            sampling weights to scale the loss of each experience by, and the indices to pass to `update_priorities`.
+        """
+        state, action, reward, next_state = batch = empty_batch(min(sample_size, len(self)))
+        indices = self._sample_indices(len(state))
+        self._gather(indices, batch)
+        weights = torch.from_numpy(self.importance_weights(indices))
+        return (
+            torch.from_numpy(state),
+            torch.from_numpy(action),
+            torch.from_numpy(reward),
+            torch.from_numpy(next_state),
+            weights,
+            indices,
+        )
+
+    def update_priorities(
+        self, indices: Int[np.ndarray, "batch"], td_errors: Float[np.ndarray, "batch"]  # type: ignore[type-arg]
+    ) -> None:
+        """
+        Set the priorities of sampled experiences from their TD errors after a learner step, all at once.
+
+        An experience overwritten since it was sampled gets the priority of the one it was sampled as.
+        """
+        if len(indices) == 0:
+            return
+        priorities = np.abs(np.asarray(td_errors, dtype=np.float64)) + self.epsilon
+        self.max_priority = max(self.max_priority, float(priorities.max()))
+        self._tree.update(indices, priorities**self.alpha)
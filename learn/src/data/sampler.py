@@ -0,0 +1,131 @@
+from __future__ import annotations
+from queue import Queue
+from threading import Thread
+from types import TracebackType
+from typing import Optional, Union
+
+import torch
+
+from learn.src.data.experiences import ExperienceBatch, ExperienceReplay
+from woodoku.env import observation_space_d, action_space_d
+
+TensorBatch = tuple[torch.Tensor, torch.Tensor, torch.Tensor, torch.Tensor]
+
+
+class ReplaySampler:  # pylint: disable=too-many-instance-attributes
+    """
+    Sample batches of a replay buffer into tensors allocated once and reused, optionally prefetched by a thread.
+
+    Each batch is gathered straight into the memory of its tensors, which numpy sees through `Tensor.numpy()`, so
+    sampling allocates and copies nothing beyond the gather itself. The tensors are those of `sample_from_experience`:
+    float64 states and rewards and int64 actions.
+
+    With `prefetch` K > 0, a background thread keeps the next K batches ready while the caller trains on the current one.
+    Experiences collected meanwhile only show up in batches sampled after them, and a batch may be sampled from a
+    slot that is being written.
+
+    A returned batch is only valid until the next call to `sample`, which reuses its tensors.
+    """
+
+    _replay: ExperienceReplay
+    _batch_size: int
+    _tensors: list[TensorBatch]
+    _arrays: list[ExperienceBatch]
+    _free: Queue[Optional[int]]
+    _ready: Queue[Union[tuple[int, int], BaseException]]
+    _held: Optional[int]
+    _thread: Optional[Thread]
+
+    def __init__(self, replay: ExperienceReplay, batch_size: int, prefetch: int = 0, pin_memory: bool = False) -> None:
+        """
+        Args:
+            replay: The replay buffer to sample from.
+            batch_size: The number of experiences of each batch, fewer while the buffer holds fewer.
+            prefetch: The number of batches sampled ahead by a background thread, none if 0.
+            pin_memory: Whether to allocate the tensors in page-locked memory, for faster copies to the GPU. Ignored
+                without CUDA.
+        """
+        self._replay = replay
+        self._batch_size = batch_size
+        pin_memory = pin_memory and torch.cuda.is_available()
+        # one set of tensors for the batch the caller holds and one for each batch prefetched
+        self._tensors = [self._allocate(pin_memory) for _ in range(prefetch + 1)]
+        self._arrays = [_numpy(tensors) for tensors in self._tensors]
+        self._free = Queue()
+        self._ready = Queue()
+        self._held = None
+        self._thread = None
+        if prefetch > 0:
+            for buffer in range(len(self._tensors)):
+                self._free.put(buffer)
+            self._thread = Thread(target=self._prefetch, daemon=True)
+            self._thread.start()
+
+    def _allocate(self, pin_memory: bool) -> TensorBatch:
+        size = self._batch_size
+        return (
+            torch.empty((size, *observation_space_d), dtype=torch.float64, pin_memory=pin_memory),
+            torch.empty((size, *action_space_d), dtype=torch.int64, pin_memory=pin_memory),
+            torch.empty(size, dtype=torch.float64, pin_memory=pin_memory),
+            torch.empty((size, *observation_space_d), dtype=torch.float64, pin_memory=pin_memory),
+        )
+
+    def sample(self) -> TensorBatch:
+        """
+        Sample a batch of distinct experiences, as `ExperienceReplay.sample_from_experience` does.
+
+        Raises:
+            RuntimeError: If the sampler is closed.
+        """
+        if self._thread is None:
+            return self._view(0, self._replay.sample_into(self._arrays[0]))
+        if not self._thread.is_alive() and self._ready.empty():
+            raise RuntimeError("the sampler is closed")
+
+        if self._held is not None:
+            self._free.put(self._held)
+        ready = self._ready.get()
+        if isinstance(ready, BaseException):
+            self._held = None
+            raise ready
+        self._held, count = ready
+        return self._view(self._held, count)
+
+    def _view(self, buffer: int, count: int) -> TensorBatch:
+        state, action, reward, next_state = self._tensors[buffer]
+        return state[:count], action[:count], reward[:count], next_state[:count]
+
+    def _prefetch(self) -> None:
+        """Sample into every buffer given back by the caller, until given None or sampling fails."""
+        while (buffer := self._free.get()) is not None:
+            try:
+                self._ready.put((buffer, self._replay.sample_into(self._arrays[buffer])))
+            except Exception as error:  # pylint: disable=broad-exception-caught
+                # the caller raises it, and the sampler is closed from then on
+                self._ready.put(error)
+                return
+
+    def close(self) -> None:
+        """Stop the prefetching thread, if any. A prefetching sampler cannot sample afterwards."""
+        if self._thread is not None:
+            self._free.put(None)
+            self._thread.join()
+            # leftover prefetched batches are not to be returned by a later sample
+            self._ready = Queue()
+
+    def __enter__(self) -> ReplaySampler:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+
+def _numpy(tensors: TensorBatch) -> ExperienceBatch:
+    """Numpy arrays sharing the memory of the tensors."""
+    state, action, reward, next_state = tensors
+    return state.numpy(), action.numpy(), reward.numpy(), next_state.numpy()
@@ -0,0 +1,281 @@
+from __future__ import annotations
+import time
+from dataclasses import dataclass
+from multiprocessing.shared_memory import SharedMemory
+from threading import Thread
+from types import TracebackType
+from typing import Optional
+from jaxtyping import Bool, Float, Int
+
+import numpy as np
+from numpy.typing import DTypeLike
+
+from learn.src.data.experiences import Experience, ExperienceBatch, ExperienceReplay, sample_distinct
+from woodoku.shared_memory import SharedArray
+
+# How long a writer held back by backpressure sleeps between looks at the sampled count.
+_BACKPRESSURE_POLL = 5e-4
+
+
+@dataclass(frozen=True)
+class _SharedReplay:
+    """Everything a process needs to attach to the arrays of a `SharedExperienceReplay`."""
+
+    arrays: dict[str, SharedArray]
+    bounds: tuple[int, ...]
+    observation_dtype: str
+    max_lead: Optional[int]
+
+
+@dataclass(frozen=True)
+class ReplayStats:
+    """
+    The fill and backpressure metrics of a `SharedExperienceReplay`.
+
+    Attributes:
+        size: The number of experiences that can be sampled.
+        length: The number of slots.
+        collected: The number of experiences collected so far, expired ones included.
+        sampled: The number of experiences sampled so far.
+        fill: The fraction of each writer's slots that holds an experience.
+        waited: The seconds each writer spent held back by backpressure so far.
+    """
+
+    size: int
+    length: int
+    collected: int
+    sampled: int
+    fill: Float[np.ndarray, "W"]  # type: ignore[type-arg]
+    waited: Float[np.ndarray, "W"]  # type: ignore[type-arg]
+
+
+def _release(replay: ExperienceReplay, names: list[str], memories: list[SharedMemory]) -> None:
+    """Drop the arrays `names` of `replay`, which shared memory cannot be closed under, then close the memory."""
+    for name in names:
+        vars(replay).pop(name, None)
+    replay._arrays.clear()  # pylint: disable=protected-access
+    for memory in memories:
+        memory.close()
+    memories.clear()
+
+
+class SharedExperienceReplay(ExperienceReplay):  # pylint: disable=too-many-instance-attributes
+    """
+    An experience replay buffer in shared memory, collected into by many processes and sampled by the one that made it.
+
+    The slots are split evenly among `num_writers` writers. Each writer is a `SharedReplayWriter`, from `writer(i)`, that
+    owns a circular buffer of its own slots and the counter of experiences it collected: no two processes ever write the
+    same memory, so collecting takes no lock. A writer is passed to an actor process as an argument, pickling only the
+    names of the shared memory it attaches to.
+
+    Sampling draws uniformly among the experiences of all writers and gathers them from shared memory in place, so
+    `sample_into` and `ReplaySampler` work as on any buffer. As with a prefetching `ReplaySampler`, an experience may be
+    sampled while a writer overwrites it. The buffer itself cannot collect, only its writers can: `collect` and
+    `collect_batch` raise a `TypeError`.
+
+    With `max_lead`, writers apply backpressure: a writer waits to collect while all writers together have collected
+    `max_lead` experiences more than were sampled, so actors cannot run ahead of the learner. `stats` tells how full the
+    buffer is and how long writers waited.
+
+    Attributes:
+        num_writers: The number of writers.
+        max_lead: How many experiences collected writers may be ahead of sampling, unlimited if None.
+        written: The number of experiences each writer collected so far.
+        waited_ns: The nanoseconds each writer spent held back by backpressure so far.
+        sampled: The number of experiences sampled so far, in a 1-element array.
+        closed: Whether the buffer is closed, in a 1-element array, which wakes up waiting writers.
+    """
+
+    def __init__(
+        self,
+        length: int,
+        num_writers: int,
+        observation_dtype: DTypeLike = np.float64,
+        max_lead: Optional[int] = None,
+    ) -> None:
+        """
+        Args:
+            length: The number of slots, split evenly among the writers.
+            num_writers: The number of writers, at most `length`.
+            observation_dtype: The dtype states are stored in.
+            max_lead: How many experiences collected writers may be ahead of sampling, unlimited if None.
+        """
+        self.num_writers = num_writers
+        self.max_lead = max_lead
+        self._bounds = tuple(int(bound) for bound in np.linspace(0, length, num_writers + 1).astype(int))
+        self._sizes = np.diff(self._bounds)
+        self._shared: dict[str, SharedArray] = {}
+        self._memories: list[SharedMemory] = []
+        super().__init__(length, observation_dtype)
+        self._observation_dtype = np.dtype(observation_dtype).str
+
+    def _allocate(self, observation_dtype: DTypeLike) -> None:
+        super()._allocate(observation_dtype)
+        self.written = self._zeros("written", (self.num_writers,), np.int64)
+        self.waited_ns = self._zeros("waited_ns", (self.num_writers,), np.int64)
+        self.sampled = self._zeros("sampled", (1,), np.int64)
+        self.closed = self._zeros("closed", (1,), bool)
+
+    def _open_array(self, name: str, shape: tuple[int, ...], dtype: DTypeLike) -> np.ndarray:  # type: ignore[type-arg]
+        # new shared memory is zeroed
+        shared, memory = SharedArray.create(shape, dtype)
+        self._shared[name] = shared
+        self._memories.append(memory)
+        return shared.view(memory)
+
+    def writer(self, writer: int) -> SharedReplayWriter:
+        """The writer collecting into the `writer`-th share of the slots."""
+        handle = _SharedReplay(dict(self._shared), self._bounds, self._observation_dtype, self.max_lead)
+        return SharedReplayWriter(handle, writer)
+
+    def __len__(self) -> int:
+        return int(np.minimum(self.written, self._sizes).sum())
+
+    def collect(self, experience: Experience, done: bool = False) -> None:
+        """
+        Raises:
+            TypeError: Always, as experiences are collected through the `SharedReplayWriter`s from `writer`.
+        """
+        raise TypeError("a shared replay cannot collect, collect through a SharedReplayWriter from writer(i) instead")
+
+    def collect_batch(
+        self, experiences: ExperienceBatch, dones: Optional[Bool[np.ndarray, "N"]] = None  # type: ignore[type-arg]
+    ) -> None:
+        """
+        Raises:
+            TypeError: Always, as experiences are collected through the `SharedReplayWriter`s from `writer`.
+        """
+        raise TypeError("a shared replay cannot collect, collect through a SharedReplayWriter from writer(i) instead")
+
+    def _sample_indices(self, sample_size: int) -> Int[np.ndarray, "batch"]:  # type: ignore[type-arg]
+        # the counts are read once, such that the indices only point at experiences already written
+        filled = np.minimum(self.written, self._sizes)
+        ends = np.cumsum(filled)
+        ranks = sample_distinct(int(ends[-1]), sample_size)
+        writers = np.searchsorted(ends, ranks, side="right")
+        indices: Int[np.ndarray, "batch"] = (  # type: ignore[type-arg]
+            np.asarray(self._bounds)[writers] + ranks - (ends - filled)[writers]
+        )
+        self.sampled[0] += len(indices)
+        return indices
+
+    def stats(self) -> ReplayStats:
+        written = self.written.copy()
+        return ReplayStats(
+            size=int(np.minimum(written, self._sizes).sum()),
+            length=self.length,
+            collected=int(written.sum()),
+            sampled=int(self.sampled[0]),
+            fill=np.minimum(written, self._sizes) / self._sizes,
+            waited=self.waited_ns / 1e9,
+        )
+
+    def load(self, directory: str, lazy: bool = False) -> Optional[Thread]:
+        """
+        Restore a snapshot as `ExperienceReplay.load` does, before any writer collects.
+
+        Raises:
+            ValueError: If lazy, as the snapshot cannot be mapped into shared memory, or as `ExperienceReplay.load`.
+        """
+        if lazy:
+            raise ValueError("a shared replay cannot be loaded lazily")
+        return super().load(directory)
+
+    def close(self) -> None:
+        """
+        Wake up the waiting writers, which then raise, and free the shared memory. The buffer cannot be used
+        afterwards, and writers must not collect anymore.
+        """
+        if not self._memories:
+            return
+        self.closed[0] = True
+        for memory in self._memories:
+            memory.unlink()
+        _release(self, list(self._arrays), self._memories)
+
+    def __enter__(self) -> SharedExperienceReplay:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+
+class SharedReplayWriter(ExperienceReplay):  # pylint: disable=too-many-instance-attributes
+    """
+    A writer of a `SharedExperienceReplay`: a circular buffer over its share of the shared slots.
+
+    It collects as `ExperienceReplay` does, then publishes the experiences by adding them to its count, so sampling never
+    sees a slot before it is written. Only one process may collect through a writer at a time. A pickled writer is only
+    a handle: unpickling it in another process attaches to the shared memory and resumes after the experiences its
+    count says were collected.
+    """
+
+    def __init__(self, handle: _SharedReplay, writer: int) -> None:
+        self._handle = handle
+        self._writer = writer
+        self._memories: list[SharedMemory] = []
+        start, stop = handle.bounds[writer], handle.bounds[writer + 1]
+        self._slots = slice(start, stop)
+        self._counters = {name: self._attach(name) for name in ("written", "waited_ns", "sampled", "closed")}
+        super().__init__(stop - start, handle.observation_dtype)
+        written = int(self._counters["written"][writer])
+        self.index = written % self.length
+        self.is_full = written >= self.length
+
+    def _attach(self, name: str) -> np.ndarray:  # type: ignore[type-arg]
+        array, memory = self._handle.arrays[name].attach()
+        self._memories.append(memory)
+        return array
+
+    def _open_array(self, name: str, shape: tuple[int, ...], dtype: DTypeLike) -> np.ndarray:  # type: ignore[type-arg]
+        array = self._attach(name)[self._slots]
+        assert array.shape == shape and array.dtype == np.dtype(dtype)
+        return array
+
+    def __getstate__(self) -> tuple[_SharedReplay, int]:
+        return self._handle, self._writer
+
+    def __setstate__(self, state: tuple[_SharedReplay, int]) -> None:
+        self.__init__(*state)  # type: ignore[misc] # pylint: disable=unnecessary-dunder-call
+
+    def collect(self, experience: Experience, done: bool = False) -> None:
+        self._wait()
+        super().collect(experience, done)
+        self._counters["written"][self._writer] += 1
+
+    def collect_batch(
+        self, experiences: ExperienceBatch, dones: Optional[Bool[np.ndarray, "N"]] = None  # type: ignore[type-arg]
+    ) -> None:
+        self._wait()
+        super().collect_batch(experiences, dones)
+        self._counters["written"][self._writer] += len(experiences[2])
+
+    def _wait(self) -> None:
+        """
+        Wait while the writers are `max_lead` experiences or more ahead of sampling.
+
+        Raises:
+            RuntimeError: If the shared replay is closed.
+        """
+        counters = self._counters
+        if counters["closed"][0]:
+            raise RuntimeError("the shared replay is closed")
+        max_lead = self._handle.max_lead
+        if max_lead is None or counters["written"].sum() - counters["sampled"][0] < max_lead:
+            return
+        start = time.perf_counter_ns()
+        while counters["written"].sum() - counters["sampled"][0] >= max_lead:
+            if counters["closed"][0]:
+                raise RuntimeError("the shared replay is closed")
+            time.sleep(_BACKPRESSURE_POLL)
+        counters["waited_ns"][self._writer] += time.perf_counter_ns() - start
+
+    def close(self) -> None:
+        """Detach from the shared memory. The writer cannot be used afterwards."""
+        self._counters.clear()
+        _release(self, list(self._arrays), self._memories)
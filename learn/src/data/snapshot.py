@@ -0,0 +1,127 @@
+import gzip
+import os
+from os import path
+from threading import Thread
+from typing import BinaryIO, Iterator
+
+import numpy as np
+
+# About how many bytes of an array are read or written at a time.
+CHUNK_BYTES = 1 << 24
+
+
+def _chunks(array: np.ndarray, chunk_bytes: int) -> Iterator[slice]:  # type: ignore[type-arg]
+    """Slices of whole rows of `array`, about `chunk_bytes` each."""
+    row_bytes = max(array.itemsize * int(np.prod(array.shape[1:])), 1)
+    rows = max(chunk_bytes // row_bytes, 1)
+    for start in range(0, len(array), rows):
+        yield slice(start, start + rows)
+
+
+def _check(file: str, shape: tuple[int, ...], dtype: np.dtype, array: np.ndarray) -> None:  # type: ignore[type-arg]
+    """
+    Raises:
+        ValueError: If the array saved in `file` does not fit `array`.
+    """
+    if shape != array.shape or dtype != array.dtype:
+        raise ValueError(f"{file} holds a {dtype} array of shape {shape}, not {array.dtype} {array.shape}")
+
+
+def _write_header(stream: BinaryIO, array: np.ndarray) -> None:  # type: ignore[type-arg]
+    """Write the .npy header of `array`, magic string included, such that the stream reads back as a .npy file once its data follows."""
+    descr = np.lib.format.dtype_to_descr(array.dtype)  # type: ignore[no-untyped-call]
+    header = {"descr": descr, "fortran_order": False, "shape": array.shape}
+    np.lib.format.write_array_header_2_0(stream, header)  # type: ignore[no-untyped-call]
+
+
+def write_arrays(
+    arrays: dict[str, np.ndarray], directory: str, compress: bool = False, chunk_bytes: int = CHUNK_BYTES  # type: ignore[type-arg]
+) -> None:
+    """
+    Write every array to `name`.npy in `directory`, or to `name`.npy.gz if compressed, a chunk at a time.
+
+    An uncompressed array is written through a memory map of its file, a compressed one through a gzip stream, so no
+    copy of a whole array is ever made.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for name, array in arrays.items():
+        file = path.join(directory, f"{name}.npy")
+        # a snapshot overwritten with the other compression must not leave the old array behind
+        stale = file if compress else file + ".gz"
+        if path.exists(stale):
+            os.remove(stale)
+        if compress:
+            with gzip.open(file + ".gz", "wb", compresslevel=1) as stream:
+                _write_header(stream, array)  # type: ignore[arg-type]
+                for rows in _chunks(array, chunk_bytes):
+                    stream.write(np.ascontiguousarray(array[rows]).tobytes())
+            continue
+        saved: np.memmap = np.lib.format.open_memmap(  # type: ignore[no-untyped-call,type-arg]
+            file, mode="w+", dtype=array.dtype, shape=array.shape
+        )
+        for rows in _chunks(array, chunk_bytes):
+            saved[rows] = array[rows]
+        saved.flush()
+        del saved
+
+
+def read_arrays(arrays: dict[str, np.ndarray], directory: str, chunk_bytes: int = CHUNK_BYTES) -> None:  # type: ignore[type-arg]
+    """
+    Copy the arrays written by `write_arrays` into `arrays`, compressed or not, a chunk at a time.
+
+    Raises:
+        ValueError: If a saved array does not have the shape and dtype of the array it is read into.
+    """
+    for name, array in arrays.items():
+        file = path.join(directory, f"{name}.npy")
+        if not path.exists(file + ".gz"):
+            saved = np.load(file, mmap_mode="r")
+            _check(file, saved.shape, saved.dtype, array)
+            for rows in _chunks(array, chunk_bytes):
+                array[rows] = saved[rows]
+            del saved
+            continue
+        with gzip.open(file + ".gz", "rb") as stream:
+            np.lib.format.read_magic(stream)  # type: ignore[no-untyped-call]
+            shape, _, dtype = np.lib.format.read_array_header_2_0(stream)  # type: ignore[no-untyped-call]
+            _check(file + ".gz", shape, dtype, array)
+            for rows in _chunks(array, chunk_bytes):
+                chunk = array[rows]
+                chunk[...] = np.frombuffer(stream.read(chunk.nbytes), dtype=dtype).reshape(chunk.shape)
+
+
+def map_arrays(arrays: dict[str, np.ndarray], directory: str) -> dict[str, np.ndarray]:  # type: ignore[type-arg]
+    """
+    Map the uncompressed arrays written by `write_arrays` copy-on-write, in place of `arrays`.
+
+    Reading a mapped array reads its file as needed, through the OS page cache. Writing it only changes this process'
+    copy of the pages written, never the file.
+
+    Raises:
+        ValueError: If an array is compressed, or does not have the shape and dtype of the array it replaces.
+    """
+    mapped = {}
+    for name, array in arrays.items():
+        file = path.join(directory, f"{name}.npy")
+        if not path.exists(file):
+            raise ValueError(f"{file} does not exist, compressed snapshots cannot be mapped")
+        saved = np.load(file, mmap_mode="c")
+        _check(file, saved.shape, saved.dtype, array)
+        mapped[name] = saved
+    return mapped
+
+
+def prefetch_arrays(arrays: dict[str, np.ndarray], chunk_bytes: int = CHUNK_BYTES) -> Thread:  # type: ignore[type-arg]
+    """
+    Start a thread reading every array through once, such that the pages of mapped arrays are in memory before they are
+    needed.
+    """
+
+    def read() -> None:
+        for array in arrays.values():
+            for rows in _chunks(array, chunk_bytes):
+                array[rows].max(initial=0)
+
+    thread = Thread(target=read, daemon=True)
+    thread.start()
+    return thread
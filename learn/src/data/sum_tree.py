@@ -0,0 +1,70 @@
+from typing import Optional
+from jaxtyping import Float, Int
+
+import numpy as np
+
+
+class SumTree:
+    """
+    A binary tree over `capacity` non-negative priorities, where each node holds the sum of the priorities below it.
+
+    The tree is an array: node 1 is the root, the children of node i are 2i and 2i + 1, and the priorities are the
+    leaves, from node `leaves` on. Updating priorities and finding the priority a prefix sum falls into both take
+    O(log capacity), and both are done for a whole batch at once, one tree level at a time.
+    """
+
+    def __init__(self, capacity: int, nodes: Optional[Float[np.ndarray, "NODES"]] = None) -> None:  # type: ignore[type-arg]
+        """
+        Args:
+            capacity: The number of priorities.
+            nodes: A zeroed array of `SumTree.size(capacity)` floats to hold the tree, such as a memory-mapped one. The
+                tree allocates its own if None.
+        """
+        self.capacity = capacity
+        self.leaves = 1 << max(capacity - 1, 0).bit_length()
+        self._depth = self.leaves.bit_length() - 1
+        self.nodes = np.zeros(self.size(capacity)) if nodes is None else nodes
+
+    @staticmethod
+    def size(capacity: int) -> int:
+        """The number of nodes of a tree over `capacity` priorities."""
+        return 2 * (1 << max(capacity - 1, 0).bit_length())
+
+    @property
+    def total(self) -> float:
+        return float(self.nodes[1])
+
+    def get(self, indices: Int[np.ndarray, "B"]) -> Float[np.ndarray, "B"]:  # type: ignore[type-arg]
+        """The priorities at `indices`."""
+        priorities: Float[np.ndarray, "B"] = self.nodes[self.leaves + np.asarray(indices)]  # type: ignore[type-arg]
+        return priorities
+
+    def update(self, indices: Int[np.ndarray, "B"], priorities: Float[np.ndarray, "B"]) -> None:  # type: ignore[type-arg]
+        """
+        Set the priorities at `indices`. If an index repeats, its last priority is kept.
+        """
+        nodes = self.leaves + np.asarray(indices)
+        self.nodes[nodes] = priorities
+        for _ in range(self._depth):
+            # a parent shared by several indices is written several times, with the same sum
+            nodes //= 2
+            self.nodes[nodes] = self.nodes[2 * nodes] + self.nodes[2 * nodes + 1]
+
+    def find(self, prefix_sums: Float[np.ndarray, "B"]) -> Int[np.ndarray, "B"]:  # type: ignore[type-arg]
+        """
+        The index of the priority each prefix sum falls into, that is the first index whose priority added to the
+        priorities before it exceeds the prefix sum. Indices of priority 0 are never returned while the total is not 0.
+
+        Args:
+            prefix_sums: Values in [0, total).
+        """
+        values = np.array(prefix_sums, dtype=np.float64)
+        nodes = np.ones(len(values), dtype=np.int_)
+        for _ in range(self._depth):
+            left = self.nodes[2 * nodes]
+            # rounding can push a value past its subtree, which must not lead into an empty right subtree
+            right = (values >= left) & (self.nodes[2 * nodes + 1] > 0)
+            values -= np.where(right, left, 0)
+            nodes = 2 * nodes + right
+        indices: Int[np.ndarray, "B"] = nodes - self.leaves  # type: ignore[type-arg]
+        return indices
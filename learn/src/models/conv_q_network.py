@@ -0,0 +1,114 @@
+from typing import Optional
+
+import numpy as np
+import torch
+from torch import nn
+from jaxtyping import Float
+
+from config import ACTION_N, BOARD_SIZE, MAX_SHAPE_SIZE, NUM_SHAPES, OBSERVATION_N
+
+_BOARD_N = BOARD_SIZE * BOARD_SIZE
+_SHAPE_N = MAX_SHAPE_SIZE * MAX_SHAPE_SIZE
+
+
+def _footprints() -> tuple[np.ndarray, np.ndarray]:  # type: ignore[type-arg]
+    """
+    The cells under the 5x5 footprint of each anchor.
+
+    Returns:
+        The offset in the footprint of cell c of the board as seen from anchor a at [c, a], or `_SHAPE_N` if c is not
+        under the footprint, and whether the offset o of the footprint of anchor a is off the board at [a, o].
+    """
+    offsets = np.full((_BOARD_N, _BOARD_N), _SHAPE_N)
+    off_board = np.zeros((_BOARD_N, _SHAPE_N), dtype=bool)
+    for x in range(BOARD_SIZE):
+        for y in range(BOARD_SIZE):
+            for i in range(MAX_SHAPE_SIZE):
+                for j in range(MAX_SHAPE_SIZE):
+                    if x + i < BOARD_SIZE and y + j < BOARD_SIZE:
+                        offsets[(x + i) * BOARD_SIZE + y + j, x * BOARD_SIZE + y] = i * MAX_SHAPE_SIZE + j
+                    else:
+                        off_board[x * BOARD_SIZE + y, i * MAX_SHAPE_SIZE + j] = True
+    return offsets, off_board
+
+
+class ConvQNetwork(nn.Module):
+    """
+    A Q-network giving the Q-value of every (shape choice, x, y) action, flattened in the order of the action masks.
+
+    A shape placed with its top left corner at anchor (x, y) covers cells of the 5x5 footprint from (x, y). The board
+    is encoded by a 5x5 convolution aligned on those footprints, the cells off the board counting as occupied, into
+    features of each anchor, which further layers shared by all anchors refine. The shapes are encoded by a layer shared
+    by the three of them, and the Q-value of an action is the dot product of the features of its anchor and its shape.
+
+    The weights are shared by every anchor and shape, so the network has few parameters: 848 with `channels` [16],
+    against about 100k for an MLP with one hidden layer of 256. Since the convolution is linear, it runs as a single
+    matrix product with a matrix built from its kernel, which is faster than a convolution over a board as small as 9x9.
+    """
+
+    _offsets: torch.Tensor
+    _off_board: torch.Tensor
+
+    def __init__(self, channels: list[int]) -> None:
+        """
+        Args:
+            channels: The number of features of each anchor after the convolution, then after each further layer.
+        """
+        super().__init__()
+        assert len(channels) > 0
+
+        # the weights of the 5x5 footprint and of the streak
+        self.footprint = nn.Linear(_SHAPE_N + 1, channels[0])
+        layers: list[nn.Module] = [nn.Tanh()]
+        for in_features, out_features in zip(channels[:-1], channels[1:]):
+            layers += [nn.Linear(in_features, out_features), nn.Tanh()]
+        self.anchor_encoder = nn.Sequential(*layers)
+        self.shape_encoder = nn.Linear(_SHAPE_N, channels[-1])
+
+        offsets, off_board = _footprints()
+        self.register_buffer("_offsets", torch.from_numpy(offsets), persistent=False)
+        self.register_buffer("_off_board", torch.from_numpy(off_board).float(), persistent=False)
+        self._cache: Optional[tuple[torch.Tensor, torch.Tensor, torch.Tensor]] = None
+
+    def _matrix(self) -> Float[torch.Tensor, "BOARD_N+2 FEATURES"]:
+        """
+        The convolution as a matrix from the cells, the streak and a constant 1 to the features of every anchor, the
+        constant bringing in the bias and the occupied cells off the board.
+
+        The matrix is built anew when gradients are recorded, and otherwise reused until the weights change, so that
+        choosing actions one at a time does not rebuild it every time.
+        """
+        weight, bias = self.footprint.weight, self.footprint.bias
+        # the weights are compared with the ones the matrix was built from, rather than by the version counters of the
+        # tensors, which writes through `.data` such as target network updates leave unchanged
+        if (
+            not torch.is_grad_enabled()
+            and self._cache is not None
+            and torch.equal(self._cache[0], weight)
+            and torch.equal(self._cache[1], bias)
+        ):
+            return self._cache[2]
+        kernel = self.footprint.weight[:, :_SHAPE_N].T
+        matrix = torch.cat(
+            [
+                torch.cat([kernel, kernel.new_zeros(1, kernel.shape[1])])[self._offsets],
+                self.footprint.weight[:, _SHAPE_N].expand(1, _BOARD_N, -1),
+                (self._off_board @ kernel + self.footprint.bias)[None],
+            ]
+        ).reshape(_BOARD_N + 2, -1)
+        self._cache = None if torch.is_grad_enabled() else (weight.clone(), bias.clone(), matrix)
+        return matrix
+
+    def forward(self, state: Float[torch.Tensor, "*batch OBSERVATION_N"]) -> Float[torch.Tensor, "*batch ACTION_N"]:
+        batch_shape = state.shape[:-1]
+        state = state.reshape(-1, OBSERVATION_N)
+        n = len(state)
+
+        inputs = torch.cat([state[:, :_BOARD_N], state[:, -1:], state.new_ones(n, 1)], dim=1)
+        anchors = self.anchor_encoder((inputs @ self._matrix()).reshape(n, _BOARD_N, -1))
+
+        shapes = self.shape_encoder(state[:, _BOARD_N:-1].reshape(n, NUM_SHAPES, _SHAPE_N))
+        q_values: Float[torch.Tensor, "*batch ACTION_N"] = torch.bmm(shapes, anchors.transpose(1, 2)).reshape(
+            *batch_shape, ACTION_N
+        )
+        return q_values
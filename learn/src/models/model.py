@@ -1,5 +1,8 @@
 import copy
-from typing import Union
+import os
+from os import path
+from threading import Thread
+from typing import Optional, Union
 import torch
 from torch import nn
 from jaxtyping import Float
@@ -12,14 +15,28 @@ from woodoku.env import (
 
 # imports for jaxtyping TODO: test if variables are actually evaluated
 
+from learn.src.data.experiences import ExperienceReplay
+from learn.src.models.conv_q_network import ConvQNetwork
+
+# The files of the model and of the replay buffer in a checkpoint directory.
+_CHECKPOINT_MODEL = "woodokulearn-dqn.pth"
+_CHECKPOINT_REPLAY = "replay"
+
 
 # pylint: disable=invalid-name
 class DQN_Network:
-    def __init__(self, layer_size_list: list[int], lr: float, seed: int = 1423):
+    def __init__(self, layer_size_list: list[int], lr: float, seed: int = 1423, conv: bool = False):
+        """
+        Args:
+            layer_size_list: The sizes of the layers of the MLP, or the channels of the board convolutions if conv.
+            lr: The learning rate.
+            seed: The seed of the initial weights.
+            conv: Whether the network is a `ConvQNetwork`, giving a Q-value per action, rather than an MLP.
+        """
         torch.manual_seed(seed)
 
         # policy net is the Q function
-        self._policy_net = self.create_network(layer_size_list)
+        self._policy_net: nn.Module = ConvQNetwork(layer_size_list) if conv else self.create_network(layer_size_list)
         # target net is the same, but as a shadow of policy net,
         # where it is not gradient update, but rather inherit the parameter of
         # policy ner every 5 step (see training loop)
@@ -88,3 +105,22 @@ class DQN_Network:
 
     def save_trained_model(self, model_path: str = "woodokulearn-dqn.pth") -> None:
         torch.save(self._policy_net.state_dict(), model_path)
+
+    def save_checkpoint(self, directory: str, replay: ExperienceReplay, compress: bool = False) -> None:
+        """
+        Save the model and a snapshot of the replay buffer in `directory`, so that a restarted training resumes with both.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.save_trained_model(path.join(directory, _CHECKPOINT_MODEL))
+        replay.save(path.join(directory, _CHECKPOINT_REPLAY), compress)
+
+    def load_checkpoint(self, directory: str, replay: ExperienceReplay, lazy: bool = False) -> Optional[Thread]:
+        """
+        Load the model and the replay buffer saved by `save_checkpoint`, the target net starting as the policy net.
+
+        Returns:
+            The thread reading the replay buffer in if lazy, see `ExperienceReplay.load`.
+        """
+        self.load_pretrained_model(path.join(directory, _CHECKPOINT_MODEL))
+        self.update_target_net()
+        return replay.load(path.join(directory, _CHECKPOINT_REPLAY), lazy)
@@ -1,14 +1,73 @@
 # pylint: disable=unused-argument
 from __future__ import annotations
-from jaxtyping import Int
+from jaxtyping import Bool, Float, Int
 import numpy as np
+import torch
 
+from config import ACTION_N, BOARD_SIZE, NUM_SHAPES
 from learn.src.models.model import DQN_Network
 from woodoku.env import Action
 
 
-def get_action(model: DQN_Network, state: Int[np.ndarray, "*state"], action_space_len: int, epsilon: float) -> Action:  # type: ignore[type-arg]
-    raise NotImplementedError
+def get_actions(
+    model: DQN_Network,
+    states: Float[np.ndarray, "B *observation_space_d"],  # type: ignore[type-arg]
+    action_masks: Bool[np.ndarray, "B NUM_SHAPES BOARD_SIZE BOARD_SIZE"],  # type: ignore[type-arg]
+    epsilon: float,
+) -> Int[np.ndarray, "B 3"]:  # type: ignore[type-arg]
+    """
+    Choose an action for each of B states at once, epsilon-greedily among their legal actions only.
+
+    With probability epsilon a state gets a uniformly random legal action, otherwise its legal action of largest
+    Q-value. The policy net is run once, on the states that do not explore. A state without legal actions, whose game
+    is over, gets the action [0, 0, 0].
+
+    Args:
+        model: The network, whose policy net must give ACTION_N outputs, the Q-values of the actions in the order of the
+            flattened action masks, such as an MLP whose last layer has ACTION_N units or a `ConvQNetwork`.
+        states: The observations, as `VecWoodokuGameEnv.step` returns them.
+        action_masks: The masks of legal actions, as `VecWoodokuGameEnv.action_mask` returns them.
+        epsilon: The probability of exploring.
+
+    Returns:
+        The actions, laid out as `Action.data`: shape choice, x and y.
+
+    Raises:
+        ValueError: if the policy net does not give ACTION_N outputs.
+    """
+    masks = np.asarray(action_masks).reshape(len(action_masks), ACTION_N)
+    explore = np.random.random_sample(len(masks)) < epsilon
+    choices = np.empty(len(masks), dtype=np.int_)
+    if explore.any():
+        # the largest of random scores is a uniformly random legal action
+        scores = np.random.random_sample((int(explore.sum()), ACTION_N))
+        choices[explore] = np.where(masks[explore], scores, -np.inf).argmax(axis=1)
+    greedy = ~explore
+    if greedy.any():
+        with torch.inference_mode():
+            outputs = model.policy_net(torch.as_tensor(states[greedy]).float())
+        if outputs.shape[-1] != ACTION_N:
+            raise ValueError(
+                f"The policy net must give a Q-value for each of the {ACTION_N} actions, got {outputs.shape[-1]} outputs"
+            )
+        q_values = outputs.reshape(-1, ACTION_N).numpy()
+        choices[greedy] = np.where(masks[greedy], q_values, -np.inf).argmax(axis=1)
+    actions: Int[np.ndarray, "B 3"] = np.stack(  # type: ignore[type-arg]
+        np.unravel_index(choices, (NUM_SHAPES, BOARD_SIZE, BOARD_SIZE)), axis=1
+    )
+    return actions
+
+
+def get_action(
+    model: DQN_Network,
+    state: Float[np.ndarray, "*observation_space_d"],  # type: ignore[type-arg]
+    action_mask: Bool[np.ndarray, "NUM_SHAPES BOARD_SIZE BOARD_SIZE"],  # type: ignore[type-arg]
+    epsilon: float,
+) -> Action:
+    """
+    Choose the action of a single state, as `get_actions` does for a batch.
+    """
+    return Action(get_actions(model, state[None], action_mask[None], epsilon)[0])
 
 
 def train(model: DQN_Network, batch_size: int) -> None:
@@ -0,0 +1,65 @@
+import functools
+import inspect
+import os
+from typing import Any, Callable, Optional, TypeVar, get_type_hints
+
+from jaxtyping import jaxtyped
+from typeguard import check_type
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# Runtime type checking validates every call, which costs more than the calls themselves on hot paths such as sampling.
+# It is on unless the WOODOKU_TYPECHECK environment variable is 0, and can be switched at any time with set_typecheck.
+_enabled = os.environ.get("WOODOKU_TYPECHECK", "1") != "0"
+
+
+def set_typecheck(enabled: bool) -> None:
+    """Switch the runtime type checking of the functions decorated with `typecheck` on or off."""
+    global _enabled  # pylint: disable=global-statement
+    _enabled = enabled
+
+
+def is_typecheck_enabled() -> bool:
+    return _enabled
+
+
+def typecheck(function: F) -> F:
+    """
+    Check the argument and return types of `function` at runtime, including jaxtyping shapes, while type checking is
+    enabled. Calls skip the checks entirely while it is disabled.
+
+    The annotations are checked with `typeguard.check_type` rather than by instrumenting the function with
+    `typeguard.typechecked`, which cannot instrument methods from here, so that methods are checked as functions are.
+    They are resolved on the first checked call, once the names they refer to all exist.
+    """
+    signature = inspect.signature(function)
+    hints: Optional[dict[str, Any]] = None
+
+    def check(*args: Any, **kwargs: Any) -> Any:
+        nonlocal hints
+        if hints is None:
+            hints = get_type_hints(function)
+        for name, value in signature.bind(*args, **kwargs).arguments.items():
+            if name not in hints:
+                continue
+            kind = signature.parameters[name].kind
+            if kind == inspect.Parameter.VAR_POSITIONAL:
+                values = list(value)
+            elif kind == inspect.Parameter.VAR_KEYWORD:
+                values = list(value.values())
+            else:
+                values = [value]
+            for each in values:
+                check_type(each, hints[name])
+        result = function(*args, **kwargs)
+        if "return" in hints:
+            check_type(result, hints["return"])
+        return result
+
+    checked = jaxtyped(check)  # type: ignore[no-untyped-call]
+
+    @functools.wraps(function)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        return checked(*args, **kwargs) if _enabled else function(*args, **kwargs)
+
+    return wrapper  # type: ignore[return-value]
@@ -1,11 +1,20 @@
+# pylint: disable=protected-access
+from pathlib import Path
+
 import pytest
 import numpy as np
 from jaxtyping import install_import_hook, Int, Float
 from typeguard import typechecked
 
 with install_import_hook("learn", "typeguard.typechecked"):
-    from learn.src.data.experiences import ExperienceReplay
-    from woodoku.env import observation_space_d, action_space_d
+    from learn.src.data.experiences import (
+        CompactExperienceReplay,
+        ExperienceBatch,
+        ExperienceReplay,
+        PackedExperienceReplay,
+        empty_batch,
+    )
+    from woodoku.env import PACKED_OBSERVATION_N, observation_space_d, action_space_d
 
 
 @pytest.mark.parametrize("length", [(5)])
@@ -162,3 +171,217 @@ def test_sample_from_experience(
     assert samples[0].shape == (min(exp.index, batch_size),) + observation_space_d
     assert samples[1].shape == (min(exp.index, batch_size),) + action_space_d
     assert samples[2].shape == (min(exp.index, batch_size),)
+
+
+def _episodes(
+    lengths: list[int], seed: int
+) -> list[tuple[Float[np.ndarray, "*state"], Int[np.ndarray, "*action"], float, Float[np.ndarray, "*state"]]]:
+    """Chained experiences of episodes of the given lengths, with 0/1 cells and a small streak like observations."""
+    rng = np.random.default_rng(seed)
+    experiences = []
+    for length in lengths:
+        states = rng.integers(2, size=(length + 1,) + observation_space_d).astype(np.float_)
+        states[:, -1] = rng.integers(10, size=length + 1)
+        for i in range(length):
+            action = rng.integers(9, size=action_space_d)
+            experiences.append((states[i], action, float(rng.integers(-5, 50)), states[i + 1]))
+    return experiences
+
+
+def _gather(exp: ExperienceReplay, slots: Int[np.ndarray, "batch"]) -> ExperienceBatch:
+    batch = empty_batch(len(slots))
+    exp._gather(slots, batch)
+    return batch
+
+
+@pytest.mark.parametrize("replay", [CompactExperienceReplay, PackedExperienceReplay])
+@pytest.mark.parametrize("length, lengths", [(64, [5, 1, 3, 10]), (16, [5, 1, 3, 10, 7, 2]), (7, [1, 1, 1, 1, 1, 4])])
+def test_compact_matches_collected(replay: type[CompactExperienceReplay], length: int, lengths: list[int]) -> None:
+    experiences = _episodes(lengths, seed=length)
+    exp = replay(length)
+    for experience in experiences:
+        exp.collect(experience)
+
+    # the experiences still stored are the most recent ones, in ring order starting after the last next state
+    slots = np.roll(np.arange(length), -(exp.index + 1))
+    slots = slots[exp.starts_experience[slots]]
+    assert len(exp) == len(slots)
+    expected = [np.array(column) for column in zip(*experiences[-len(slots) :])]
+    for stored, collected in zip(_gather(exp, slots), expected):
+        assert np.array_equal(stored, collected)
+
+
+def test_compact_episode_boundaries_take_a_slot() -> None:
+    exp = CompactExperienceReplay(64)
+    for experience in _episodes([5, 3], seed=0):
+        exp.collect(experience)
+    # 5 + 1 slots for the first episode, 3 + 1 for the second
+    assert exp.index == 9
+    assert len(exp) == 8
+    assert not exp.starts_experience[5]
+
+
+@pytest.mark.parametrize("replay", [CompactExperienceReplay, PackedExperienceReplay])
+def test_compact_sample_output_matches(replay: type[CompactExperienceReplay]) -> None:
+    experiences = _episodes([20, 20], seed=1)
+    dense, compact = ExperienceReplay(64), replay(64)
+    for experience in experiences:
+        dense.collect(experience)
+        compact.collect(experience)
+
+    dense_samples = dense.sample_from_experience(16)
+    compact_samples = compact.sample_from_experience(16)
+    for dense_sample, compact_sample in zip(dense_samples, compact_samples):
+        assert dense_sample.shape == compact_sample.shape
+        assert dense_sample.dtype == compact_sample.dtype
+
+    # every sampled experience is one that was collected
+    collected = {(s.tobytes(), a.tobytes(), r, n.tobytes()) for s, a, r, n in experiences}
+    for state, action, reward, next_state in zip(*(sample.numpy() for sample in compact_samples)):
+        assert (state.tobytes(), action.tobytes(), float(reward), next_state.tobytes()) in collected
+
+
+def test_compact_saturates_streak() -> None:
+    state = np.zeros(observation_space_d, dtype=np.float_)
+    state[-1] = 300
+    exp = CompactExperienceReplay(4)
+    exp.collect((state, np.zeros(action_space_d, dtype=np.int_), 0.0, state))
+    assert exp.state[0, -1] == 255
+
+
+def test_compact_memory() -> None:
+    dense, compact = ExperienceReplay(1000), CompactExperienceReplay(1000)
+    dense_bytes = dense.state.nbytes + dense.action.nbytes + dense.reward.nbytes + dense.next_state.nbytes
+    compact_bytes = (
+        compact.state.nbytes + compact.action.nbytes + compact.reward.nbytes + compact.starts_experience.nbytes
+    )
+    assert dense_bytes > 10 * compact_bytes
+
+
+def test_packed_memory() -> None:
+    exp = PackedExperienceReplay(1000)
+    assert exp.state.shape == (1000, PACKED_OBSERVATION_N)
+    assert exp.state.nbytes + exp.action.nbytes + exp.reward.nbytes + exp.starts_experience.nbytes == 29 * 1000
+
+
+@pytest.mark.parametrize("replay", [ExperienceReplay, CompactExperienceReplay, PackedExperienceReplay])
+def test_disk_backed_reopens(replay: type[ExperienceReplay], tmp_path: Path) -> None:
+    experiences = _episodes([6, 4, 9], seed=2)
+    directory = str(tmp_path / "replay")
+    exp = replay(16, directory=directory)
+    for experience in experiences[:10]:
+        exp.collect(experience)
+    exp.flush()
+    assert isinstance(exp.state, np.memmap)
+    flushed = (exp.index, exp.is_full, len(exp))
+    del exp
+
+    reopened = replay(16, directory=directory)
+    assert (reopened.index, reopened.is_full, len(reopened)) == flushed
+    in_memory = replay(16)
+    for experience in experiences[10:]:
+        reopened.collect(experience)
+    for experience in experiences:
+        in_memory.collect(experience)
+    slots = np.arange(16)
+    for expected, resumed in zip(_gather(in_memory, slots), _gather(reopened, slots)):
+        assert np.array_equal(expected, resumed)
+
+
+def test_disk_backed_is_sparse(tmp_path: Path) -> None:
+    exp = PackedExperienceReplay(1_000_000, directory=str(tmp_path))
+    assert (tmp_path / "state.npy").stat().st_blocks * 512 < exp.state.nbytes
+
+
+def test_disk_backed_checks_type_and_length(tmp_path: Path) -> None:
+    CompactExperienceReplay(16, directory=str(tmp_path))
+    with pytest.raises(ValueError):
+        CompactExperienceReplay(32, directory=str(tmp_path))
+    with pytest.raises(ValueError):
+        PackedExperienceReplay(16, directory=str(tmp_path))
+
+
+@pytest.mark.parametrize("replay", [ExperienceReplay, CompactExperienceReplay, PackedExperienceReplay])
+@pytest.mark.parametrize("sample_size", [1, 7, 40, 64])
+def test_sample_is_distinct(replay: type[ExperienceReplay], sample_size: int) -> None:
+    exp = replay(100)
+    for experience in _episodes([30, 1, 20, 9], seed=3):
+        exp.collect(experience)
+
+    batch = empty_batch(sample_size)
+    count = exp.sample_into(batch)
+    assert count == min(sample_size, len(exp))
+    # states of the episodes are random, so distinct experiences have distinct states
+    assert len({state.tobytes() for state in batch[0][:count]}) == count
+
+
+def test_sample_is_uniform() -> None:
+    exp = CompactExperienceReplay(64)
+    for experience in _episodes([10] * 10, seed=4):
+        exp.collect(experience)
+    counts = np.zeros(exp.length)
+    np.random.seed(0)
+    for _ in range(2000):
+        counts[exp._sample_indices(4)] += 1
+    assert (counts[~exp.starts_experience] == 0).all()
+    sampled = counts[exp.starts_experience]
+    assert sampled.min() > 0.6 * sampled.mean()
+
+
+def _stacked(experiences: list[tuple[np.ndarray, np.ndarray, float, np.ndarray]]) -> ExperienceBatch:
+    states, actions, rewards, next_states = (np.array(column) for column in zip(*experiences))
+    return states, actions, rewards, next_states
+
+
+@pytest.mark.parametrize("index, count", [(0, 3), (2, 5), (4, 9), (1, 20)])
+def test_collect_batch_matches_collect(index: int, count: int) -> None:
+    experiences = _episodes([count + index], seed=index)
+    dones = np.arange(count) % 3 == 0
+    batched, single = ExperienceReplay(6), ExperienceReplay(6)
+    for experience in experiences[:index]:
+        batched.collect(experience)
+        single.collect(experience)
+
+    batched.collect_batch(_stacked(experiences[index:]), dones)
+    for experience, done in zip(experiences[index:], dones):
+        single.collect(experience, bool(done))
+    assert (batched.index, batched.is_full) == (single.index, single.is_full)
+    for name in ("state", "action", "reward", "next_state", "done"):
+        assert np.array_equal(getattr(batched, name), getattr(single, name))
+
+
+def test_compact_collect_batch() -> None:
+    experiences = _episodes([4, 3], seed=5)
+    batched, single = CompactExperienceReplay(16), CompactExperienceReplay(16)
+    batched.collect_batch(_stacked(experiences))
+    for experience in experiences:
+        single.collect(experience)
+    assert np.array_equal(batched.state, single.state)
+    assert len(batched) == len(single) == 7
+
+
+@pytest.mark.parametrize("replay", [CompactExperienceReplay, PackedExperienceReplay])
+@pytest.mark.parametrize("length, lengths, split", [(16, [4, 3], 1), (7, [1, 2, 9, 3], 2), (9, [3, 3, 30], 5)])
+def test_compact_collect_batch_matches_collect(
+    replay: type[CompactExperienceReplay], length: int, lengths: list[int], split: int
+) -> None:
+    experiences = _episodes(lengths, seed=length)
+    dones = np.arange(len(experiences)) % 4 == 3
+    batched, single = replay(length), replay(length)
+    for experience, done in zip(experiences, dones):
+        single.collect(experience, bool(done))
+    batched.collect_batch(_stacked(experiences[:split]), dones[:split])
+    batched.collect_batch(_stacked(experiences[split:]), dones[split:])
+    assert (batched.index, batched.is_full, len(batched)) == (single.index, single.is_full, len(single))
+    for name in ("state", "action", "reward", "done", "starts_experience"):
+        assert np.array_equal(getattr(batched, name), getattr(single, name))
+
+
+def test_sample_done() -> None:
+    exp = ExperienceReplay(8)
+    states, actions, _, next_states = _stacked(_episodes([8], seed=6))
+    exp.collect_batch((states, actions, np.arange(8.0), next_states), np.arange(8) % 2 == 1)
+    batch, done = empty_batch(8), np.zeros(8, dtype=bool)
+    exp.sample_into(batch, done)
+    # the rewards are the indices of the experiences
+    assert np.array_equal(done, batch[2] % 2 == 1)
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+import torch
+
+from learn.src.data.experiences import ExperienceReplay
+from learn.src.data.n_step import NStepCollector
+from woodoku.env import observation_space_d, action_space_d
+
+
+def _step(collector: NStepCollector, t: int, rewards: list[float], dones: list[bool]) -> None:
+    n = len(rewards)
+    states = np.full((n,) + observation_space_d, float(t))
+    actions = np.full((n,) + action_space_d, t)
+    collector.collect_batch((states, actions, np.array(rewards), states + 1), np.array(dones))
+
+
+def test_folds_discounted_rewards() -> None:
+    replay = ExperienceReplay(16)
+    collector = NStepCollector(replay, 3, torch.tensor(0.5))
+    assert collector.discount == pytest.approx(0.125)
+    # two environments, the second of which ends its episode at step 1
+    steps = [([1.0, 1.0], [False, False]), ([2.0, 4.0], [False, True]), ([4.0, 8.0], [False, False])]
+    for t, (rewards, dones) in enumerate(steps):
+        _step(collector, t, rewards, dones)
+    assert replay.index == 2
+
+    assert replay.reward[0] == pytest.approx(1 + 0.5 * 2 + 0.25 * 4)
+    assert replay.reward[1] == pytest.approx(1 + 0.5 * 4)
+    assert list(replay.done[:2]) == [False, True]
+    # the experience of step 0 bootstraps from the next state of step 2
+    assert (replay.state[:2] == 0).all() and (replay.next_state[0] == 3).all()
+
+
+def test_collects_one_step_per_call() -> None:
+    replay = ExperienceReplay(32)
+    collector = NStepCollector(replay, 4, 0.9)
+    for t in range(10):
+        _step(collector, t, [1.0, 0.0, 1.0], [False, t == 5, False])
+    # steps 0 to 6 are complete, 7 to 9 wait for later steps
+    assert replay.index == 7 * 3
+    assert np.array_equal(replay.action[: replay.index : 3, 0], np.arange(7))
+
+
+def test_one_step_is_identity() -> None:
+    replay = ExperienceReplay(4)
+    collector = NStepCollector(replay, 1, 0.9)
+    _step(collector, 0, [5.0], [True])
+    assert replay.reward[0] == 5.0 and replay.done[0]
+    assert (replay.next_state[0] == 1).all()
@@ -0,0 +1,108 @@
+# pylint: disable=protected-access
+from pathlib import Path
+
+import numpy as np
+import pytest
+import torch
+
+from learn.src.data.prioritized_experiences import PrioritizedExperienceReplay
+from woodoku.env import observation_space_d, action_space_d
+
+
+def _collect(exp: PrioritizedExperienceReplay, count: int) -> None:
+    for i in range(count):
+        state = np.full(observation_space_d, float(i))
+        exp.collect((state, np.zeros(action_space_d, dtype=np.int_), float(i), state + 1))
+
+
+def test_new_experiences_get_max_priority() -> None:
+    exp = PrioritizedExperienceReplay(8, alpha=1.0)
+    _collect(exp, 3)
+    exp.update_priorities(np.array([0]), np.array([4.0]))
+    _collect(exp, 1)
+    assert exp._tree.get(np.array([3]))[0] == pytest.approx(4.0 + exp.epsilon)
+    assert exp.max_priority == pytest.approx(4.0 + exp.epsilon)
+
+
+def test_sampling_follows_priorities() -> None:
+    np.random.seed(0)
+    exp = PrioritizedExperienceReplay(16, alpha=1.0)
+    _collect(exp, 16)
+    exp.update_priorities(np.arange(16), np.where(np.arange(16) == 5, 15.0, 1.0))
+    counts = np.bincount(np.concatenate([exp._sample_indices(8) for _ in range(500)]), minlength=16)
+    # slot 5 holds half the total priority
+    assert counts[5] / counts.sum() == pytest.approx(0.5, abs=0.05)
+
+
+def test_sample_prioritized() -> None:
+    exp = PrioritizedExperienceReplay(16)
+    _collect(exp, 10)
+    state, action, reward, next_state, weights, indices = exp.sample_prioritized(4)
+    assert state.shape == next_state.shape == (4,) + observation_space_d
+    assert action.shape == (4,) + action_space_d
+    assert reward.shape == weights.shape == (4,)
+    assert indices.shape == (4,)
+    assert float(weights.max()) == 1.0
+    assert torch.equal(state[:, 0], reward)
+    assert (indices < 10).all()
+
+
+def test_sample_prioritized_from_empty_buffer() -> None:
+    exp = PrioritizedExperienceReplay(8)
+    state, action, reward, next_state, weights, indices = exp.sample_prioritized(4)
+    assert state.shape == next_state.shape == (0,) + observation_space_d
+    assert action.shape == (0,) + action_space_d
+    assert reward.shape == weights.shape == indices.shape == (0,)
+
+
+def test_importance_weights_undo_the_skew() -> None:
+    exp = PrioritizedExperienceReplay(4, alpha=1.0, beta=1.0)
+    _collect(exp, 4)
+    exp.update_priorities(np.arange(4), np.array([1.0, 1.0, 2.0, 4.0]) - exp.epsilon)
+    weights = exp.importance_weights(np.arange(4))
+    # weighted by the weights, each experience weighs as much as with uniform sampling
+    probabilities = np.array([1.0, 1.0, 2.0, 4.0]) / 8
+    assert np.allclose(weights * probabilities, (weights * probabilities)[0])
+
+
+def test_update_no_priorities() -> None:
+    exp = PrioritizedExperienceReplay(8, alpha=1.0)
+    _collect(exp, 3)
+    total, max_priority = exp._tree.total, exp.max_priority
+    exp.update_priorities(np.array([], dtype=np.int_), np.array([]))
+    assert exp._tree.total == total
+    assert exp.max_priority == max_priority
+
+
+def test_overwrite_resets_priority() -> None:
+    exp = PrioritizedExperienceReplay(4, alpha=1.0)
+    _collect(exp, 4)
+    exp.update_priorities(np.arange(4), np.array([0.0, 9.0, 0.0, 0.0]))
+    _collect(exp, 1)
+    assert exp._tree.get(np.array([0]))[0] == pytest.approx(exp.max_priority)
+    assert exp._tree.total == pytest.approx(exp._tree.get(np.arange(4)).sum())
+
+
+def test_disk_backed_reopens(tmp_path: Path) -> None:
+    exp = PrioritizedExperienceReplay(8, directory=str(tmp_path))
+    _collect(exp, 5)
+    exp.update_priorities(np.array([2]), np.array([7.0]))
+    exp.flush()
+    total, max_priority = exp._tree.total, exp.max_priority
+    del exp
+
+    reopened = PrioritizedExperienceReplay(8, directory=str(tmp_path))
+    assert reopened._tree.total == pytest.approx(total)
+    assert reopened.max_priority == max_priority
+
+
+def test_collect_batch_sets_priorities() -> None:
+    exp = PrioritizedExperienceReplay(8, alpha=1.0)
+    _collect(exp, 6)
+    exp.update_priorities(np.arange(6), np.full(6, 2.0))
+    states = np.zeros((4,) + observation_space_d)
+    exp.collect_batch((states, np.zeros((4,) + action_space_d, dtype=np.int_), np.zeros(4), states))
+    priorities = exp._tree.get(np.arange(8))
+    # slots 6, 7, 0 and 1 were written
+    assert np.allclose(priorities[[6, 7, 0, 1]], exp.max_priority)
+    assert np.allclose(priorities[2:6], 2.0 + exp.epsilon)
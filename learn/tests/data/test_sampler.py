@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+import torch
+
+from learn.src.data.experiences import ExperienceReplay, PackedExperienceReplay
+from learn.src.data.sampler import ReplaySampler
+from woodoku.env import observation_space_d, action_space_d
+
+
+def _filled(replay: ExperienceReplay, count: int) -> ExperienceReplay:
+    rng = np.random.default_rng(0)
+    for _ in range(count):
+        state = rng.integers(2, size=observation_space_d).astype(np.float_)
+        next_state = rng.integers(2, size=observation_space_d).astype(np.float_)
+        replay.collect((state, rng.integers(9, size=action_space_d), float(rng.integers(50)), next_state))
+    return replay
+
+
+@pytest.mark.parametrize("prefetch", [0, 1, 3])
+def test_sample_matches_sample_from_experience(prefetch: int) -> None:
+    replay = _filled(PackedExperienceReplay(64), 40)
+    expected = replay.sample_from_experience(8)
+    with ReplaySampler(replay, 8, prefetch=prefetch) as sampler:
+        for _ in range(5):
+            batch = sampler.sample()
+            for tensor, expected_tensor in zip(batch, expected):
+                assert tensor.shape == expected_tensor.shape
+                assert tensor.dtype == expected_tensor.dtype
+
+
+def test_sample_reuses_tensors() -> None:
+    replay = _filled(ExperienceReplay(64), 40)
+    sampler = ReplaySampler(replay, 8)
+    first = sampler.sample()[0]
+    second = sampler.sample()[0]
+    assert first.data_ptr() == second.data_ptr()
+
+
+def test_prefetched_batches_are_experiences() -> None:
+    replay = _filled(ExperienceReplay(64), 40)
+    collected = {replay.state[i].tobytes() for i in range(40)}
+    with ReplaySampler(replay, 16, prefetch=2) as sampler:
+        for _ in range(10):
+            state, _, _, _ = sampler.sample()
+            assert len({row.tobytes() for row in state.numpy()}) == 16
+            assert {row.tobytes() for row in state.numpy()} <= collected
+
+
+def test_sample_fewer_than_batch() -> None:
+    replay = _filled(ExperienceReplay(64), 3)
+    with ReplaySampler(replay, 8, prefetch=1) as sampler:
+        assert sampler.sample()[2].shape == (3,)
+
+
+def test_closed_sampler_raises() -> None:
+    sampler = ReplaySampler(_filled(ExperienceReplay(8), 8), 4, prefetch=2)
+    sampler.sample()
+    sampler.close()
+    with pytest.raises(RuntimeError):
+        sampler.sample()
+
+
+def test_prefetch_error_is_raised() -> None:
+    replay = _filled(ExperienceReplay(8), 8)
+    replay.state = None  # type: ignore[assignment]
+    with ReplaySampler(replay, 4, prefetch=2) as sampler:
+        with pytest.raises(TypeError):
+            sampler.sample()
+        with pytest.raises(RuntimeError):
+            sampler.sample()
+
+
+def test_tensors_share_memory() -> None:
+    replay = _filled(ExperienceReplay(8), 8)
+    state = ReplaySampler(replay, 4).sample()[0]
+    assert isinstance(state, torch.Tensor)
+    state.numpy()[0, 0] = 5.0
+    assert state[0, 0] == 5.0
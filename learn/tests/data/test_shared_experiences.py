@@ -0,0 +1,127 @@
+import pickle
+import time
+from multiprocessing import get_context
+from pathlib import Path
+from threading import Thread
+from typing import Iterator
+
+import numpy as np
+import pytest
+
+from learn.src.data.sampler import ReplaySampler
+from learn.src.data.shared_experiences import SharedExperienceReplay, SharedReplayWriter
+from woodoku.env import observation_space_d, action_space_d
+
+
+def _batch(rewards: list[float]) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    count = len(rewards)
+    states = np.repeat(np.array(rewards)[:, None], observation_space_d[0], axis=1)
+    return states, np.zeros((count, *action_space_d), dtype=np.int_), np.array(rewards), states + 1
+
+
+def _actor(writer: SharedReplayWriter, first: int, count: int) -> None:
+    for reward in range(first, first + count):
+        writer.collect_batch(_batch([float(reward)]))
+    writer.close()
+
+
+@pytest.fixture(name="replay")
+def fixture_replay() -> Iterator[SharedExperienceReplay]:
+    with SharedExperienceReplay(12, num_writers=3) as replay:
+        yield replay
+
+
+def test_writers_fill_their_share(replay: SharedExperienceReplay) -> None:
+    replay.writer(0).collect_batch(_batch([1.0, 2.0, 3.0, 4.0, 5.0, 6.0]))
+    replay.writer(2).collect_batch(_batch([7.0]))
+    assert len(replay) == 5
+    assert np.array_equal(replay.reward, [5, 6, 3, 4, 0, 0, 0, 0, 7, 0, 0, 0])
+    stats = replay.stats()
+    assert (stats.size, stats.length, stats.collected, stats.sampled) == (5, 12, 7, 0)
+    assert np.array_equal(stats.fill, [1.0, 0.0, 0.25])
+
+    states, _, rewards, next_states = replay.sample_from_experience(10)
+    assert sorted(rewards.tolist()) == [3.0, 4.0, 5.0, 6.0, 7.0]
+    assert np.array_equal(states[:, 0], rewards)
+    assert np.array_equal(next_states[:, 0], rewards + 1)
+    assert replay.stats().sampled == 5
+
+
+def test_collect_in_processes() -> None:
+    with SharedExperienceReplay(400, num_writers=4) as replay:
+        processes = [
+            get_context("fork").Process(target=_actor, args=(replay.writer(i), 100 * i, 100)) for i in range(4)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        assert len(replay) == 400
+        with ReplaySampler(replay, 400) as sampler:
+            assert sorted(sampler.sample()[2].tolist()) == list(range(400))
+
+
+def test_pickled_writer_resumes(replay: SharedExperienceReplay) -> None:
+    replay.writer(1).collect_batch(_batch([1.0, 2.0, 3.0]))
+    writer = pickle.loads(pickle.dumps(replay.writer(1)))
+    assert writer.index == 3
+    writer.collect_batch(_batch([4.0, 5.0]))
+    writer.close()
+    assert np.array_equal(replay.reward[4:8], [5, 2, 3, 4])
+
+
+def test_backpressure_waits_for_sampling() -> None:
+    with SharedExperienceReplay(16, num_writers=2, max_lead=4) as replay:
+        writer = replay.writer(0)
+        writer.collect_batch(_batch([1.0, 2.0, 3.0, 4.0]))
+        blocked = Thread(target=writer.collect_batch, args=(_batch([5.0]),))
+        blocked.start()
+        time.sleep(0.05)
+        assert blocked.is_alive()
+        assert len(replay.sample_from_experience(2)[0]) == 2
+        blocked.join(timeout=5)
+        assert not blocked.is_alive()
+        assert len(replay) == 5
+        assert replay.stats().waited[0] >= 0.05
+
+
+def test_close_wakes_waiting_writers() -> None:
+    replay = SharedExperienceReplay(8, num_writers=1, max_lead=1)
+    writer = replay.writer(0)
+    writer.collect_batch(_batch([1.0]))
+    errors: list[BaseException] = []
+
+    def collect() -> None:
+        try:
+            writer.collect_batch(_batch([2.0]))
+        except RuntimeError as error:
+            errors.append(error)
+
+    blocked = Thread(target=collect)
+    blocked.start()
+    time.sleep(0.02)
+    # the writer keeps its own mapping of the shared memory, so it sees the buffer close
+    replay.closed[0] = True
+    blocked.join(timeout=5)
+    assert len(errors) == 1
+    writer.close()
+    replay.close()
+
+
+def test_buffer_cannot_collect(replay: SharedExperienceReplay) -> None:
+    with pytest.raises(TypeError, match="SharedReplayWriter"):
+        replay.collect_batch(_batch([1.0]))
+    state, action, reward, next_state = _batch([1.0])
+    with pytest.raises(TypeError, match="SharedReplayWriter"):
+        replay.collect((state[0], action[0], float(reward[0]), next_state[0]))
+
+
+def test_snapshot_round_trip(replay: SharedExperienceReplay, tmp_path: Path) -> None:
+    replay.writer(2).collect_batch(_batch([1.0, 2.0]))
+    replay.save(str(tmp_path))
+    with SharedExperienceReplay(12, num_writers=3) as restored:
+        restored.load(str(tmp_path))
+        assert np.array_equal(restored.reward, replay.reward)
+        assert restored.writer(2).index == 2
+        with pytest.raises(ValueError):
+            restored.load(str(tmp_path), lazy=True)
@@ -0,0 +1,119 @@
+# pylint: disable=protected-access
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from learn.src.data.experiences import CompactExperienceReplay, ExperienceReplay, PackedExperienceReplay
+from learn.src.data.prioritized_experiences import PrioritizedExperienceReplay
+from learn.src.data.snapshot import read_arrays, write_arrays
+from woodoku.env import observation_space_d, action_space_d
+
+
+def _filled(replay: ExperienceReplay, count: int) -> ExperienceReplay:
+    rng = np.random.default_rng(count)
+    for i in range(count):
+        state = rng.integers(2, size=observation_space_d).astype(np.float_)
+        replay.collect((state, rng.integers(9, size=action_space_d), float(i), state[::-1].copy()), done=i % 5 == 4)
+    return replay
+
+
+def _assert_same(expected: ExperienceReplay, restored: ExperienceReplay) -> None:
+    assert (restored.index, restored.is_full, len(restored)) == (expected.index, expected.is_full, len(expected))
+    for name, array in expected._arrays.items():
+        assert np.array_equal(restored._arrays[name], array), name
+
+
+@pytest.mark.parametrize(
+    "replay", [ExperienceReplay, CompactExperienceReplay, PackedExperienceReplay, PrioritizedExperienceReplay]
+)
+@pytest.mark.parametrize("compress", [False, True])
+def test_round_trip(replay: type[ExperienceReplay], compress: bool, tmp_path: Path) -> None:
+    saved = _filled(replay(16), 21)
+    saved.save(str(tmp_path), compress)
+    restored = replay(16)
+    assert restored.load(str(tmp_path)) is None
+    _assert_same(saved, restored)
+
+
+@pytest.mark.parametrize("replay", [ExperienceReplay, PackedExperienceReplay, PrioritizedExperienceReplay])
+def test_lazy_load(replay: type[ExperienceReplay], tmp_path: Path) -> None:
+    saved = _filled(replay(16), 11)
+    saved.save(str(tmp_path))
+    restored = replay(16)
+    thread = restored.load(str(tmp_path), lazy=True)
+    assert thread is not None
+    assert len(restored.sample_from_experience(4)[0]) == 4
+    thread.join()
+    _assert_same(saved, restored)
+
+    # collecting into the restored buffer leaves the snapshot as it was saved
+    _filled(restored, 30)
+    again = replay(16)
+    again.load(str(tmp_path))
+    _assert_same(saved, again)
+
+
+def test_lazy_load_of_compressed_raises(tmp_path: Path) -> None:
+    _filled(ExperienceReplay(8), 3).save(str(tmp_path), compress=True)
+    with pytest.raises(ValueError):
+        ExperienceReplay(8).load(str(tmp_path), lazy=True)
+
+
+@pytest.mark.parametrize("replay", [ExperienceReplay, PackedExperienceReplay, PrioritizedExperienceReplay])
+def test_disk_backed_load(replay: type[ExperienceReplay], tmp_path: Path) -> None:
+    saved = _filled(replay(8), 5)
+    saved.save(str(tmp_path / "snapshot"))
+    disk = str(tmp_path / "disk")
+    restored = replay(8, directory=disk)
+    with pytest.raises(ValueError):
+        restored.load(str(tmp_path / "snapshot"), lazy=True)
+    assert len(restored) == 0
+
+    assert restored.load(str(tmp_path / "snapshot")) is None
+    restored.flush()
+    del restored
+    # the snapshot reached the files of the buffer, not only its meta
+    _assert_same(saved, replay(8, directory=disk))
+
+
+def test_resave_replaces_other_compression(tmp_path: Path) -> None:
+    _filled(ExperienceReplay(8), 3).save(str(tmp_path), compress=True)
+    saved = _filled(ExperienceReplay(8), 5)
+    saved.save(str(tmp_path))
+    assert not (tmp_path / "state.npy.gz").exists()
+    restored = ExperienceReplay(8)
+    restored.load(str(tmp_path))
+    _assert_same(saved, restored)
+
+
+def test_load_checks_type_and_length(tmp_path: Path) -> None:
+    _filled(CompactExperienceReplay(16), 3).save(str(tmp_path))
+    with pytest.raises(ValueError):
+        CompactExperienceReplay(32).load(str(tmp_path))
+    with pytest.raises(ValueError):
+        PackedExperienceReplay(16).load(str(tmp_path))
+    with pytest.raises(ValueError):
+        CompactExperienceReplay(16, observation_dtype=np.float32).load(str(tmp_path))
+
+
+def test_disk_backed_buffer_saves(tmp_path: Path) -> None:
+    saved = _filled(PackedExperienceReplay(16, directory=str(tmp_path / "replay")), 9)
+    saved.save(str(tmp_path / "snapshot"))
+    restored = PackedExperienceReplay(16)
+    restored.load(str(tmp_path / "snapshot"))
+    _assert_same(saved, restored)
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_arrays_stream_in_chunks(compress: bool, tmp_path: Path) -> None:
+    arrays: dict[str, np.ndarray] = {
+        "rows": np.arange(70, dtype=np.int16).reshape(35, 2),
+        "flat": np.arange(9, dtype=np.float32),
+    }
+    # chunks of 3 rows, ending with a partial one
+    write_arrays(arrays, str(tmp_path), compress, chunk_bytes=12)
+    read = {name: np.zeros_like(array) for name, array in arrays.items()}
+    read_arrays(read, str(tmp_path), chunk_bytes=12)
+    for name, array in arrays.items():
+        assert np.array_equal(read[name], array)
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from learn.src.data.sum_tree import SumTree
+
+
+@pytest.mark.parametrize("capacity", [1, 5, 8, 100])
+def test_total_and_get(capacity: int) -> None:
+    tree = SumTree(capacity)
+    priorities = np.random.default_rng(capacity).random(capacity)
+    tree.update(np.arange(capacity), priorities)
+    assert tree.total == pytest.approx(priorities.sum())
+    assert np.array_equal(tree.get(np.arange(capacity)), priorities)
+
+
+def test_find_matches_cumulative_sum() -> None:
+    tree = SumTree(10)
+    priorities = np.array([0.0, 1.0, 2.0, 0.0, 0.5, 0.0, 3.0, 0.0, 0.0, 1.5])
+    tree.update(np.arange(10), priorities)
+    values = np.linspace(0, tree.total, 1000, endpoint=False)
+    expected = np.searchsorted(np.cumsum(priorities), values, side="right")
+    assert np.array_equal(tree.find(values), expected)
+
+
+def test_find_never_returns_zero_priority() -> None:
+    tree = SumTree(6)
+    tree.update(np.array([1, 2]), np.array([0.1, 0.2]))
+    assert set(tree.find(np.array([0.0, 0.1, 0.3, tree.total, tree.total * 2]))) <= {1, 2}
+
+
+def test_update_keeps_sums() -> None:
+    tree = SumTree(16)
+    tree.update(np.arange(16), np.ones(16))
+    tree.update(np.array([3, 3, 7]), np.array([5.0, 2.0, 0.0]))
+    assert tree.total == pytest.approx(16 - 1 - 1 + 2)
+    # every inner node is the sum of its children
+    inner = np.arange(1, tree.leaves)
+    assert np.allclose(tree.nodes[inner], tree.nodes[2 * inner] + tree.nodes[2 * inner + 1])
+
+
+def test_backed_by_given_array() -> None:
+    nodes = np.zeros(SumTree.size(5))
+    tree = SumTree(5, nodes)
+    tree.update(np.array([4]), np.array([2.0]))
+    assert nodes[1] == 2.0
@@ -0,0 +1,92 @@
+# pylint: disable=protected-access
+import numpy as np
+import torch
+from torch.nn import functional
+
+from config import ACTION_N, OBSERVATION_N
+from learn.src.models.conv_q_network import ConvQNetwork
+from learn.src.models.model import DQN_Network
+from learn.src.models.train_model import get_actions
+from woodoku.vec_env import VecWoodokuGameEnv
+
+
+def _states(n: int) -> torch.Tensor:
+    """Observations a few placements into n games, with various streaks."""
+    env = VecWoodokuGameEnv(n, seed=1)
+    observations = env.reset()
+    for _ in range(5):
+        masks = env.action_mask()
+        observations, _, _ = env.step(np.array([np.argwhere(mask)[-1] for mask in masks]))
+    states = torch.as_tensor(observations).float()
+    states[:, -1] = torch.arange(n) % 4
+    return states
+
+
+def test_q_map_shape() -> None:
+    network = ConvQNetwork([8, 4])
+    states = torch.rand(5, OBSERVATION_N)
+    assert network(states).shape == (5, ACTION_N)
+    assert network(states[0]).shape == (ACTION_N,)
+    assert network(states.reshape(5, 1, OBSERVATION_N)).shape == (5, 1, ACTION_N)
+
+
+def test_matches_footprint_convolution() -> None:
+    network = ConvQNetwork([8])
+    states = _states(6)
+    n = len(states)
+    with torch.no_grad():
+        # the 5x5 footprints of every anchor, the cells off the board occupied
+        board = functional.pad(states[:, :81].reshape(n, 1, 9, 9), (0, 4, 0, 4), value=1.0)
+        footprints = board.unfold(2, 5, 1).unfold(3, 5, 1).reshape(n, 81, 25)
+        inputs = torch.cat([footprints, states[:, -1:, None].expand(n, 81, 1)], dim=2)
+        anchors = torch.tanh(network.footprint(inputs))
+        shapes = network.shape_encoder(states[:, 81:-1].reshape(n, 3, 25))
+        expected = torch.einsum("bkd,bad->bka", shapes, anchors).reshape(n, ACTION_N)
+        assert torch.allclose(network(states), expected, atol=1e-5)
+
+
+def test_inference_follows_weight_updates() -> None:
+    network = ConvQNetwork([8])
+    states = _states(4)
+    with torch.inference_mode():
+        before = network(states)
+    optimizer = torch.optim.SGD(network.parameters(), lr=0.1)
+    network(states).pow(2).mean().backward()
+    optimizer.step()
+    with torch.inference_mode():
+        after = network(states)
+    with torch.no_grad():
+        assert not torch.allclose(before, after)
+        assert torch.equal(after, network(states))
+
+
+def test_inference_follows_writes_through_data() -> None:
+    network = ConvQNetwork([8])
+    target = ConvQNetwork([8])
+    states = _states(4)
+    with torch.inference_mode():
+        before = target(states)
+        # as a target network update copies the weights, without bumping the version of the parameters
+        for parameter, source in zip(target.parameters(), network.parameters()):
+            parameter.data.copy_(source.data)
+        after = target(states)
+        assert not torch.allclose(before, after)
+        assert torch.equal(after, network(states))
+
+
+def test_dqn_network_option() -> None:
+    model = DQN_Network([16], lr=1e-3, conv=True)
+    assert sum(parameter.numel() for parameter in model._policy_net.parameters()) < 1000
+    states = _states(3)
+    model.optimizer.zero_grad()
+    model.policy_net(states).sum().backward()  # type: ignore[no-untyped-call]
+    model.optimizer.step()
+    with torch.no_grad():
+        assert not torch.equal(model.policy_net(states), model.target_net(states))
+        model.update_target_net()
+        assert torch.equal(model.policy_net(states), model.target_net(states))
+
+    env = VecWoodokuGameEnv(3, seed=2)
+    masks = env.action_mask()
+    actions = get_actions(model, env.reset(), masks, 0.0)
+    assert masks[np.arange(3), actions[:, 0], actions[:, 1], actions[:, 2]].all()
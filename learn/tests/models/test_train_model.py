@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+import torch
+
+from config import ACTION_N, BOARD_SIZE, NUM_SHAPES, OBSERVATION_N
+from learn.src.models.model import DQN_Network
+from learn.src.models.train_model import get_action, get_actions
+from woodoku.env import Action, action_space_d
+from woodoku.vec_env import VecWoodokuGameEnv
+
+
+def _model() -> DQN_Network:
+    return DQN_Network([OBSERVATION_N, 32, ACTION_N], lr=1e-3)
+
+
+def test_actions_are_legal() -> None:
+    model = _model()
+    env = VecWoodokuGameEnv(16, seed=0)
+    states = env.reset()
+    for epsilon in [0.0, 0.5, 1.0] * 20:
+        masks = env.action_mask()
+        actions = get_actions(model, states, masks, epsilon)
+        assert actions.shape == (16, 3)
+        playable = masks.any(axis=(1, 2, 3))
+        assert masks[np.arange(16), actions[:, 0], actions[:, 1], actions[:, 2]][playable].all()
+        states, _, _ = env.step(actions)
+
+
+def test_greedy_takes_best_legal_q_value() -> None:
+    model = _model()
+    rng = np.random.default_rng(0)
+    states = rng.random((8, OBSERVATION_N))
+    masks = rng.random((8, NUM_SHAPES, BOARD_SIZE, BOARD_SIZE)) < 0.3
+    with torch.inference_mode():
+        q_values = model.policy_net(torch.as_tensor(states).float()).numpy()
+    best = np.where(masks.reshape(8, ACTION_N), q_values, -np.inf).argmax(axis=1)
+    actions = get_actions(model, states, masks, 0.0)
+    assert np.array_equal(actions[:, 0] * BOARD_SIZE * BOARD_SIZE + actions[:, 1] * BOARD_SIZE + actions[:, 2], best)
+
+
+def test_exploring_is_uniform_among_legal_actions() -> None:
+    masks = np.zeros((4000, NUM_SHAPES, BOARD_SIZE, BOARD_SIZE), dtype=bool)
+    masks[:, 0, 1, 2] = masks[:, 2, 8, 0] = True
+    actions = get_actions(_model(), np.zeros((4000, OBSERVATION_N)), masks, 1.0)
+    first = (actions == [0, 1, 2]).all(axis=1)
+    assert (first | (actions == [2, 8, 0]).all(axis=1)).all()
+    assert 1800 < first.sum() < 2200
+
+
+def test_policy_net_without_a_q_value_per_action() -> None:
+    model = DQN_Network([OBSERVATION_N, 32, *action_space_d], lr=1e-3)
+    masks = np.ones((2, NUM_SHAPES, BOARD_SIZE, BOARD_SIZE), dtype=bool)
+    with pytest.raises(ValueError, match=f"each of the {ACTION_N} actions"):
+        get_actions(model, np.zeros((2, OBSERVATION_N)), masks, 0.0)
+
+
+def test_no_legal_action() -> None:
+    masks = np.zeros((2, NUM_SHAPES, BOARD_SIZE, BOARD_SIZE), dtype=bool)
+    assert not get_actions(_model(), np.zeros((2, OBSERVATION_N)), masks, 0.5).any()
+
+
+def test_get_action() -> None:
+    masks = np.zeros((NUM_SHAPES, BOARD_SIZE, BOARD_SIZE), dtype=bool)
+    masks[1, 4, 4] = True
+    action = get_action(_model(), np.zeros(OBSERVATION_N), masks, 0.0)
+    assert isinstance(action, Action)
+    assert action.data.tolist() == [1, 4, 4]
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+from jaxtyping import Float, Int
+from typeguard import TypeCheckError
+
+from learn.src.data.experiences import ExperienceReplay
+from learn.src.typechecking import is_typecheck_enabled, set_typecheck, typecheck
+from woodoku.env import action_space_d, observation_space_d
+
+
+@typecheck
+def _first_row(array: Float[np.ndarray, "n m"]) -> Float[np.ndarray, "m"]:
+    row: Float[np.ndarray, "m"] = array[0]
+    return row
+
+
+def test_typecheck_can_be_switched() -> None:
+    enabled = is_typecheck_enabled()
+    try:
+        set_typecheck(True)
+        with pytest.raises(TypeCheckError):
+            _first_row(np.zeros(3))
+        set_typecheck(False)
+        assert _first_row(np.zeros(3)) == 0
+    finally:
+        set_typecheck(enabled)
+
+
+class _Rows:
+    def __init__(self, array: Float[np.ndarray, "n m"]) -> None:
+        self.array = array
+
+    @typecheck
+    def rows(self, indices: Int[np.ndarray, "k"]) -> Float[np.ndarray, "k m"]:
+        rows: Float[np.ndarray, "k m"] = self.array[indices]
+        return rows
+
+
+def test_typecheck_passes_valid_calls() -> None:
+    assert _first_row(np.ones((2, 3))).shape == (3,)
+    assert _Rows(np.ones((2, 3))).rows(np.array([1, 0, 1])).shape == (3, 3)
+
+
+def test_typecheck_checks_methods() -> None:
+    enabled = is_typecheck_enabled()
+    rows = _Rows(np.ones((2, 3)))
+    try:
+        set_typecheck(True)
+        with pytest.raises(TypeCheckError):
+            rows.rows(np.array([0.5]))
+        with pytest.raises(TypeCheckError):
+            rows.rows(np.zeros((1, 1), dtype=np.int_))
+        set_typecheck(False)
+        assert rows.rows(np.zeros((1, 1), dtype=np.int_)).shape == (1, 1, 3)
+    finally:
+        set_typecheck(enabled)
+
+
+def test_typecheck_checks_sampling() -> None:
+    enabled = is_typecheck_enabled()
+    exp = ExperienceReplay(8)
+    state = np.zeros(observation_space_d)
+    exp.collect((state, np.zeros(action_space_d, dtype=np.int_), 1.0, state))
+    try:
+        set_typecheck(True)
+        with pytest.raises(TypeCheckError):
+            exp.sample_from_experience(1.5)  # type: ignore[arg-type]
+        assert len(exp.sample_from_experience(1)[2]) == 1
+    finally:
+        set_typecheck(enabled)
@@ -0,0 +1,100 @@
+from time import perf_counter
+from typing import NamedTuple, get_args
+
+import numpy as np
+from config import BOARD_SIZE, CONFIG_FILE
+from woodoku.entity.woodoku_board import Backend, WoodokuBoard
+from woodoku.entity.woodoku_shape import WoodokuShape
+from woodoku.shape_catalog import load_shape_catalog
+
+NUM_GAMES = 200
+REPEAT = 5
+
+
+class _Move(NamedTuple):
+    shape: WoodokuShape
+    x: int
+    y: int
+    mask: int
+    groups: tuple[int, ...]
+
+
+def _record_games(shapes: list[WoodokuShape], seed: int) -> list[list[_Move]]:
+    """Play random games and record every move with its placement mask and touched groups."""
+    rng = np.random.default_rng(seed)
+    games = []
+    for _ in range(NUM_GAMES):
+        board = WoodokuBoard("bitboard")
+        moves = []
+        while True:
+            shape = shapes[rng.integers(len(shapes))]
+            anchors = np.flatnonzero(board.legal_placements([shape])[0])
+            if anchors.size == 0:
+                break
+            x, y = divmod(int(rng.choice(anchors)), BOARD_SIZE)
+            board.add_shape(shape, x, y)
+            moves.append(_Move(shape, x, y, shape.get_placement_mask(x, y), shape.get_placement_groups(x, y)))
+        games.append(moves)
+    return games
+
+
+def _replay(games: list[list[_Move]], backend: Backend, incremental: bool) -> float:
+    """Replay the recorded moves, detecting and clearing groups after each one, and return the seconds taken."""
+    start = perf_counter()
+    for moves in games:
+        board = WoodokuBoard(backend)
+        rep = board._representation  # pylint: disable=protected-access
+        for move in moves:
+            rep.add_mask(move.mask)
+            # pylint: disable-next=protected-access
+            _, cleared = board._find_groups(move.groups) if incremental else board._find_groups()
+            rep.remove_mask(cleared)
+    return perf_counter() - start
+
+
+def _positions(games: list[list[_Move]], backend: Backend) -> list[tuple[WoodokuBoard, _Move]]:
+    """Every board of the recorded games together with the move played on it."""
+    positions = []
+    for moves in games:
+        board = WoodokuBoard(backend)
+        for move in moves:
+            positions.append((board.clone(), move))
+            board.add_shape(move.shape, move.x, move.y)
+    return positions
+
+
+def _branch(positions: list[tuple[WoodokuBoard, _Move]], undo: bool) -> float:
+    """Try the move of every position as a search would, with apply and undo or on a clone, and return the seconds
+    taken."""
+    start = perf_counter()
+    for board, move in positions:
+        if undo:
+            board.undo(board.apply(move.shape, move.x, move.y))
+        else:
+            board.clone().add_shape(move.shape, move.x, move.y)
+    return perf_counter() - start
+
+
+def main() -> None:
+    games = _record_games(load_shape_catalog(CONFIG_FILE), seed=0)
+    moves = sum(len(moves) for moves in games)
+    print(f"{NUM_GAMES} random games, {moves} placements, best of {REPEAT}")
+    for backend in get_args(Backend):
+        full = min(_replay(games, backend, incremental=False) for _ in range(REPEAT))
+        incremental = min(_replay(games, backend, incremental=True) for _ in range(REPEAT))
+        print(
+            f"{backend:>8}: full scan {full / moves * 1e6:6.2f} us/move, "
+            f"touched groups {incremental / moves * 1e6:6.2f} us/move ({full / incremental:.2f}x)"
+        )
+    for backend in get_args(Backend):
+        positions = _positions(games, backend)
+        undo = min(_branch(positions, undo=True) for _ in range(REPEAT))
+        clone = min(_branch(positions, undo=False) for _ in range(REPEAT))
+        print(
+            f"{backend:>8}: clone+add {clone / moves * 1e6:6.2f} us/move, "
+            f"apply+undo {undo / moves * 1e6:6.2f} us/move ({clone / undo:.2f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import random
+from time import perf_counter
+
+from config import CONFIG_FILE, NUM_SHAPES
+from woodoku.entity.woodoku_board import WoodokuBoard
+from woodoku.planner import ExpectimaxPlanner
+from woodoku.shape_catalog import load_shape_catalog
+from woodoku.utils import random_shapes
+
+NUM_GAMES = 4
+MAX_TURNS = 100
+
+
+def _play(planner: ExpectimaxPlanner, seed: int) -> tuple[int, int]:
+    """Play a game with the planner for at most MAX_TURNS turns and return its score and the number of turns."""
+    rng = random.Random(seed)
+    board = WoodokuBoard("bitboard")
+    for turn in range(1, MAX_TURNS + 1):
+        hand = random_shapes(planner.shapes, NUM_SHAPES, rng)
+        plan = planner.plan(board, hand)
+        for choice, x, y in plan.placements:
+            board.add_shape(hand[choice], x, y)
+        if len(plan.placements) < NUM_SHAPES:
+            break
+    return board.get_score(), turn
+
+
+def main() -> None:
+    shapes = load_shape_catalog(CONFIG_FILE)
+    print(f"{NUM_GAMES} games of at most {MAX_TURNS} turns")
+    for depth, width, samples in [(0, 1, 1), (0, 6, 1), (1, 3, 3)]:
+        planner = ExpectimaxPlanner(shapes, depth=depth, width=width, samples=samples, seed=0)
+        start = perf_counter()
+        games = [_play(planner, seed) for seed in range(NUM_GAMES)]
+        turns = sum(turns for _, turns in games)
+        print(
+            f"depth {depth} width {width} samples {samples}: mean score {sum(score for score, _ in games) / NUM_GAMES:7.1f}, "
+            f"{(perf_counter() - start) / turns * 1e3:7.1f} ms/turn, table hits {planner.table.hits}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,9 @@
-from woodoku.utils import get_all_shapes_from_file
+from woodoku.shape_catalog import load_shape_catalog
 from config import CONFIG_FILE
 
 
 def main() -> None:
-    for shape in get_all_shapes_from_file(CONFIG_FILE):
+    for shape in load_shape_catalog(CONFIG_FILE):
         print(shape)
 
 
@@ -0,0 +1,160 @@
+from typing import Iterable, Iterator, Sequence
+from jaxtyping import Bool, UInt64
+
+import numpy as np
+from config import BOARD_SIZE
+from woodoku.exceptions.shape_out_of_board_error import ShapeOutOfBoardError
+
+# A bitboard packs the occupancy of the board into a single python int. The block at (x, y) is stored in bit
+# x * BOARD_SIZE + y, which is the same order as `np.ravel` on the 2d board array.
+
+CELL_COUNT = BOARD_SIZE * BOARD_SIZE
+FULL_MASK = (1 << CELL_COUNT) - 1
+_MASK_BYTES = (CELL_COUNT + 7) // 8
+
+
+def cell_bit(x: int, y: int) -> int:
+    """Return the bitboard bit of the block at (x, y).
+
+    Args:
+        x (int): x coordinate
+        y (int): y coordinate
+
+    Raises:
+        ShapeOutOfBoardError: if (x, y) is not within the board
+    """
+    if not (0 <= x <= BOARD_SIZE - 1 and 0 <= y <= BOARD_SIZE - 1):
+        raise ShapeOutOfBoardError(x, y)
+    return 1 << (x * BOARD_SIZE + y)
+
+
+def coords_to_mask(blocks_coord: Iterable[tuple[int, int]]) -> int:
+    """Pack a collection of (x, y) block coordinates into a bitboard.
+
+    Raises:
+        ShapeOutOfBoardError: if any block in `blocks_coord` is not within the board
+    """
+    mask = 0
+    for x, y in blocks_coord:
+        mask |= cell_bit(x, y)
+    return mask
+
+
+def iter_bits(mask: int) -> Iterator[int]:
+    """Yield the index of every bit set in `mask`, lowest first. For a bitboard that is the cell x * BOARD_SIZE + y."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def mask_to_coords(mask: int) -> list[tuple[int, int]]:
+    return [divmod(cell, BOARD_SIZE) for cell in iter_bits(mask)]
+
+
+def mask_to_array(mask: int) -> Bool[np.ndarray, "BOARD_SIZE BOARD_SIZE"]:  # type: ignore[type-arg]
+    """Unpack a bitboard into a BOARD_SIZE x BOARD_SIZE boolean array."""
+    board: Bool[np.ndarray, "BOARD_SIZE BOARD_SIZE"] = masks_to_array([mask])[0]  # type: ignore[type-arg]
+    return board
+
+
+def masks_to_array(masks: Sequence[int]) -> Bool[np.ndarray, "n BOARD_SIZE BOARD_SIZE"]:  # type: ignore[type-arg]
+    """Unpack a batch of bitboards into a n x BOARD_SIZE x BOARD_SIZE boolean array in one call."""
+    packed = np.frombuffer(b"".join(mask.to_bytes(_MASK_BYTES, "little") for mask in masks), dtype=np.uint8)
+    bits = np.unpackbits(packed.reshape(len(masks), _MASK_BYTES), axis=1, count=CELL_COUNT, bitorder="little")
+    return bits.reshape((len(masks), BOARD_SIZE, BOARD_SIZE)).astype(bool)
+
+
+def array_to_mask(board: Bool[np.ndarray, "BOARD_SIZE BOARD_SIZE"]) -> int:  # type: ignore[type-arg]
+    """Pack a BOARD_SIZE x BOARD_SIZE boolean array into a bitboard."""
+    packed = np.packbits(np.asarray(board, dtype=bool).ravel(), bitorder="little")
+    return int.from_bytes(packed.tobytes(), "little")
+
+
+# A batch of bitboards is stored as an (n, WORDS) uint64 array, the low 64 bits of each board in word 0 and the rest
+# in word 1, so that numpy can do the bitwise operations of many boards at once.
+WORD_BITS = 64
+WORDS = (CELL_COUNT + WORD_BITS - 1) // WORD_BITS
+_WORD_MASK = (1 << WORD_BITS) - 1
+
+
+def masks_to_words(masks: Sequence[int]) -> UInt64[np.ndarray, "n WORDS"]:  # type: ignore[type-arg]
+    """Split a batch of bitboards into a n x WORDS uint64 array."""
+    words = [[(mask >> (WORD_BITS * word)) & _WORD_MASK for word in range(WORDS)] for mask in masks]
+    return np.array(words, dtype=np.uint64).reshape((len(masks), WORDS))
+
+
+def words_to_array(words: UInt64[np.ndarray, "*n WORDS"]) -> Bool[np.ndarray, "*n BOARD_SIZE BOARD_SIZE"]:  # type: ignore[type-arg]
+    """Unpack bitboards stored as uint64 words, with any leading batch shape, into boolean board arrays."""
+    batch = words.shape[:-1]
+    packed = np.ascontiguousarray(words, dtype="<u8").reshape((-1, WORDS)).view(np.uint8)
+    bits = np.unpackbits(packed, axis=1, count=CELL_COUNT, bitorder="little")
+    return bits.reshape(batch + (BOARD_SIZE, BOARD_SIZE)).astype(bool)
+
+
+def array_to_words(boards: Bool[np.ndarray, "*n BOARD_SIZE BOARD_SIZE"]) -> UInt64[np.ndarray, "*n WORDS"]:  # type: ignore[type-arg]
+    """Pack boolean board arrays, with any leading batch shape, into bitboards stored as uint64 words."""
+    batch = boards.shape[:-2]
+    bits = np.asarray(boards, dtype=bool).reshape((-1, CELL_COUNT))
+    packed = np.zeros((len(bits), WORDS * WORD_BITS // 8), dtype=np.uint8)
+    packed[:, :_MASK_BYTES] = np.packbits(bits, axis=1, bitorder="little")
+    words: UInt64[np.ndarray, "*n WORDS"] = packed.view("<u8").astype(np.uint64).reshape(batch + (WORDS,))  # type: ignore[type-arg]
+    return words
+
+
+def _group_coords() -> list[list[tuple[int, int]]]:
+    """The coordinates of every group: the rows, then the columns, then the 3x3 boxes in reading order."""
+    rows = [[(row, col) for col in range(BOARD_SIZE)] for row in range(BOARD_SIZE)]
+    cols = [[(row, col) for row in range(BOARD_SIZE)] for col in range(BOARD_SIZE)]
+    boxes = [
+        [(row, col) for row in range(x, x + 3) for col in range(y, y + 3)]
+        for x in range(0, BOARD_SIZE, 3)
+        for y in range(0, BOARD_SIZE, 3)
+    ]
+    return rows + cols + boxes
+
+
+# The bitboard of each of the 27 groups (complete rows, columns or 3x3 boxes), and the same groups as a
+# (27, CELL_COUNT) boolean matrix for vectorized reductions over 2d boards.
+GROUP_MASKS: tuple[int, ...] = tuple(coords_to_mask(coords) for coords in _group_coords())
+GROUP_MATRIX: Bool[np.ndarray, "27 CELL_COUNT"] = masks_to_array(GROUP_MASKS).reshape(  # type: ignore[type-arg]
+    (len(GROUP_MASKS), CELL_COUNT)
+)
+GROUP_MATRIX.setflags(write=False)
+GROUP_WORDS: UInt64[np.ndarray, "27 WORDS"] = masks_to_words(GROUP_MASKS)  # type: ignore[type-arg]
+GROUP_WORDS.setflags(write=False)
+
+# The bit set of the indices into GROUP_MASKS of the row, column and box each cell belongs to.
+CELL_GROUPS: tuple[int, ...] = tuple(
+    sum(1 << group for group, group_mask in enumerate(GROUP_MASKS) if group_mask >> cell & 1)
+    for cell in range(CELL_COUNT)
+)
+# Group fill counters packed into one int, GROUP_FILL_BITS bits per group of GROUP_MASKS, lowest group first. Adding
+# CELL_FILL[cell] counts the block at `cell` in its row, column and box at once.
+GROUP_FILL_BITS = BOARD_SIZE.bit_length()
+CELL_FILL: tuple[int, ...] = tuple(
+    sum(1 << group * GROUP_FILL_BITS for group in iter_bits(groups)) for groups in CELL_GROUPS
+)
+ALL_GROUPS: tuple[int, ...] = tuple(range(len(GROUP_MASKS)))
+
+
+def clear_complete_groups(
+    boards: UInt64[np.ndarray, "n WORDS"],  # type: ignore[type-arg]
+) -> tuple[UInt64[np.ndarray, "n WORDS"], Bool[np.ndarray, "n 27"]]:  # type: ignore[type-arg]
+    """Clear the complete groups of a batch of bitboards stored as uint64 words, all boards at once.
+
+    Returns:
+        tuple[UInt64[np.ndarray, "n WORDS"], Bool[np.ndarray, "n 27"]]: the boards without their complete groups, and
+        which groups of GROUP_MASKS were complete on each board
+    """
+    complete = ((boards[:, None, :] & GROUP_WORDS) == GROUP_WORDS).all(axis=-1)
+    cleared = np.bitwise_or.reduce(np.where(complete[:, :, None], GROUP_WORDS, 0), axis=1)
+    return boards & ~cleared, complete
+
+
+def groups_touching(mask: int) -> tuple[int, ...]:
+    """Return the indices into GROUP_MASKS of every group that contains a block of `mask`, in increasing order."""
+    groups = 0
+    for cell in iter_bits(mask):
+        groups |= CELL_GROUPS[cell]
+    return tuple(iter_bits(groups))
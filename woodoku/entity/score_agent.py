@@ -1,6 +1,18 @@
+from typing import NamedTuple
+from jaxtyping import Int
+
+import numpy as np
 from config import COMBO_POINTS, GROUP_POINTS, STREAK_POINTS
 
 
+class ScoreSnapshot(NamedTuple):
+    """The score, streak and combo of a ScoreAgent, to restore it to."""
+
+    score: int
+    streak: int
+    combo: int
+
+
 class ScoreAgent:
     __score: int
     __streak: int
@@ -51,3 +63,31 @@ class ScoreAgent:
 
     def get_combo(self) -> int:
         return self.__combo
+
+    def snapshot(self) -> ScoreSnapshot:
+        """Take a snapshot of the score, streak and combo, such that `restore` can bring them back."""
+        return ScoreSnapshot(self.__score, self.__streak, self.__combo)
+
+    def restore(self, snapshot: ScoreSnapshot) -> None:
+        """Set the score, streak and combo back to those of `snapshot`."""
+        self.__score, self.__streak, self.__combo = snapshot
+
+
+def batch_calculate_winning(
+    blocks: Int[np.ndarray, "n"], groups: Int[np.ndarray, "n"], streak: Int[np.ndarray, "n"]  # type: ignore[type-arg]
+) -> tuple[Int[np.ndarray, "n"], Int[np.ndarray, "n"]]:  # type: ignore[type-arg]
+    """Apply the scoring rules of ScoreAgent.calculate_winning to a batch of games at once.
+
+    Precondition: blocks > 0, groups >= 0
+
+    Args:
+        blocks (Int[np.ndarray, "n"]): The number of blocks placed in each game
+        groups (Int[np.ndarray, "n"]): The number of groups completed in each game
+        streak (Int[np.ndarray, "n"]): The streak of each game before this placement
+
+    Returns:
+        tuple[Int[np.ndarray, "n"], Int[np.ndarray, "n"]]: The points gained and the new streak of each game
+    """
+    completed = groups > 0
+    gain = blocks + completed * (GROUP_POINTS + STREAK_POINTS * streak) + COMBO_POINTS * np.maximum(groups - 1, 0)
+    return gain, np.where(completed, streak + 1, 0)
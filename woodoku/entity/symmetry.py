@@ -0,0 +1,178 @@
+from typing import Callable, NamedTuple, Sequence
+from jaxtyping import Int, UInt64
+
+import numpy as np
+from config import BOARD_SIZE
+from woodoku.entity.bitboard import CELL_COUNT, WORDS, array_to_words, words_to_array
+from woodoku.entity.woodoku_shape import WoodokuShape
+
+# The symmetries of the square, which keep neighbouring cells neighbours and map the rows, columns and 3x3 boxes of
+# the board onto rows, columns and boxes. Transform t moves the block at (x, y) to DIHEDRAL[t](x, y, n), where n is
+# BOARD_SIZE - 1. Transform 0 is the identity.
+DIHEDRAL: tuple[Callable[[int, int, int], tuple[int, int]], ...] = (
+    lambda x, y, n: (x, y),
+    lambda x, y, n: (y, n - x),  # a quarter turn clockwise
+    lambda x, y, n: (n - x, n - y),  # a half turn
+    lambda x, y, n: (n - y, x),  # a quarter turn counterclockwise
+    lambda x, y, n: (y, x),  # the main diagonal mirror
+    lambda x, y, n: (n - x, y),  # the horizontal mirror
+    lambda x, y, n: (x, n - y),  # the vertical mirror
+    lambda x, y, n: (n - y, n - x),  # the anti-diagonal mirror
+)
+IDENTITY = 0
+
+_BYTE_BITS = 8
+
+
+def _cell_targets(transform: int) -> list[int]:
+    """The cell each cell of the board moves to under `transform`."""
+    targets = []
+    for cell in range(CELL_COUNT):
+        x, y = DIHEDRAL[transform](*divmod(cell, BOARD_SIZE), BOARD_SIZE - 1)
+        targets.append(x * BOARD_SIZE + y)
+    return targets
+
+
+def _byte_tables(targets: list[int]) -> list[list[int]]:
+    """The transformed bits of every value of every byte of a bitboard, for the cells to move to `targets`."""
+    tables = []
+    for start in range(0, CELL_COUNT, _BYTE_BITS):
+        table = [0] * (1 << _BYTE_BITS)
+        for value in range(1, 1 << _BYTE_BITS):
+            high = value.bit_length() - 1
+            moved = 1 << targets[start + high] if start + high < CELL_COUNT else 0
+            table[value] = table[value ^ (1 << high)] | moved
+        tables.append(table)
+    return tables
+
+
+_TARGETS: tuple[list[int], ...] = tuple(_cell_targets(transform) for transform in range(len(DIHEDRAL)))
+_TABLES: tuple[list[list[int]], ...] = tuple(_byte_tables(targets) for targets in _TARGETS)
+# the cell each cell of the transformed board comes from, for transforming arrays by indexing
+_SOURCES: Int[np.ndarray, "8 CELL_COUNT"] = np.argsort(np.array(_TARGETS), axis=1)  # type: ignore[type-arg]
+_INVERSES: tuple[int, ...] = tuple(_TARGETS.index(sources) for sources in _SOURCES.tolist())
+# shapes never change once built, so their transforms are kept
+_TRANSFORMED_SHAPES: dict[tuple[WoodokuShape, int], WoodokuShape] = {}
+
+
+def inverse_transform(transform: int) -> int:
+    """Return the transform that undoes `transform`."""
+    return _INVERSES[transform]
+
+
+def transform_mask(mask: int, transform: int) -> int:
+    """Transform a bitboard, a byte at a time."""
+    transformed = 0
+    for table in _TABLES[transform]:
+        transformed |= table[mask & 0xFF]
+        mask >>= _BYTE_BITS
+    return transformed
+
+
+def transform_words(
+    words: UInt64[np.ndarray, "*n WORDS"], transform: int  # type: ignore[type-arg]
+) -> UInt64[np.ndarray, "*n WORDS"]:  # type: ignore[type-arg]
+    """Transform bitboards stored as uint64 words, with any leading batch shape, all at once."""
+    cells = words_to_array(words).reshape(words.shape[:-1] + (CELL_COUNT,))
+    return array_to_words(cells[..., _SOURCES[transform]].reshape(words.shape[:-1] + (BOARD_SIZE, BOARD_SIZE)))
+
+
+def transform_shape(shape: WoodokuShape, transform: int) -> WoodokuShape:
+    """Return the shape `transform` turns `shape` into, pushed to the top left corner."""
+    transformed = _TRANSFORMED_SHAPES.get((shape, transform))
+    if transformed is None:
+        transformed = WoodokuShape([DIHEDRAL[transform](x, y, BOARD_SIZE - 1) for x, y in shape.get_coords()])
+        _TRANSFORMED_SHAPES[(shape, transform)] = transformed
+    return transformed
+
+
+def transform_placement(shape: WoodokuShape, x: int, y: int, transform: int) -> tuple[WoodokuShape, int, int]:
+    """Transform the placement of `shape` with its top left corner at (x, y).
+
+    Returns:
+        tuple[WoodokuShape, int, int]: the transformed shape and the top left corner it is placed at, covering the
+        transformed blocks of the placement
+    """
+    blocks = [DIHEDRAL[transform](bx, by, BOARD_SIZE - 1) for bx, by in shape.map_to_board_at(x, y)]
+    return WoodokuShape(blocks), min(bx for bx, _ in blocks), min(by for _, by in blocks)
+
+
+class Canonical(NamedTuple):
+    """The canonical form of a board and a hand
+
+    mask: the canonical bitboard
+    hand: the transformed shapes of the hand, ordered by their id
+    transform: the transform from the board to its canonical form
+    """
+
+    mask: int
+    hand: tuple[WoodokuShape, ...]
+    transform: int
+
+
+class BoardSymmetry:
+    """The symmetries under which boards, with the shapes drawn from a catalog, are equivalent
+
+    A symmetry of the square keeps the rows, columns and boxes of the board, so it keeps what clears and scores, and
+    keeps neighbouring cells neighbours, so it keeps where shapes fit once they are transformed too. A board and a hand
+    are then exactly as good as their transforms, as long as the transformed shapes can be drawn as well: only the
+    transforms under which the catalog is closed are used. Swapping bands of rows or stacks of columns also keeps the
+    groups, but it moves neighbouring cells apart, so that shapes fit elsewhere, and it is not used.
+
+    The canonical form of a board is the smallest of its transforms as a bitboard, ties broken by the hand, so every
+    equivalent board and hand share one form, which a cache keyed on it finds however the board was reached.
+    """
+
+    transforms: tuple[int, ...]
+
+    def __init__(self, shapes: Sequence[WoodokuShape]) -> None:
+        """
+        Args:
+            shapes (Sequence[WoodokuShape]): the catalog hands are drawn from
+        """
+        catalog = set(shapes)
+        self.transforms = tuple(
+            transform
+            for transform in range(len(DIHEDRAL))
+            if all(transform_shape(shape, transform) in catalog for shape in catalog)
+        )
+
+    def canonicalize(self, mask: int, hand: Sequence[WoodokuShape] = ()) -> Canonical:
+        """Find the canonical form of the bitboard `mask` with the shapes `hand`.
+
+        Args:
+            mask (int): the bitboard of the board
+            hand (Sequence[WoodokuShape]): the shapes of the hand, in any order
+
+        Returns:
+            Canonical: the canonical board and hand, and the transform that leads to them
+        """
+        best = Canonical(mask, tuple(sorted(hand, key=WoodokuShape.get_id)), IDENTITY)
+        for transform in self.transforms[1:]:
+            transformed = transform_mask(mask, transform)
+            if transformed > best.mask:
+                continue
+            shapes = tuple(sorted((transform_shape(shape, transform) for shape in hand), key=WoodokuShape.get_id))
+            if transformed < best.mask or [shape.get_id() for shape in shapes] < [
+                shape.get_id() for shape in best.hand
+            ]:
+                best = Canonical(transformed, shapes, transform)
+        return best
+
+    def canonicalize_words(
+        self, words: UInt64[np.ndarray, "n WORDS"]  # type: ignore[type-arg]
+    ) -> tuple[UInt64[np.ndarray, "n WORDS"], Int[np.ndarray, "n"]]:  # type: ignore[type-arg]
+        """Find the canonical form of a batch of boards stored as uint64 words, all at once.
+
+        Returns:
+            tuple[UInt64[np.ndarray, "n WORDS"], Int[np.ndarray, "n"]]: the canonical boards, the same as `canonicalize`
+            finds without a hand, and the transform that leads to each
+        """
+        cells = words_to_array(words).reshape((len(words), CELL_COUNT))
+        transforms = np.array(self.transforms)
+        moved = cells[:, _SOURCES[transforms]].reshape((len(words), len(transforms), BOARD_SIZE, BOARD_SIZE))
+        candidates = array_to_words(moved)
+        # the smallest bitboard has the smallest high word, then the smallest low word, the first transform on ties
+        order = np.lexsort([candidates[..., word] for word in range(WORDS)], axis=-1)[:, 0]
+        rows = np.arange(len(words))
+        return candidates[rows, order], transforms[order]
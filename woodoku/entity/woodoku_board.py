@@ -1,10 +1,28 @@
-from typing import Iterable
-from jaxtyping import Bool
+from abc import ABC, abstractmethod
+from typing import Iterable, Literal, NamedTuple, Optional, Sequence
+from jaxtyping import Bool, Int, UInt64
 
 import numpy as np
 from art import text2art
 from config import BOARD_SIZE
-from woodoku.entity.score_agent import ScoreAgent
+from woodoku.entity.bitboard import (
+    CELL_COUNT,
+    CELL_FILL,
+    FULL_MASK,
+    GROUP_FILL_BITS,
+    GROUP_MASKS,
+    GROUP_MATRIX,
+    array_to_mask,
+    clear_complete_groups,
+    coords_to_mask,
+    iter_bits,
+    mask_to_array,
+    mask_to_coords,
+    masks_to_array,
+    masks_to_words,
+    words_to_array,
+)
+from woodoku.entity.score_agent import ScoreAgent, ScoreSnapshot, batch_calculate_winning
 from woodoku.entity.woodoku_shape import WoodokuShape
 from woodoku.exceptions.shape_out_of_board_error import ShapeOutOfBoardError
 from woodoku.ui.utils import (
@@ -36,23 +54,17 @@ from woodoku.ui.utils import (
 # the length of the square game board
 
 
-class _WoodokuBoardRepresentation:
-    """Private data class representing the low-level implementation of the board
+class _AbstractWoodokuBoardRepresentation(ABC):
+    """Private interface shared by the low-level implementations of the board
 
-    The top-left block's coordinate is (0, 0).
-    The last block on the top row is (0, n - 1).
-    The first block on the bottom row is (n - 1, 0).
-    The bottom-right block's coordinate is (n - 1, n - 1).
+    Blocks can be addressed either by a list of (x, y) coordinates or by a bitboard mask (see woodoku.entity.bitboard)
+    where the block (x, y) is bit x * BOARD_SIZE + y.
 
-    _board: an 2d array to record the occupancy of each position on the game board. The value is set to True when
-    the position occupied
+    _board: the occupancy of each position on the game board as a 2d array
     """
 
     _board: Bool[np.ndarray, "BOARD_SIZE*BOARD_SIZE"]  # type: ignore[type-arg]
 
-    def __init__(self) -> None:
-        self._board = np.full((BOARD_SIZE, BOARD_SIZE), False)
-
     def add_blocks(self, blocks_coord: Iterable[tuple[int, int]]) -> None:
         """
         Mark each position specified in blocks_coord as True to indicate that the position is occupied.
@@ -63,9 +75,7 @@ class _WoodokuBoardRepresentation:
         Raises:
             ShapeOutOfBoundError: if any block in `blocks` is invalid
         """
-        for row, col in blocks_coord:
-            self.__validate((row, col))
-            self._board[row, col] = True
+        self.add_mask(coords_to_mask(blocks_coord))
 
     def remove_blocks(self, blocks_coord: Iterable[tuple[int, int]]) -> None:
         """
@@ -77,9 +87,7 @@ class _WoodokuBoardRepresentation:
         Raises:
             ShapeOutOfBoundError: if any block in `blocks` is invalid
         """
-        for row, col in blocks_coord:
-            self.__validate((row, col))
-            self._board[row, col] = False
+        self.remove_mask(coords_to_mask(blocks_coord))
 
     def is_occupied(self, blocks_coord: Iterable[tuple[int, int]]) -> bool:
         """Check if each block has is occupied. If all of those blocks are
@@ -94,11 +102,7 @@ class _WoodokuBoardRepresentation:
         Raises:
             ShapeOutOfBoundError: if any block in `blocks` is invalid
         """
-        for row, col in blocks_coord:
-            self.__validate((row, col))
-            if not self._board[row, col]:
-                return False
-        return True
+        return self.is_mask_occupied(coords_to_mask(blocks_coord))
 
     def is_not_occupied(self, blocks_coord: Iterable[tuple[int, int]]) -> bool:
         """Check if each block is empty. If all of those blocks are empty,
@@ -113,28 +117,54 @@ class _WoodokuBoardRepresentation:
         Raises:
             ShapeOutOfBoundError: if any block in `blocks` is invalid
         """
-        for row, col in blocks_coord:
-            self.__validate((row, col))
-            if self._board[row, col]:
-                return False
-        return True
+        return self.is_mask_free(coords_to_mask(blocks_coord))
 
-    def get_board_data(self) -> Bool[np.ndarray, "BOARD_SIZE*BOARD_SIZE"]:  # type: ignore[type-arg]
-        return self._board
+    @abstractmethod
+    def add_mask(self, mask: int) -> None:
+        """Mark every block set in the bitboard `mask` as occupied."""
 
-    @staticmethod
-    def __validate(block: tuple[int, int]) -> None:
-        """validate if block is within the 9x9 board. raise Error if not.
+    @abstractmethod
+    def remove_mask(self, mask: int) -> None:
+        """Mark every block set in the bitboard `mask` as not occupied."""
+
+    @abstractmethod
+    def is_mask_occupied(self, mask: int) -> bool:
+        """Check if every block set in the bitboard `mask` is occupied."""
+
+    @abstractmethod
+    def is_mask_free(self, mask: int) -> bool:
+        """Check if every block set in the bitboard `mask` is empty."""
+
+    @abstractmethod
+    def get_mask(self) -> int:
+        """Return the occupied blocks as a bitboard."""
+
+    @abstractmethod
+    def find_complete_groups(self) -> tuple[int, int]:
+        """Find every complete row, column or 3x3 box.
+
+        Returns:
+            tuple[int, int]: the number of complete groups and the bitboard of their blocks
+        """
+
+    @abstractmethod
+    def find_complete_groups_among(self, groups: Iterable[int]) -> tuple[int, int]:
+        """Find the complete groups among `groups`, checking each of them in O(1).
 
         Args:
-            block (tuple[int, int]): The block to be validated
+            groups (Iterable[int]): the indices into GROUP_MASKS to check
 
-        Raises:
-            ShapeOutOfBoardError: when some block is not valid
+        Returns:
+            tuple[int, int]: the number of complete groups and the bitboard of their blocks
         """
-        x, y = block
-        if not (0 <= x <= BOARD_SIZE - 1 and 0 <= y <= BOARD_SIZE - 1):
-            raise ShapeOutOfBoardError(x, y)
+
+    @abstractmethod
+    def copy(self) -> "_AbstractWoodokuBoardRepresentation":
+        """An independent copy of the representation"""
+
+    @abstractmethod
+    def get_board_data(self) -> Bool[np.ndarray, "BOARD_SIZE*BOARD_SIZE"]:  # type: ignore[type-arg]
+        """Return the occupancy of the board as a 2d array."""
 
     def __str__(self) -> str:
         """
@@ -152,6 +182,7 @@ class _WoodokuBoardRepresentation:
          To highlight every non-overlapping 3X3 blocks, two vertical and two horizontal lines are bolded
          and colored red.
         """
+        board = self.get_board_data()
         result = ""
         horizontal_bar = HORIZONTAL * 5
         bold_horizontal_bar = BOLD_HORIZONTAL * 5
@@ -188,7 +219,7 @@ class _WoodokuBoardRepresentation:
                 row_str = f"{row // 2}  {VERTICAL}"  # print x coordinate
                 for col in range(BOARD_SIZE):
                     pos = "     "
-                    if self._board[row // 2, col]:
+                    if board[row // 2, col]:
                         pos = f"  {green(BLOCK)}  "
                     # since the vertical line at index 0 is drawn separately, the border of every 3X3 blocks is
                     # at col = 2 and col = 5
@@ -207,41 +238,369 @@ class _WoodokuBoardRepresentation:
         return result
 
 
+_GROUP_FILL_FIELD = (1 << GROUP_FILL_BITS) - 1
+
+
+class _WoodokuBoardRepresentation(_AbstractWoodokuBoardRepresentation):
+    """Private data class representing the low-level implementation of the board
+
+    The top-left block's coordinate is (0, 0).
+    The last block on the top row is (0, n - 1).
+    The first block on the bottom row is (n - 1, 0).
+    The bottom-right block's coordinate is (n - 1, n - 1).
+
+    _board: an 2d array to record the occupancy of each position on the game board. The value is set to True when
+    the position occupied
+    _cells: a flat memoryview of _board, indexed by the bitboard bit of each block, so that adding or removing a mask
+    only writes its own blocks, each one cheaper than a numpy item assignment
+    _occupied: the bitboard of occupied blocks, kept in step with _board so that checking whether a mask fits is a
+    single integer operation rather than a look at the array
+    _fills: the number of occupied blocks in each group of GROUP_MASKS, packed GROUP_FILL_BITS bits per group into
+    one int, kept up to date as blocks are added and removed so that checking whether a group is complete does not need
+    to look at the board
+    _stale: whether _board was handed out writable since _occupied and _fills were last derived from it, in which case
+    the next operation derives them again
+    """
+
+    __board: Bool[np.ndarray, "BOARD_SIZE*BOARD_SIZE"]  # type: ignore[type-arg]
+    _cells: memoryview
+    _occupied: int
+    _fills: int
+    _stale: bool
+
+    def __init__(self) -> None:
+        self.__board = np.full((BOARD_SIZE, BOARD_SIZE), False)
+        self._cells = self.__board.reshape(CELL_COUNT).data
+        self._occupied = 0
+        self._fills = 0
+        self._stale = False
+
+    @property
+    def _board(self) -> Bool[np.ndarray, "BOARD_SIZE*BOARD_SIZE"]:  # type: ignore[type-arg]
+        """The board array, writable in place. The occupancy and the group fill counters are derived from it again on
+        the next operation, so write through a fresh `_board` rather than one kept across operations."""
+        self._stale = True
+        return self.__board
+
+    @_board.setter
+    def _board(self, board: Bool[np.ndarray, "BOARD_SIZE*BOARD_SIZE"]) -> None:  # type: ignore[type-arg]
+        # the flat view must share the memory of the board, which a reshape only does for a contiguous one
+        self.__board = np.ascontiguousarray(board)
+        self._cells = self.__board.reshape(CELL_COUNT).data
+        self._derive_occupancy()
+
+    def _derive_occupancy(self) -> None:
+        """Set the occupancy and the group fill counters from the board array."""
+        self._occupied = array_to_mask(self.__board)
+        self._fills = sum(CELL_FILL[cell] for cell in iter_bits(self._occupied))
+        self._stale = False
+
+    def add_mask(self, mask: int) -> None:
+        if self._stale:
+            self._derive_occupancy()
+        added = mask & ~self._occupied
+        self._occupied |= added
+        self._write_blocks(added, True)
+
+    def remove_mask(self, mask: int) -> None:
+        if self._stale:
+            self._derive_occupancy()
+        removed = mask & self._occupied
+        self._occupied ^= removed
+        self._write_blocks(removed, False)
+
+    def is_mask_occupied(self, mask: int) -> bool:
+        return self.get_mask() & mask == mask
+
+    def is_mask_free(self, mask: int) -> bool:
+        return not self.get_mask() & mask
+
+    def get_mask(self) -> int:
+        if self._stale:
+            self._derive_occupancy()
+        return self._occupied
+
+    def find_complete_groups(self) -> tuple[int, int]:
+        # count the occupied blocks of all 27 groups in one matrix product
+        complete = GROUP_MATRIX @ self.__board.ravel().astype(np.int_) == BOARD_SIZE
+        cleared = GROUP_MATRIX[complete].any(axis=0)
+        return int(complete.sum()), array_to_mask(cleared)
+
+    def find_complete_groups_among(self, groups: Iterable[int]) -> tuple[int, int]:
+        if self._stale:
+            self._derive_occupancy()
+        count = 0
+        cleared = 0
+        fills = self._fills
+        for group in groups:
+            if fills >> group * GROUP_FILL_BITS & _GROUP_FILL_FIELD == BOARD_SIZE:
+                count += 1
+                cleared |= GROUP_MASKS[group]
+        return count, cleared
+
+    def copy(self) -> "_WoodokuBoardRepresentation":
+        # pylint: disable=protected-access, unused-private-member
+        copied = _WoodokuBoardRepresentation.__new__(_WoodokuBoardRepresentation)
+        copied.__board = self.__board.copy()
+        copied._cells = copied.__board.reshape(CELL_COUNT).data
+        copied._occupied = self.get_mask()
+        copied._fills = self._fills
+        copied._stale = False
+        return copied
+
+    def _write_blocks(self, changed: int, occupied: bool) -> None:
+        """Mark the blocks in `changed` as `occupied` in the array and the fill counters of their groups. Only those
+        blocks and the groups they belong to are touched, so placing and undoing a shape costs O(|shape|)."""
+        cells = self._cells
+        fills = 0
+        # iter_bits inlined, a generator costs more than the writes on the few blocks of a shape
+        while changed:
+            low = changed & -changed
+            changed ^= low
+            cell = low.bit_length() - 1
+            cells[cell] = occupied
+            fills += CELL_FILL[cell]
+        self._fills += fills if occupied else -fills
+
+    @property
+    def _group_fill(self) -> list[int]:
+        """The fill counter of each group of GROUP_MASKS, unpacked."""
+        if self._stale:
+            self._derive_occupancy()
+        return [self._fills >> group * GROUP_FILL_BITS & _GROUP_FILL_FIELD for group in range(len(GROUP_MASKS))]
+
+    def get_board_data(self) -> Bool[np.ndarray, "BOARD_SIZE*BOARD_SIZE"]:  # type: ignore[type-arg]
+        # a read-only view, writing to it would bypass the occupancy and the group fill counters
+        board = self.__board.view()
+        board.setflags(write=False)
+        return board
+
+
+class _WoodokuBitboardRepresentation(_AbstractWoodokuBoardRepresentation):
+    """Private data class representing the board as a single 81-bit integer
+
+    Block (x, y) is stored in bit x * BOARD_SIZE + y, so placing, fit-checking and clearing a whole shape or group is
+    a single integer operation on its mask instead of a loop over its blocks.
+
+    _mask: the bitboard of occupied blocks
+    _written: the array _board last handed out, which _mask is derived from again on the next operation, or None
+    """
+
+    _mask: int
+    _written: Optional[Bool[np.ndarray, "BOARD_SIZE*BOARD_SIZE"]]  # type: ignore[type-arg]
+
+    def __init__(self) -> None:
+        self._mask = 0
+        self._written = None
+
+    @property
+    def _board(self) -> Bool[np.ndarray, "BOARD_SIZE*BOARD_SIZE"]:  # type: ignore[type-arg]
+        """The board as a 2d array, writable in place for parity with _WoodokuBoardRepresentation. The bitboard is
+        derived from it again on the next operation."""
+        self._written = mask_to_array(self.get_mask())
+        return self._written
+
+    @_board.setter
+    def _board(self, board: Bool[np.ndarray, "BOARD_SIZE*BOARD_SIZE"]) -> None:  # type: ignore[type-arg]
+        self._mask = array_to_mask(board)
+        self._written = None
+
+    def add_mask(self, mask: int) -> None:
+        self._mask = self.get_mask() | mask
+
+    def remove_mask(self, mask: int) -> None:
+        self._mask = self.get_mask() & ~mask & FULL_MASK
+
+    def is_mask_occupied(self, mask: int) -> bool:
+        return self.get_mask() & mask == mask
+
+    def is_mask_free(self, mask: int) -> bool:
+        return not self.get_mask() & mask
+
+    def get_mask(self) -> int:
+        if self._written is not None:
+            self._mask = array_to_mask(self._written)
+            self._written = None
+        return self._mask
+
+    def find_complete_groups(self) -> tuple[int, int]:
+        groups = 0
+        cleared = 0
+        board = self.get_mask()
+        for group_mask in GROUP_MASKS:
+            if board & group_mask == group_mask:
+                groups += 1
+                cleared |= group_mask
+        return groups, cleared
+
+    def find_complete_groups_among(self, groups: Iterable[int]) -> tuple[int, int]:
+        # a group is complete when its mask is fully occupied, which is already an O(1) check on the bitboard, so no
+        # fill counters are kept
+        count = 0
+        cleared = 0
+        board = self.get_mask()
+        for group in groups:
+            group_mask = GROUP_MASKS[group]
+            if board & group_mask == group_mask:
+                count += 1
+                cleared |= group_mask
+        return count, cleared
+
+    def copy(self) -> "_WoodokuBitboardRepresentation":
+        copied = _WoodokuBitboardRepresentation()
+        copied._mask = self.get_mask()  # pylint: disable=protected-access
+        return copied
+
+    def get_board_data(self) -> Bool[np.ndarray, "BOARD_SIZE*BOARD_SIZE"]:  # type: ignore[type-arg]
+        return mask_to_array(self.get_mask())
+
+
+Backend = Literal["array", "bitboard"]
+
+_BACKENDS: dict[str, type[_AbstractWoodokuBoardRepresentation]] = {
+    "array": _WoodokuBoardRepresentation,
+    "bitboard": _WoodokuBitboardRepresentation,
+}
+
+
+class UndoToken(NamedTuple):
+    """What WoodokuBoard.apply changed, for WoodokuBoard.undo to revert it
+
+    placed: the bitboard of the blocks of the placed shape
+    cleared: the bitboard of the blocks of the groups the shape completed, which were cleared
+    score: the score, streak and combo before the shape was placed
+    """
+
+    placed: int
+    cleared: int
+    score: ScoreSnapshot
+
+
+class Afterstates(NamedTuple):
+    """Every legal placement of a hand of shapes, and the board and score each of them leads to
+
+    shape_choice: the index of the placed shape in the hand
+    x: the x coordinate of the placement
+    y: the y coordinate of the placement
+    words: the board after each placement, complete groups cleared, as bitboards split into uint64 words (see
+    woodoku.entity.bitboard.masks_to_words)
+    complete: which groups of GROUP_MASKS each placement completed, and so cleared
+    rewards: the points each placement scores
+    streaks: the streak after each placement
+    """
+
+    shape_choice: Int[np.ndarray, "P"]  # type: ignore[type-arg]
+    x: Int[np.ndarray, "P"]  # type: ignore[type-arg]
+    y: Int[np.ndarray, "P"]  # type: ignore[type-arg]
+    words: UInt64[np.ndarray, "P WORDS"]  # type: ignore[type-arg]
+    complete: Bool[np.ndarray, "P 27"]  # type: ignore[type-arg]
+    rewards: Int[np.ndarray, "P"]  # type: ignore[type-arg]
+    streaks: Int[np.ndarray, "P"]  # type: ignore[type-arg]
+
+    @property
+    def boards(self) -> Bool[np.ndarray, "P BOARD_SIZE BOARD_SIZE"]:  # type: ignore[type-arg]
+        """The board after each placement as a 2d array"""
+        return words_to_array(self.words)
+
+
 class WoodokuBoard:
-    """A 9x9 Woodoku Board"""
+    """A 9x9 Woodoku Board
+
+    The board can be backed by a 2d numpy array ("array", the default) or by a single 81-bit integer ("bitboard"),
+    which turns placement, fit-checking and clearing into single mask operations.
+
+    For tree search, `apply` places a shape and returns an UndoToken that `undo` takes to revert the placement, and
+    `clone` copies the board from its compact state, both far cheaper than a deepcopy of the board.
+    """
 
     __score_agent: ScoreAgent
-    _representation: _WoodokuBoardRepresentation
+    _representation: _AbstractWoodokuBoardRepresentation
 
-    def __init__(self) -> None:
+    def __init__(self, backend: Backend = "array") -> None:
         self.__score_agent = ScoreAgent()
-        self._representation = _WoodokuBoardRepresentation()
+        self._representation = _BACKENDS[backend]()
 
     def can_add_shape_to_board(self, shape: WoodokuShape) -> bool:
         """Check if the woodoku shape can fit into the board. If all current
         shapes are not be able to add, the game fails.
 
-        scans the board in a random fashion to average the complexity
-
         Args:
             shape (WoodokuShape): a woodoku shape for validation
 
         Returns:
             bool: if the `shape` fits the board
         """
-        rng = np.random.default_rng()
-        all_blocks = [(i, j) for i in range(9) for j in range(BOARD_SIZE)]
-        rng.shuffle(all_blocks)
-
-        for row, col in all_blocks:
-            try:
-                if self.can_add_shape_at_location(shape, x=row, y=col):
-                    return True
-            except ShapeOutOfBoardError:
-                # exceptions are ignored when checking can_add_shape_to_board
-                # as it is only for internal checking and avoids checking shapes that are out of the board
-                pass
-        return False
+        return bool(self._legal_anchors(shape))
+
+    def legal_placements(self, shapes: list[WoodokuShape]) -> Bool[np.ndarray, "n BOARD_SIZE BOARD_SIZE"]:  # type: ignore[type-arg]
+        """Find every location each shape can be placed at.
+
+        Entry [i, x, y] is True if `shapes[i]` can be placed with its top left corner at `(x, y)`, which is the same
+        as `can_add_shape_at_location(shapes[i], x, y)` but computed for all anchors at once.
+
+        Args:
+            shapes (list[WoodokuShape]): the shapes to place
+
+        Returns:
+            Bool[np.ndarray, "n BOARD_SIZE BOARD_SIZE"]: the mask of legal placements for each shape
+        """
+        return masks_to_array([self._legal_anchors(shape) for shape in shapes])
+
+    def afterstates(self, shapes: Sequence[WoodokuShape], availability: Optional[Sequence[bool]] = None) -> Afterstates:
+        """Find what every legal placement of `shapes` leads to, without changing the board.
+
+        The placements come in the order of `legal_placements`. They are all placed, cleared and scored at once on
+        the uint64 words of their bitboards, with the same rules as `add_shape`, so that a value network can score
+        every move of a hand in one pass.
+
+        Args:
+            shapes (Sequence[WoodokuShape]): the hand of shapes
+            availability (Optional[Sequence[bool]]): whether each shape can still be placed, all of them if None
+
+        Returns:
+            Afterstates: the placements and the boards, points and streaks they lead to
+        """
+        choices, anchors, masks = self._legal_placement_masks(shapes, availability)
+        board = masks_to_words([self._representation.get_mask()])
+        words, complete = clear_complete_groups(masks_to_words(masks) | board)
+        shape_choice = np.array(choices, dtype=np.int_)
+        blocks = np.array([len(shape) for shape in shapes], dtype=np.int_)[shape_choice]
+        rewards, streaks = batch_calculate_winning(
+            blocks, complete.sum(axis=1), np.full(len(choices), self.get_streak())
+        )
+        x, y = np.divmod(np.array(anchors, dtype=np.int_), BOARD_SIZE)
+        return Afterstates(shape_choice, x, y, words, complete, rewards, streaks)
+
+    def _legal_placement_masks(
+        self, shapes: Sequence[WoodokuShape], availability: Optional[Sequence[bool]]
+    ) -> tuple[list[int], list[int], list[int]]:
+        """Find the shape index, anchor and placement mask of every legal placement of the available `shapes`, in the
+        order of `legal_placements`."""
+        choices: list[int] = []
+        anchors: list[int] = []
+        masks: list[int] = []
+        for choice, shape in enumerate(shapes):
+            if availability is not None and not availability[choice]:
+                continue
+            placement_masks = shape.get_placement_masks()
+            for anchor in iter_bits(self._legal_anchors(shape)):
+                choices.append(choice)
+                anchors.append(anchor)
+                masks.append(placement_masks[anchor])
+        return choices, anchors, masks
+
+    def _legal_anchors(self, shape: WoodokuShape) -> int:
+        """Find every anchor `shape` can be placed at as a bitboard.
+
+        The block at offset `o` from anchor `a` is bit `a + o`, so shifting the free blocks right by `o` lines every
+        anchor up with that block. AND-ing the shifted boards for each block of the shape, restricted to the anchors
+        where the shape stays on the board, checks all anchors in a handful of integer operations.
+        """
+        free = ~self._representation.get_mask() & FULL_MASK
+        anchors = shape.get_anchor_mask()
+        for offset in shape.get_cell_offsets():
+            anchors &= free >> offset
+        return anchors
 
     def can_add_shape_at_location(self, shape: WoodokuShape, x: int, y: int) -> bool:
         """Check if the woodoku `shape` can be placed into the board at location
@@ -252,17 +611,11 @@ class WoodokuBoard:
             x (int): x coordinate
             y (int): y coordinate
 
-        Raises:
-            ShapeOutOfBoundError: if any block in `blocks` is invalid
-
         Returns:
-            bool: if `shape` can be added to `(x,y)`
+            bool: if `shape` can be added to `(x,y)`, False if any block of `shape` would be out of the board
         """
-        blocks = shape.map_to_board_at(x, y)
-        try:
-            return self._representation.is_not_occupied(blocks)
-        except ShapeOutOfBoardError:
-            return False
+        mask = shape.get_placement_mask(x, y)
+        return bool(mask) and self._representation.is_mask_free(mask)
 
     def add_shape(self, shape: WoodokuShape, x: int, y: int) -> None:
         """Add the shape to woodoku at coordinate (x, y). Only called if the shape
@@ -276,15 +629,66 @@ class WoodokuBoard:
             shape (WoodokuShape): The shape to be added
             x (int): x coordinate
             y (int): y coordinate
+
+        Raises:
+            ShapeOutOfBoardError: if any block of `shape` would be out of the board
+        """
+        self.apply(shape, x, y)
+
+    def apply(self, shape: WoodokuShape, x: int, y: int) -> UndoToken:
+        """Add the shape to woodoku at coordinate (x, y) as `add_shape` does, and return what `undo` needs to revert it
+
+        Args:
+            shape (WoodokuShape): The shape to be added
+            x (int): x coordinate
+            y (int): y coordinate
+
+        Returns:
+            UndoToken: the blocks placed and cleared and the score before the placement
+
+        Raises:
+            ShapeOutOfBoardError: if any block of `shape` would be out of the board
         """
         # add shape to block
-        shape_blocks = shape.map_to_board_at(x, y)
-        self._representation.add_blocks(shape_blocks)
+        shape_mask = shape.get_placement_mask(x, y)
+        if not shape_mask:
+            raise ShapeOutOfBoardError(x, y)
+        score = self.__score_agent.snapshot()
+        self._representation.add_mask(shape_mask)
 
-        # determine groups and clear the groups
-        groups, group_blocks = self._find_groups()
+        # determine groups and clear the groups, only the groups the shape touches can have been completed by it
+        groups, group_mask = self._find_groups(shape.get_placement_groups(x, y))
         self.__score_agent.calculate_winning(len(shape), groups)
-        self._representation.remove_blocks(group_blocks)
+        self._representation.remove_mask(group_mask)
+        return UndoToken(shape_mask, group_mask, score)
+
+    def undo(self, token: UndoToken) -> None:
+        """Revert the placement `token` was returned for. Placements are undone last applied first, so that the board
+        is the one the placement left.
+
+        The cleared blocks were all occupied right before clearing, and the placed blocks were all free before
+        placing, so the board is restored by filling the cleared blocks back and freeing the placed ones. Placed blocks
+        that were cleared again are free either way and left alone, so only the blocks that changed are written.
+
+        Args:
+            token (UndoToken): the token `apply` returned
+        """
+        self._representation.add_mask(token.cleared & ~token.placed)
+        self._representation.remove_mask(token.placed & ~token.cleared)
+        self.__score_agent.restore(token.score)
+
+    def clone(self) -> "WoodokuBoard":
+        """A copy of the board, made from its blocks and its score snapshot rather than with a deepcopy
+
+        Returns:
+            WoodokuBoard: a board with the same blocks, score, streak and combo, changed independently of this one
+        """
+        # pylint: disable=protected-access, unused-private-member
+        cloned = WoodokuBoard.__new__(WoodokuBoard)
+        cloned.__score_agent = ScoreAgent()
+        cloned.__score_agent.restore(self.__score_agent.snapshot())
+        cloned._representation = self._representation.copy()
+        return cloned
 
     def get_score(self) -> int:
         return self.__score_agent.get_score()
@@ -298,47 +702,33 @@ class WoodokuBoard:
     def get_board_data(self) -> Bool[np.ndarray, "BOARD_SIZE*BOARD_SIZE"]:  # type: ignore[type-arg]
         return self._representation.get_board_data()
 
-    def _find_groups(self) -> tuple[int, set[tuple[int, int]]]:
+    def get_mask(self) -> int:
+        """Return the occupied blocks as a bitboard, which both backends hold without looking at a board array."""
+        return self._representation.get_mask()
+
+    def _find_groups(self, groups: Optional[Iterable[int]] = None) -> tuple[int, int]:
         """Check current board and see if there is any groups such as
         complete rows, columns or 3x3 box and report them.
 
+        The 27 group masks are precomputed in woodoku.entity.bitboard. Without `groups`, every group is checked with a
+        single reduction over the board. With `groups`, only those groups are checked, each in O(1) against the fill
+        counters the representation keeps as blocks are added and removed. Either way the blocks to clear come back as
+        a bitboard, which handles overlapping groups for free.
+
         Terminology Reference:
         [Wikipedia Sudoku Glossary](https://en.wikipedia.org/wiki/Glossary_of_Sudoku#Terminology_and_grid_layout)
 
+        Args:
+            groups (Optional[Iterable[int]]): the indices into GROUP_MASKS to check, all groups if None
+
         Returns:
-            tuple[int, Set[tuple[int,int]]]:
+            tuple[int, int]:
                 1. Number of groups that is complete
-                2. Set of block coordinates for the group
+                2. Bitboard of the blocks in those groups
         """
-        groups = 0
-        rep = self._representation
-        group_blocks = set()  # use set to handle overlapping group removal
-        for index in range(BOARD_SIZE):
-            row_blocks = self._get_row_coords(index)
-            col_blocks = self._get_col_coords(index)
-            box_blocks = self._get_box_coords(index)
-
-            if rep.is_occupied(row_blocks):
-                groups += 1
-                group_blocks.update(row_blocks)
-
-            if rep.is_occupied(col_blocks):
-                groups += 1
-                group_blocks.update(col_blocks)
-
-            if rep.is_occupied(box_blocks):
-                groups += 1
-                group_blocks.update(box_blocks)
-
-        return groups, group_blocks
-
-    @staticmethod
-    def _get_row_coords(row_index: int) -> list[tuple[int, int]]:
-        return [(row_index, col) for col in range(BOARD_SIZE)]
-
-    @staticmethod
-    def _get_col_coords(col_index: int) -> list[tuple[int, int]]:
-        return [(row, col_index) for row in range(BOARD_SIZE)]
+        if groups is None:
+            return self._representation.find_complete_groups()
+        return self._representation.find_complete_groups_among(groups)
 
     @staticmethod
     def _get_box_coords(index: int) -> list[tuple[int, int]]:
@@ -355,22 +745,8 @@ class WoodokuBoard:
             list[tuple[int, int]]: All the coordinates in that 3x3 box
 
         """
-        # map to 3x3 coordinates
-        # index -> 3x3 coordinates
-        #  0 -> 0,0
-        #  1 -> 0,1
-        #  2 -> 0,2
-        #  3 -> 1,0
-        #  4 -> 1,1
-        #  5 -> 1,2
-        #  6 -> 2,0
-        #  7 -> 2,1
-        #  8 -> 2,2
-        x, y = index // 3, index % 3
-
-        # map to 9x9 coordinates
-        x, y = x * 3, y * 3
-        return [(row, col) for row in range(x, x + 3) for col in range(y, y + 3)]
+        # GROUP_MASKS holds the rows, then the columns, then the boxes in this order
+        return mask_to_coords(GROUP_MASKS[2 * BOARD_SIZE + index])
 
     def __str__(self) -> str:
         streak = self.get_streak()
@@ -1,17 +1,22 @@
 from __future__ import annotations
 
-from typing import Any, Iterable
+from typing import Any, Iterable, Optional, Sequence
 from jaxtyping import Float
 import numpy as np
-from config import MAX_SHAPE_SIZE
+from config import BOARD_SIZE, MAX_SHAPE_SIZE
 
+from woodoku.entity.bitboard import cell_bit, coords_to_mask, groups_touching
 from woodoku.ui.utils import BLOCK, green
 
 ROW_PADDING = 10
 BLOCK_PADDING = 3
 
 
-class WoodokuShape:
+# Every shape built so far, by key. See WoodokuShape.__new__
+_INTERNED: dict[int, WoodokuShape] = {}
+
+
+class WoodokuShape:  # pylint: disable=too-many-instance-attributes
     """A Woodoku shape to be place on the Woodoku board
 
     Example:
@@ -33,22 +38,96 @@ class WoodokuShape:
          Note that (0,0) and (0,1) is not in the list
     """
 
-    __coords: set[tuple[int, int]]
-
-    def __init__(self, coords: list[tuple[int, int]]):
-        self.__coords = set(self.__standardize(coords))
+    __slots__ = (
+        "__key",
+        "__coords",
+        "__height",
+        "__width",
+        "__mask",
+        "__shape_data",
+        "__rotated",
+        "__placement_masks",
+        "__placement_groups",
+        "__anchor_mask",
+    )
+
+    __key: int
+    __coords: tuple[tuple[int, int], ...]
+    __height: int
+    __width: int
+    __mask: int
+    __shape_data: Optional[Float[np.ndarray, "MAX_SHAPE_SIZE MAX_SHAPE_SIZE"]]  # type: ignore[type-arg]
+    __rotated: Optional[WoodokuShape]
+    __placement_masks: Optional[tuple[int, ...]]
+    __placement_groups: tuple[tuple[int, ...], ...]
+    __anchor_mask: int
+
+    def __new__(cls, coords: Iterable[tuple[int, int]]) -> WoodokuShape:
+        """Shapes are interned: constructing a shape equal to an existing one returns the existing object, so that its
+        cached data is shared and equality and hashing only look at its key.
+
+        Raises:
+            ValueError: if `coords` is empty or does not fit in a MAX_SHAPE_SIZE x MAX_SHAPE_SIZE box
+        """
+        coords = list(coords)
+        if not coords:
+            raise ValueError("A shape must have at least one block")
+        coords = sorted(cls.__standardize(coords))
+        if max(max(x, y) for x, y in coords) >= MAX_SHAPE_SIZE:
+            raise ValueError(f"A shape must fit in a {MAX_SHAPE_SIZE}x{MAX_SHAPE_SIZE} box, got {coords}")
+        # the canonical id of the shape: bit x * MAX_SHAPE_SIZE + y is set for each of its blocks
+        key = sum(1 << (x * MAX_SHAPE_SIZE + y) for x, y in coords)
+        shape = _INTERNED.get(key)
+        if shape is None:
+            shape = super().__new__(cls)
+            shape.__key = key
+            shape.__coords = tuple(coords)
+            shape.__height = max(x for x, _ in coords) + 1
+            shape.__width = max(y for _, y in coords) + 1
+            shape.__mask = coords_to_mask(coords)
+            shape.__shape_data = None
+            shape.__rotated = None
+            shape.__placement_masks = None
+            shape.__placement_groups = ()
+            shape.__anchor_mask = 0
+            _INTERNED[key] = shape
+        return shape
+
+    def __reduce__(self) -> tuple[type[WoodokuShape], tuple[list[tuple[int, int]]]]:
+        # unpickling goes through __new__ so that it interns too
+        return WoodokuShape, (list(self.__coords),)
 
     def get_shape_data(self) -> Float[np.ndarray, "MAX_SHAPE_SIZE*MAX_SHAPE_SIZE"]:  # type: ignore[type-arg]
         """Returns the shape data of this shape
 
+        The array is built on first use and cached on the shape, so it is read-only.
+
         Returns:
             Float[np.ndarray, "MAX_SHAPE_SIZE*MAX_SHAPE_SIZE"]: The shape data of this shape
         """
-        shape_data = np.zeros((MAX_SHAPE_SIZE, MAX_SHAPE_SIZE))
-        for x, y in self.__coords:
-            shape_data[x][y] = 1.0
+        if self.__shape_data is None:
+            shape_data = np.zeros((MAX_SHAPE_SIZE, MAX_SHAPE_SIZE))
+            for x, y in self.__coords:
+                shape_data[x][y] = 1.0
+            shape_data.setflags(write=False)
+            self.__shape_data = shape_data
 
-        return shape_data
+        return self.__shape_data
+
+    def get_id(self) -> int:
+        """Returns the canonical id of this shape, the same in every process: bit x * MAX_SHAPE_SIZE + y is set for each
+        block (x, y) of the shape"""
+        return self.__key
+
+    def get_mask(self) -> int:
+        """Returns the bitboard occupied by this shape with its top left corner at (0, 0)"""
+        return self.__mask
+
+    def get_height(self) -> int:
+        return self.__height
+
+    def get_width(self) -> int:
+        return self.__width
 
     @staticmethod
     def __standardize(coords: Iterable[tuple[int, int]]) -> set[tuple[int, int]]:
@@ -64,8 +143,8 @@ class WoodokuShape:
         smallest_y = min(list(y for _, y in coords))
         return set(list((x - smallest_x, y - smallest_y) for x, y in coords))
 
-    def get_coords(self) -> list[tuple[int, int]]:
-        return list(self.__coords)
+    def get_coords(self) -> tuple[tuple[int, int], ...]:
+        return self.__coords
 
     def map_to_board_at(self, x: int, y: int) -> list[tuple[int, int]]:
         """Maps the shape coordinates to map coordinates
@@ -77,7 +156,81 @@ class WoodokuShape:
         Returns:
             list[tuple[int, int]]: list of coordinates of shape on the board
         """
-        return [(x + row, y + col) for (row, col) in self.get_coords()]
+        return [(x + row, y + col) for (row, col) in self.__coords]
+
+    def get_placement_masks(self) -> tuple[int, ...]:
+        """Returns the bitboard occupied by this shape for every anchor on the board
+
+        The table is built on first use and cached on the shape. Entry x * BOARD_SIZE + y is the mask of
+        `map_to_board_at(x, y)`, or 0 if the shape would hang off the board at that anchor.
+
+        Returns:
+            tuple[int, ...]: BOARD_SIZE * BOARD_SIZE placement masks
+        """
+        if self.__placement_masks is None:
+            masks = []
+            for x in range(BOARD_SIZE):
+                for y in range(BOARD_SIZE):
+                    mask = 0
+                    if x + self.__height <= BOARD_SIZE and y + self.__width <= BOARD_SIZE:
+                        # the shape never wraps around a row at this anchor, so shifting its mask places it
+                        mask = self.__mask << (x * BOARD_SIZE + y)
+                        self.__anchor_mask |= cell_bit(x, y)
+                    masks.append(mask)
+            self.__placement_masks = tuple(masks)
+            self.__placement_groups = tuple(groups_touching(mask) for mask in masks)
+        return self.__placement_masks
+
+    def load_placements(self, masks: Sequence[int], groups: Sequence[tuple[int, ...]]) -> None:
+        """Install a placement table built elsewhere, such as one read back from a compiled shape catalog
+
+        Args:
+            masks (Sequence[int]): BOARD_SIZE * BOARD_SIZE placement masks, as returned by `get_placement_masks`
+            groups (Sequence[tuple[int, ...]]): the touched groups at each anchor, as returned by `get_placement_groups`
+        """
+        self.__placement_masks = tuple(masks)
+        self.__placement_groups = tuple(groups)
+        self.__anchor_mask = sum(1 << anchor for anchor, mask in enumerate(self.__placement_masks) if mask)
+
+    def get_placement_groups(self, x: int, y: int) -> tuple[int, ...]:
+        """Returns the indices into GROUP_MASKS of the rows, columns and boxes this shape touches at anchor (x, y)
+
+        Only these groups can be completed by placing the shape there. Built along with the placement masks.
+
+        Args:
+            x (int): The top left x coordinate of the shape on the board
+            y (int): The top left y coordinate of the shape on the board
+
+        Returns:
+            tuple[int, ...]: The touched groups, empty if any block of the shape would be out of the board
+        """
+        if not (0 <= x < BOARD_SIZE and 0 <= y < BOARD_SIZE):
+            return ()
+        self.get_placement_masks()
+        return self.__placement_groups[x * BOARD_SIZE + y]
+
+    def get_anchor_mask(self) -> int:
+        """Returns the bitboard of every anchor at which this shape lies entirely within the board"""
+        self.get_placement_masks()
+        return self.__anchor_mask
+
+    def get_cell_offsets(self) -> list[int]:
+        """Returns the bitboard offset (row * BOARD_SIZE + col) of each block of this shape from its anchor"""
+        return [row * BOARD_SIZE + col for row, col in self.__coords]
+
+    def get_placement_mask(self, x: int, y: int) -> int:
+        """Returns the bitboard occupied by this shape with its top left corner at (x, y)
+
+        Args:
+            x (int): The top left x coordinate of the shape on the board
+            y (int): The top left y coordinate of the shape on the board
+
+        Returns:
+            int: The placement mask, or 0 if any block of the shape would be out of the board
+        """
+        if not (0 <= x < BOARD_SIZE and 0 <= y < BOARD_SIZE):
+            return 0
+        return self.get_placement_masks()[x * BOARD_SIZE + y]
 
     def rotate(self) -> WoodokuShape:
         """
@@ -86,11 +239,11 @@ class WoodokuShape:
         Returns: The rotated shape.
 
         """
-        boarder_size = max(list(sum(self.__coords, ())))
-
-        new_coords = [(boarder_size - y, x) for x, y in self.__coords]
+        if self.__rotated is None:
+            # rotate within the MAX_SHAPE_SIZE box, the new shape is pushed back to the top left corner anyway
+            self.__rotated = WoodokuShape([(MAX_SHAPE_SIZE - 1 - y, x) for x, y in self.__coords])
 
-        return WoodokuShape(new_coords)
+        return self.__rotated
 
     def __len__(self) -> int:
         """Return the size of this shape
@@ -101,20 +254,10 @@ class WoodokuShape:
         return len(self.__coords)
 
     def __eq__(self, other: Any) -> bool:
-        if not isinstance(other, WoodokuShape):
-            return False
-
-        if len(other.get_coords()) != len(self.__coords):
-            return False
-
-        for coord in self.__coords:
-            if coord not in other.get_coords():
-                return False
-
-        return True
+        return isinstance(other, WoodokuShape) and other.get_id() == self.__key
 
     def __hash__(self) -> int:
-        return hash("WoodokuShape Salt" + str(self.__coords))
+        return hash(self.__key)
 
     def __str__(self) -> str:
         """each block in a WoodokuShape is drawn drawn using box-drawing characters
@@ -125,7 +268,7 @@ class WoodokuShape:
         for row in range(MAX_SHAPE_SIZE):
             row_str = ""
             for col in range(MAX_SHAPE_SIZE):
-                if (row, col) in self.__coords:
+                if self.__key >> (row * MAX_SHAPE_SIZE + col) & 1:
                     row_str += f"{green(BLOCK)}" + " " * (BLOCK_PADDING - 1)
                 else:
                     row_str += " " * (BLOCK_PADDING)
@@ -1,7 +1,9 @@
 from __future__ import annotations
-from jaxtyping import Int, Float
+from typing import Any, Optional
+from jaxtyping import Bool, Int, Float, UInt8
 
 import numpy as np
+from numpy.typing import DTypeLike
 
 from config import (
     BOARD_SIZE,
@@ -14,7 +16,22 @@ from config import (
 )
 from woodoku.entity.woodoku_board import WoodokuBoard
 from woodoku.entity.woodoku_shape import WoodokuShape
-from woodoku.utils import get_all_shapes_from_file, is_out_of_space, random_shapes
+from woodoku.shape_catalog import load_shape_catalog
+from woodoku.utils import random_shapes
+
+_SHAPES_START = BOARD_SIZE * BOARD_SIZE
+_SHAPE_N = MAX_SHAPE_SIZE * MAX_SHAPE_SIZE
+# the board and shape cells, all 0 or 1, are packed 8 per byte and followed by the streak in one byte
+_CELLS_N = OBSERVATION_N - 1
+_PACKED_CELLS_N = -(-_CELLS_N // 8)
+PACKED_OBSERVATION_N = _PACKED_CELLS_N + 1
+
+
+def _clip_streak(streak: Any, dtype: np.dtype) -> Any:
+    """Saturate the streak at the largest value of an integer observation dtype instead of letting it wrap around"""
+    if np.issubdtype(dtype, np.integer):
+        return np.minimum(streak, np.iinfo(dtype).max)
+    return streak
 
 
 class Observation:
@@ -36,22 +53,115 @@ class Observation:
         self.data = data
 
     @staticmethod
-    def from_game(board: WoodokuBoard, shapes: list[WoodokuShape]) -> Observation:
+    def from_game(
+        board: WoodokuBoard,
+        shapes: list[WoodokuShape],
+        out: Optional[np.ndarray] = None,
+        dtype: DTypeLike = np.float64,
+    ) -> Observation:
         """
         generate an observation from the game.
         """
-        data: Float[np.ndarray, "OBSERVATION_N"] = np.zeros(OBSERVATION_N)
+        return Observation(Observation.encode(board, shapes, out, dtype))
 
-        data[: BOARD_SIZE * BOARD_SIZE] = board.get_board_data().ravel()  # ravel() is a referencing flatten function
-        for i, shape in enumerate(shapes):
-            data[
-                BOARD_SIZE * BOARD_SIZE
-                + i * MAX_SHAPE_SIZE * MAX_SHAPE_SIZE : BOARD_SIZE * BOARD_SIZE
-                + (i + 1) * MAX_SHAPE_SIZE * MAX_SHAPE_SIZE
-            ] = shape.get_shape_data().ravel()
+    @staticmethod
+    def encode(
+        board: WoodokuBoard,
+        shapes: list[WoodokuShape],
+        out: Optional[np.ndarray] = None,
+        dtype: DTypeLike = np.float64,
+    ) -> Float[np.ndarray, "OBSERVATION_N"]:
+        """
+        Write the observation of the game into `out`, allocating it if None.
 
-        data[-1] = board.get_streak()
-        return Observation(data)
+        Args:
+            board: The board of the game.
+            shapes: The shapes to choose from.
+            out: An array of shape `Observation.shape` to write into, such as a row of a preallocated batch.
+            dtype: The dtype of the array allocated when `out` is None, uint8 and float32 are enough to hold the data.
+
+        Returns:
+            `out`, or the newly allocated array.
+        """
+        if out is None:
+            out = np.empty(OBSERVATION_N, dtype=dtype)
+
+        out[:_SHAPES_START] = board.get_board_data().ravel()  # ravel() is a referencing flatten function
+        for i in range(NUM_SHAPES):
+            start = _SHAPES_START + i * _SHAPE_N
+            # shapes cache their shape data, so this copies without allocating
+            out[start : start + _SHAPE_N] = shapes[i].get_shape_data().ravel() if i < len(shapes) else 0
+
+        out[-1] = _clip_streak(board.get_streak(), out.dtype)
+        return out
+
+    @staticmethod
+    def encode_batch(
+        boards: Bool[np.ndarray, "N BOARD_SIZE BOARD_SIZE"],
+        shape_data: Float[np.ndarray, "N NUM_SHAPES MAX_SHAPE_SIZE*MAX_SHAPE_SIZE"],
+        streaks: Int[np.ndarray, "N"],
+        out: Optional[np.ndarray] = None,
+        dtype: DTypeLike = np.float64,
+    ) -> Float[np.ndarray, "N OBSERVATION_N"]:
+        """
+        Write the observations of N games into the rows of `out`, allocating it if None.
+
+        Args:
+            boards: The board of each game.
+            shape_data: The shape data of the shapes each game chooses from.
+            streaks: The streak of each game.
+            out: An array of shape (N, OBSERVATION_N) to write into.
+            dtype: The dtype of the array allocated when `out` is None.
+
+        Returns:
+            `out`, or the newly allocated array.
+        """
+        n = len(boards)
+        if out is None:
+            out = np.empty((n, OBSERVATION_N), dtype=dtype)
+
+        out[:, :_SHAPES_START] = boards.reshape(n, _SHAPES_START)
+        out[:, _SHAPES_START:-1] = shape_data.reshape(n, NUM_SHAPES * _SHAPE_N)
+        out[:, -1] = _clip_streak(streaks, out.dtype)
+        return out
+
+    @staticmethod
+    def pack(data: Float[np.ndarray, "*batch OBSERVATION_N"]) -> UInt8[np.ndarray, "*batch PACKED_OBSERVATION_N"]:
+        """
+        Pack observations into PACKED_OBSERVATION_N (21) bytes each, the inverse of `unpack`.
+
+        Every board and shape cell takes one bit and the streak one byte, saturating at 255. Any nonzero cell is packed
+        as 1.
+        """
+        data = np.asarray(data)
+        packed = np.empty(data.shape[:-1] + (PACKED_OBSERVATION_N,), dtype=np.uint8)
+        packed[..., :-1] = np.packbits(data[..., :-1] != 0, axis=-1)
+        packed[..., -1] = _clip_streak(data[..., -1], packed.dtype)
+        return packed
+
+    @staticmethod
+    def unpack(
+        packed: UInt8[np.ndarray, "*batch PACKED_OBSERVATION_N"],
+        out: Optional[np.ndarray] = None,
+        dtype: DTypeLike = np.float64,
+    ) -> Float[np.ndarray, "*batch OBSERVATION_N"]:
+        """
+        Unpack observations packed by `pack`, a whole batch at once, into `out`, allocating it if None.
+
+        Args:
+            packed: The packed observations.
+            out: An array of shape (*batch, OBSERVATION_N) to write into.
+            dtype: The dtype of the array allocated when `out` is None.
+
+        Returns:
+            `out`, or the newly allocated array.
+        """
+        if out is None:
+            out = np.empty(packed.shape[:-1] + (OBSERVATION_N,), dtype=dtype)
+
+        out[..., :-1] = np.unpackbits(packed[..., :-1], axis=-1, count=_CELLS_N)
+        out[..., -1] = packed[..., -1]
+        return out
 
 
 class Action:
@@ -92,7 +202,7 @@ action_space_d = Action.shape
 
 
 # TODO: add documentation for reward function
-class WoodokuGameEnv:
+class WoodokuGameEnv:  # pylint: disable=too-many-instance-attributes
     """
     A woodoku game environment.
 
@@ -104,8 +214,14 @@ class WoodokuGameEnv:
     _all_shapes: list[WoodokuShape]
     _shapes: list[WoodokuShape]
     _availability: list[bool]
+    _observation_dtype: DTypeLike
 
-    def __init__(self) -> None:
+    def __init__(self, observation_dtype: DTypeLike = np.float64) -> None:
+        """
+        Args:
+            observation_dtype: The dtype of the observations, uint8 and float32 are enough to hold them.
+        """
+        self._observation_dtype = observation_dtype
         self.reset()
 
     def reset(self) -> Observation:
@@ -113,7 +229,7 @@ class WoodokuGameEnv:
         Reset the woodoku game env to initial Observation and return the initial Observation.
         """
         self._woodoku_board = WoodokuBoard()
-        self._all_shapes = get_all_shapes_from_file(CONFIG_FILE)
+        self._all_shapes = load_shape_catalog(CONFIG_FILE)
         self._shapes = random_shapes(self._all_shapes, NUM_SHAPES)
         self._availability = [True] * NUM_SHAPES
         self._available_count = NUM_SHAPES
@@ -137,7 +253,7 @@ class WoodokuGameEnv:
 
         # Check if the game has already ended
         # When there is still available shapes in this round waiting to be placed
-        if is_out_of_space(self._woodoku_board, self._shapes, self._availability):
+        if not self.action_mask().any():
             self._is_done = True
             return (
                 self._observe(),
@@ -170,6 +286,18 @@ class WoodokuGameEnv:
 
         return self._observe(), reward, False
 
+    def action_mask(self) -> Bool[np.ndarray, "NUM_SHAPES BOARD_SIZE BOARD_SIZE"]:
+        """
+        Get the mask of legal actions for the current state.
+
+        Returns:
+            A boolean array where entry [shape_choice, x, y] is True if the action places an available shape at a
+            location it fits. The game is over when no entry is True.
+        """
+        mask = self._woodoku_board.legal_placements(self._shapes)
+        mask[~np.array(self._availability)] = False
+        return mask
+
     def _get_score_gain(self) -> int:
         """
         Get the score gain from the current action.
@@ -179,10 +307,21 @@ class WoodokuGameEnv:
         """
         return self._woodoku_board.get_score() - self._cur_score
 
+    def observe(self, out: Optional[np.ndarray] = None) -> Observation:
+        """
+        Convert self to an observation, written into `out` if given.
+        Args:
+            out: A reusable array of shape `Observation.shape` to write the observation into.
+
+        Returns:
+            The observation.
+        """
+        return Observation.from_game(self._woodoku_board, self._shapes, out, self._observation_dtype)
+
     def _observe(self) -> Observation:
         """
         Convert self to an observation.
         Returns:
             The observation.
         """
-        return Observation.from_game(self._woodoku_board, self._shapes)
+        return self.observe()
@@ -5,7 +5,8 @@ from config import CONFIG_FILE, NUM_SHAPES
 from woodoku.entity.woodoku_board import WoodokuBoard
 from woodoku.ui.command_line_ui import CommandLineUI
 from woodoku.ui.ui_interface import UIInterface
-from woodoku.utils import get_all_shapes_from_file, is_out_of_space, random_shapes
+from woodoku.shape_catalog import load_shape_catalog
+from woodoku.utils import is_out_of_space, random_shapes
 
 # get the current absolute path to config.yaml at runtime
 
@@ -15,7 +16,7 @@ def game(ui: UIInterface) -> None:
         board = WoodokuBoard()
 
         # Generating all possible shapes that might appear in game.
-        all_shapes = get_all_shapes_from_file(CONFIG_FILE)
+        all_shapes = load_shape_catalog(CONFIG_FILE)
 
         ui.show_start_game(board)
 
@@ -0,0 +1,362 @@
+from __future__ import annotations
+import random
+from typing import Callable, NamedTuple, Optional, Sequence
+from jaxtyping import Bool, Float, Int
+
+import numpy as np
+
+from config import BOARD_SIZE, NUM_SHAPES
+from woodoku.entity.bitboard import CELL_COUNT
+from woodoku.entity.symmetry import IDENTITY, BoardSymmetry, inverse_transform, transform_placement
+from woodoku.entity.woodoku_board import Afterstates, WoodokuBoard
+from woodoku.entity.woodoku_shape import WoodokuShape
+from woodoku.transposition import TranspositionTable, ZobristKeys
+from woodoku.utils import random_shapes
+
+# The points a free cell is worth to the heuristic, and the points taken off for a free cell that is walled in on all
+# four sides, which only a single block fits.
+FREE_CELL_VALUE = 1.0
+HOLE_PENALTY = 3.0
+# The value of losing the game, far below any board that is still playable.
+GAME_OVER_VALUE = -1000.0
+
+Heuristic = Callable[[Afterstates], Float[np.ndarray, "P"]]  # type: ignore[type-arg]
+_Move = tuple[WoodokuShape, int, int]
+
+
+def board_heuristic(afterstates: Afterstates) -> Float[np.ndarray, "P"]:  # type: ignore[type-arg]
+    """
+    The value of each board of `afterstates`: its free cells, less a penalty for each free cell walled in by occupied
+    cells or the edge of the board on all four sides.
+    """
+    boards = afterstates.boards
+    # the board in a border of occupied cells
+    occupied = np.ones((len(boards), BOARD_SIZE + 2, BOARD_SIZE + 2), dtype=bool)
+    occupied[:, 1:-1, 1:-1] = boards
+    walled = occupied[:, :-2, 1:-1] & occupied[:, 2:, 1:-1] & occupied[:, 1:-1, :-2] & occupied[:, 1:-1, 2:]
+    free = (~boards).sum(axis=(1, 2))
+    holes = (~boards & walled).sum(axis=(1, 2))
+    values: Float[np.ndarray, "P"] = FREE_CELL_VALUE * free - HOLE_PENALTY * holes  # type: ignore[type-arg]
+    return values
+
+
+class Plan(NamedTuple):
+    """
+    The best turn found by `ExpectimaxPlanner.plan`.
+
+    Attributes:
+        placements: The placements to make in order, as the index of the shape in the hand, x and y.
+        value: The points the turn is expected to score, plus the heuristic value of where the search stopped.
+    """
+
+    placements: tuple[tuple[int, int, int], ...]
+    value: float
+
+
+class ExpectimaxPlanner:  # pylint: disable=too-many-instance-attributes
+    """
+    A search of the best way to place a hand of shapes, a non-learned baseline for the trained agents.
+
+    A turn is searched over every order and placement of the shapes of the hand. Once the hand is placed, the next hand
+    is drawn by `random_shapes` from the catalog, and the search takes the expected value of `depth` draws ahead,
+    estimated from `samples` hands each. Where the search stops, boards are valued by a heuristic of their afterstates.
+    The game is lost when a shape cannot be placed.
+
+    With `prune`, placements that lead to the same position are only searched once, which does not change the result.
+    Identical shapes of a hand lead to the same boards, so a placement of a copy of a shape already placed at the same
+    cell is not searched again. When every placement of a state and of the states after it is expanded, that is when
+    `width` covers them, placements that commute are only searched in one order too. Two placements in a row that clear
+    no group commute: either order reaches the same board with the same points, and neither clears a group in the other
+    order either. Such runs are only searched in the order of the shape id then the cell of the placement: a placement
+    that clears no group after one that cleared none either skips the placements its siblings made before it in that
+    order, and those the state it was made from skipped already. With fewer placements expanded, the other order of a
+    skipped run may not be expanded, so runs are searched in every order.
+
+    Each state only expands the `width` placements it does not skip whose points plus heuristic value are the highest,
+    all placements of a state being scored at once with `WoodokuBoard.afterstates`. Results are kept in a
+    `TranspositionTable` keyed by the Zobrist key of the board, streak and shapes left, so that the same state reached
+    again, within a turn by placing shapes in another order or in another sampled hand, is not searched again. With a
+    `BoardSymmetry`, the key is that of the canonical form of the state, so that mirrored and rotated states are not
+    searched again either. A state with placements skipped for the way it was reached is not kept, since its value
+    holds only for that way.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        shapes: Sequence[WoodokuShape],
+        *,
+        depth: int = 0,
+        width: int = 6,
+        samples: int = 4,
+        heuristic: Heuristic = board_heuristic,
+        table: Optional[TranspositionTable] = None,
+        symmetry: Optional[BoardSymmetry] = None,
+        prune: bool = True,
+        seed: Optional[int] = None,
+    ) -> None:
+        """
+        Args:
+            shapes: The catalog the next hands are drawn from.
+            depth: How many hands are drawn ahead after the current one, 0 to only search the current turn.
+            width: How many placements each state expands.
+            samples: How many hands each draw is estimated from.
+            heuristic: The value of the boards where the search stops, in points.
+            table: The table to keep results in, a new one if None.
+            symmetry: The symmetries to find equivalent states in the table with, none if None.
+            prune: Whether to search placements leading to the same position only once.
+            seed: The seed of the drawn hands.
+        """
+        self.shapes = list(shapes)
+        self.depth = depth
+        self.width = width
+        self.samples = samples
+        self.heuristic = heuristic
+        self.table = table if table is not None else TranspositionTable()
+        self.symmetry = symmetry
+        self.prune = prune
+        self._keys = ZobristKeys()
+        self._rng = random.Random(seed)
+        # the number of states searched, those found in the table included
+        self.nodes = 0
+
+    def plan(
+        self, board: WoodokuBoard, hand: Sequence[WoodokuShape], availability: Optional[Sequence[bool]] = None
+    ) -> Plan:
+        """
+        Find the best turn for the available shapes of `hand` on `board`, which is left as it is.
+
+        Args:
+            board: The board to place the shapes on.
+            hand: The shapes of the turn.
+            availability: Whether each shape of the hand is left to place, all of them if None.
+
+        Returns:
+            The placements of the turn, which are fewer than the shapes left if the game is lost on the way.
+        """
+        available = [True] * len(hand) if availability is None else list(availability)
+        left = tuple(shape for shape, is_available in zip(hand, available) if is_available)
+        self.table.new_search()
+        key = self._keys.state(board.get_mask(), board.get_streak(), left)
+        value, moves = self._search_turn(board, left, key, self.depth)
+
+        placements = []
+        for shape, x, y in moves:
+            choice = next(i for i, candidate in enumerate(hand) if available[i] and candidate is shape)
+            available[choice] = False
+            placements.append((choice, x, y))
+        return Plan(tuple(placements), value)
+
+    def _search_turn(
+        self,
+        board: WoodokuBoard,
+        left: tuple[WoodokuShape, ...],
+        key: int,
+        depth: int,
+        skipped: Optional[Int[np.ndarray, "S"]] = None,  # type: ignore[type-arg]
+    ) -> tuple[float, tuple[_Move, ...]]:
+        """
+        The value of placing the shapes `left` on `board` and of the draws after, and the best placements.
+
+        Args:
+            key: The Zobrist key of the board, its streak and the shapes left.
+            depth: How many hands are drawn after the shapes left are placed.
+            skipped: The sorted codes of the placements to skip if they clear no group, searched in another order.
+        """
+        self.nodes += 1
+        if not left:
+            return (self._expect_draw(board, key, depth) if depth > 0 else 0.0), ()
+        if skipped is not None:
+            # the value holds only for the way the state was reached, so the table is neither looked up nor filled
+            return self._expand_turn(board, left, key, depth, skipped=skipped)
+        table_key, transform = self._table_key(board, left, key, depth)
+        entry = self.table.get(table_key)
+        if entry is not None:
+            return entry.value, _transform_moves(entry.moves, inverse_transform(transform))
+
+        result = self._expand_turn(board, left, key, depth, skipped=None)
+        self.table.put(table_key, depth, result[0], _transform_moves(result[1], transform))
+        return result
+
+    def _expand_turn(
+        self,
+        board: WoodokuBoard,
+        left: tuple[WoodokuShape, ...],
+        key: int,
+        depth: int,
+        *,
+        skipped: Optional[Int[np.ndarray, "S"]],  # type: ignore[type-arg]
+    ) -> tuple[float, tuple[_Move, ...]]:
+        """The search of `_search_turn` over the placements of the state, when its result is not in the table."""
+        # every placement of this state and the states after it is expanded, so runs can be searched in one order
+        exhaustive = self.prune and self.width >= len(left) * CELL_COUNT
+        afterstates, codes = _placements(board, left, skipped, distinct=exhaustive)
+        if afterstates is None:
+            return GAME_OVER_VALUE, ()
+        if len(codes) == 0:
+            # every placement is searched in another order
+            return -np.inf, ()
+        values = afterstates.rewards + self.heuristic(afterstates)
+        best = np.argsort(-values, kind="stable")[: self.width]
+        if self.prune and not exhaustive:
+            # the first of the placements of identical shapes at the same cell, which the others would find in the table
+            _, first = np.unique(codes[best], return_index=True)
+            best = best[np.sort(first)]
+        if len(left) == 1 and depth == 0:
+            # the search stops after this placement, so every placement is valued already
+            return float(values[best[0]]), (_placement(afterstates, left, best[0]),)
+        skips = _skipped_after(afterstates, codes, best, skipped) if exhaustive else [None] * len(best)
+        return self._search_moves(
+            board, left, key, depth, [(_placement(afterstates, left, i), after) for i, after in zip(best, skips)]
+        )
+
+    def _search_moves(
+        self,
+        board: WoodokuBoard,
+        left: tuple[WoodokuShape, ...],
+        key: int,
+        depth: int,
+        moves: list[tuple[_Move, Optional[Int[np.ndarray, "S"]]]],  # type: ignore[type-arg]
+    ) -> tuple[float, tuple[_Move, ...]]:
+        """The best of the placements `moves` in the search of `_search_turn`, each with the placements to skip after it."""
+        result: tuple[float, tuple[_Move, ...]] = (-np.inf, ())
+        for move, after in moves:
+            child = self._search_move(board, left, key, depth, move, skipped=after)
+            if child[0] > result[0]:
+                result = child[0], (move,) + child[1]
+        return result
+
+    def _search_move(  # pylint: disable=too-many-arguments
+        self,
+        board: WoodokuBoard,
+        left: tuple[WoodokuShape, ...],
+        key: int,
+        depth: int,
+        move: _Move,
+        *,
+        skipped: Optional[Int[np.ndarray, "S"]],  # type: ignore[type-arg]
+    ) -> tuple[float, tuple[_Move, ...]]:
+        """
+        The value of making the placement `move` in the search of `_search_turn`, points included, and the best
+        placements after it, skipping those of `skipped` that clear no group.
+        """
+        shape = move[0]
+        child = board.clone()
+        token = child.apply(*move)
+        choice = left.index(shape)
+        rest = left[:choice] + left[choice + 1 :]
+        # the key of the board changes by the blocks placed and cleared, and the last copy of the shape is no longer left
+        child_key = (
+            key
+            ^ self._keys.board(token.placed ^ token.cleared)
+            ^ self._keys.streak(board.get_streak())
+            ^ self._keys.streak(child.get_streak())
+            ^ self._keys.shape(shape, rest.count(shape))
+        )
+        if skipped is not None:
+            # only the placements of the shapes left can be skipped
+            skipped = skipped[np.logical_or.reduce([skipped // CELL_COUNT == shape.get_id() for shape in rest])]
+        value, moves = self._search_turn(
+            child, rest, child_key, depth, skipped if skipped is not None and len(skipped) else None
+        )
+        return child.get_score() - board.get_score() + value, moves
+
+    def _expect_draw(self, board: WoodokuBoard, key: int, depth: int) -> float:
+        """
+        The expected value of drawing the next hand onto `board`, and of the `depth - 1` draws after.
+
+        Args:
+            key: The Zobrist key of the board and its streak, with no shapes left.
+        """
+        table_key, _ = self._table_key(board, (), key, depth)
+        entry = self.table.get(table_key)
+        if entry is not None:
+            return entry.value
+        total = 0.0
+        for _ in range(self.samples):
+            hand = tuple(random_shapes(self.shapes, NUM_SHAPES, self._rng))
+            total += self._search_turn(board, hand, key ^ self._keys.shapes(hand), depth - 1)[0]
+        value = total / self.samples
+        self.table.put(table_key, depth, value, ())
+        return value
+
+    def _table_key(self, board: WoodokuBoard, left: tuple[WoodokuShape, ...], key: int, depth: int) -> tuple[int, int]:
+        """
+        The key of a state in the table, and the transform from the state to the form its moves are stored in.
+
+        Args:
+            key: The Zobrist key of the board, its streak and the shapes left.
+        """
+        if self.symmetry is None:
+            return key ^ self._keys.depth(depth), IDENTITY
+        canonical = self.symmetry.canonicalize(board.get_mask(), left)
+        canonical_key = self._keys.state(canonical.mask, board.get_streak(), canonical.hand)
+        return canonical_key ^ self._keys.depth(depth), canonical.transform
+
+
+def _placements(
+    board: WoodokuBoard,
+    left: tuple[WoodokuShape, ...],
+    skipped: Optional[Int[np.ndarray, "S"]],  # type: ignore[type-arg]
+    *,
+    distinct: bool,
+) -> tuple[Optional[Afterstates], Int[np.ndarray, "P"]]:  # type: ignore[type-arg]
+    """
+    The placements of the shapes `left` on `board`, of only the first copy of each shape if `distinct`, but for those
+    of `skipped` that clear no group, and their codes, which order placements by the shape id, then the cell.
+
+    Returns:
+        No afterstates if no shape fits, and no placements if all of them are skipped.
+    """
+    afterstates = board.afterstates(
+        left, [left.index(shape) == i for i, shape in enumerate(left)] if distinct else None
+    )
+    if len(afterstates.rewards) == 0:
+        return None, np.zeros(0, dtype=np.int64)
+    ids = np.array([shape.get_id() for shape in left], dtype=np.int64)[afterstates.shape_choice]
+    codes = ids * CELL_COUNT + afterstates.x * BOARD_SIZE + afterstates.y
+    if skipped is None:
+        return afterstates, codes
+    kept = afterstates.complete.any(axis=1) | ~_is_in(codes, skipped)
+    return Afterstates(*(field[kept] for field in afterstates)), codes[kept]
+
+
+def _skipped_after(
+    afterstates: Afterstates,
+    codes: Int[np.ndarray, "P"],  # type: ignore[type-arg]
+    best: Int[np.ndarray, "B"],  # type: ignore[type-arg]
+    skipped: Optional[Int[np.ndarray, "S"]],  # type: ignore[type-arg]
+) -> list[Optional[Int[np.ndarray, "S"]]]:  # type: ignore[type-arg]
+    """
+    The sorted codes of the placements to skip after each of the placements `best` of `afterstates`: none after a
+    placement that clears a group, and otherwise those of `best` before it in the order of codes that clear no group,
+    with those `skipped` already.
+    """
+    clears = afterstates.complete.any(axis=1)
+    commuting = np.sort(codes[best][~clears[best]])
+    after: list[Optional[Int[np.ndarray, "S"]]] = []  # type: ignore[type-arg]
+    for i in best:
+        if clears[i]:
+            after.append(None)
+            continue
+        before = commuting[: np.searchsorted(commuting, codes[i])]
+        after.append(before if skipped is None else np.sort(np.concatenate([skipped, before])))
+    return after
+
+
+def _is_in(
+    values: Int[np.ndarray, "P"], sorted_values: Int[np.ndarray, "S"]  # type: ignore[type-arg]
+) -> Bool[np.ndarray, "P"]:  # type: ignore[type-arg]
+    """Whether each of `values` is one of the non-empty `sorted_values`, faster than `np.isin` on arrays this small."""
+    found = sorted_values[np.minimum(np.searchsorted(sorted_values, values), len(sorted_values) - 1)]
+    is_in: Bool[np.ndarray, "P"] = found == values  # type: ignore[type-arg]
+    return is_in
+
+
+def _placement(afterstates: Afterstates, left: tuple[WoodokuShape, ...], i: int) -> _Move:
+    return left[afterstates.shape_choice[i]], int(afterstates.x[i]), int(afterstates.y[i])
+
+
+def _transform_moves(moves: tuple[_Move, ...], transform: int) -> tuple[_Move, ...]:
+    if transform == IDENTITY:
+        return moves
+    return tuple(transform_placement(shape, x, y, transform) for shape, x, y in moves)
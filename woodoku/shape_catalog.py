@@ -0,0 +1,123 @@
+import os
+from os import path, stat
+from tempfile import NamedTemporaryFile
+from typing import Optional
+from jaxtyping import UInt64
+
+import numpy as np
+from config import BOARD_SIZE
+
+from woodoku.entity.bitboard import CELL_COUNT, WORD_BITS, WORDS, masks_to_words
+from woodoku.entity.woodoku_shape import WoodokuShape
+from woodoku.utils import get_all_shapes_from_file
+
+# The shapes already loaded by this process, keyed by the absolute path and the modification time of their config file.
+# Only the latest version of each config file is kept.
+_CATALOGS: dict[tuple[str, int], tuple[WoodokuShape, ...]] = {}
+
+
+def load_shape_catalog(config_path: str, compiled_path: Optional[str] = None) -> list[WoodokuShape]:
+    """
+    Gather all possible shapes from the shape config file, parsing it at most once per process.
+
+    The shapes are cached until the config file is modified. Shapes never change once built, so every caller shares the
+    same WoodokuShape objects and the placement tables they carry.
+
+    Args:
+        config_path: The shape config file.
+        compiled_path: An optional `.npz` precompiled form of the catalog. It is read instead of the config file if it
+            was compiled from the current version of the config file, and (re)written otherwise.
+
+    Returns:
+        The original shapes and all the rotated shapes, in the order of `get_all_shapes_from_file`.
+    """
+    absolute_path = path.abspath(config_path)
+    key = (absolute_path, stat(absolute_path).st_mtime_ns)
+    if key not in _CATALOGS:
+        shapes = _read_compiled_catalog(compiled_path, key) if compiled_path else None
+        if shapes is None:
+            shapes = get_all_shapes_from_file(absolute_path)
+            if compiled_path:
+                write_compiled_catalog(shapes, compiled_path, key)
+        for stale in [cached for cached in _CATALOGS if cached[0] == absolute_path]:
+            del _CATALOGS[stale]
+        _CATALOGS[key] = tuple(shapes)
+    return list(_CATALOGS[key])
+
+
+def write_compiled_catalog(shapes: list[WoodokuShape], compiled_path: str, key: tuple[str, int]) -> None:
+    """
+    Write the shapes and their placement tables to `compiled_path` as an `.npz` archive.
+
+    The archive is written to a temporary file next to `compiled_path` and then moved in place, so that processes
+    compiling the catalog at the same time never read or leave a partly written one.
+
+    Args:
+        shapes: The shapes to write.
+        compiled_path: Where to write them, exactly, even without an `.npz` suffix.
+        key: The absolute path and modification time of the config file the shapes come from.
+    """
+    coords = [shape.get_coords() for shape in shapes]
+    placement_masks = [mask for shape in shapes for mask in shape.get_placement_masks()]
+    placement_groups = [
+        shape.get_placement_groups(*divmod(anchor, BOARD_SIZE)) for shape in shapes for anchor in range(CELL_COUNT)
+    ]
+    # np.savez appends .npz to a path without it, but not to a file object
+    with NamedTemporaryFile(dir=path.dirname(path.abspath(compiled_path)), suffix=".npz", delete=False) as compiled:
+        try:
+            np.savez(
+                compiled,
+                source=np.array(key[0]),
+                mtime_ns=np.array(key[1], dtype=np.int64),
+                sizes=np.array([len(shape_coords) for shape_coords in coords], dtype=np.int8),
+                coords=np.array([coord for shape_coords in coords for coord in shape_coords], dtype=np.int8).reshape(
+                    (-1, 2)
+                ),
+                placement_words=masks_to_words(placement_masks).reshape((len(shapes), CELL_COUNT, WORDS)),
+                # the touched groups of every anchor of every shape, one after another
+                group_ends=np.cumsum([len(groups) for groups in placement_groups], dtype=np.int32),
+                groups=np.array([group for groups in placement_groups for group in groups], dtype=np.int8),
+            )
+        except BaseException:
+            compiled.close()
+            os.remove(compiled.name)
+            raise
+    os.replace(compiled.name, compiled_path)
+
+
+def _read_compiled_catalog(compiled_path: str, key: tuple[str, int]) -> Optional[list[WoodokuShape]]:
+    """
+    Read the shapes written by `write_compiled_catalog`.
+
+    Returns:
+        The shapes, or None if there is no compiled catalog or it was compiled from another version of the config file.
+    """
+    if not path.exists(compiled_path):
+        return None
+    with np.load(compiled_path) as compiled:
+        if (str(compiled["source"]), int(compiled["mtime_ns"])) != key:
+            return None
+        ends = np.cumsum(compiled["sizes"]).tolist()
+        all_coords = compiled["coords"].tolist()
+        masks = _join_words(compiled["placement_words"].reshape((-1, WORDS)))
+        group_ends = compiled["group_ends"].tolist()
+        all_groups = compiled["groups"].tolist()
+
+    groups = [tuple(all_groups[start:end]) for start, end in zip([0] + group_ends, group_ends)]
+
+    shapes = []
+    for index, (start, end) in enumerate(zip([0] + ends, ends)):
+        shape = WoodokuShape(all_coords[start:end])
+        anchors = slice(index * CELL_COUNT, (index + 1) * CELL_COUNT)
+        shape.load_placements(masks[anchors], groups[anchors])
+        shapes.append(shape)
+    return shapes
+
+
+def _join_words(words: UInt64[np.ndarray, "n WORDS"]) -> list[int]:  # type: ignore[type-arg]
+    """The inverse of `masks_to_words`, joining the words one at a time over all masks rather than mask by mask."""
+    columns = words.T.tolist()
+    masks: list[int] = columns[0]
+    for word in range(1, WORDS):
+        masks = [mask | high << (WORD_BITS * word) for mask, high in zip(masks, columns[word])]
+    return masks
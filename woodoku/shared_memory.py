@@ -0,0 +1,30 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class SharedArray:
+    """The name, shape and dtype of a numpy array in shared memory, enough for any process to attach to it."""
+
+    name: str
+    shape: tuple[int, ...]
+    dtype: str
+
+    @staticmethod
+    def create(shape: tuple[int, ...], dtype: Any) -> tuple[SharedArray, SharedMemory]:
+        """Allocate zeroed shared memory for an array. The caller owns the memory and must unlink it."""
+        dtype = np.dtype(dtype)
+        memory = SharedMemory(create=True, size=max(1, int(np.prod(shape)) * dtype.itemsize))
+        return SharedArray(memory.name, shape, dtype.str), memory
+
+    def attach(self) -> tuple[np.ndarray, SharedMemory]:  # type: ignore[type-arg]
+        """Map the array into this process. The array is only valid while the returned memory is open."""
+        memory = SharedMemory(name=self.name)
+        return self.view(memory), memory
+
+    def view(self, memory: SharedMemory) -> np.ndarray:  # type: ignore[type-arg]
+        return np.ndarray(self.shape, dtype=self.dtype, buffer=memory.buf)
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from config import BOARD_SIZE
+from woodoku.entity.bitboard import FULL_MASK, GROUP_MASKS, GROUP_MATRIX
+from woodoku.entity.bitboard import array_to_mask, coords_to_mask, mask_to_array, mask_to_coords, masks_to_array
+from woodoku.entity.bitboard import array_to_words, masks_to_words, words_to_array
+from woodoku.exceptions.shape_out_of_board_error import ShapeOutOfBoardError
+
+
+class TestBitboard:
+    @pytest.mark.parametrize(
+        "coords",
+        [
+            [],
+            [(0, 0)],
+            [(0, 8), (8, 0), (8, 8)],
+            [(1, 3), (5, 8), (0, 7), (2, 1)],
+        ],
+    )
+    def test_coords_round_trip(self, coords: list[tuple[int, int]]) -> None:
+        mask = coords_to_mask(coords)
+        assert set(mask_to_coords(mask)) == set(coords)
+
+        expected = np.full((BOARD_SIZE, BOARD_SIZE), False)
+        for x, y in coords:
+            expected[x, y] = True
+        assert (mask_to_array(mask) == expected).all()
+        assert array_to_mask(expected) == mask
+
+    @pytest.mark.parametrize("coord", [(-1, 0), (0, -1), (BOARD_SIZE, 0), (0, BOARD_SIZE)])
+    def test_coords_to_mask_out_of_board(self, coord: tuple[int, int]) -> None:
+        with pytest.raises(ShapeOutOfBoardError):
+            coords_to_mask([coord])
+
+    def test_masks_to_array_batch(self) -> None:
+        masks = [0, FULL_MASK, coords_to_mask([(4, 4)])]
+        boards = masks_to_array(masks)
+        assert boards.shape == (3, BOARD_SIZE, BOARD_SIZE)
+        for board, mask in zip(boards, masks):
+            assert array_to_mask(board) == mask
+
+    def test_words_round_trip(self) -> None:
+        words = masks_to_words([0, FULL_MASK, coords_to_mask([(0, 0), (7, 1), (8, 8)])])
+        assert (array_to_words(words_to_array(words)) == words).all()
+        assert (array_to_words(words_to_array(words[None]))[0] == words).all()
+
+    def test_group_masks(self) -> None:
+        assert len(GROUP_MASKS) == 3 * BOARD_SIZE
+        for group_mask in GROUP_MASKS:
+            assert group_mask.bit_count() == BOARD_SIZE
+        # every block is in exactly one row, one column and one box
+        assert (GROUP_MATRIX.sum(axis=0) == 3).all()
+        assert GROUP_MASKS[0] == coords_to_mask((0, col) for col in range(BOARD_SIZE))
+        assert GROUP_MASKS[BOARD_SIZE] == coords_to_mask((row, 0) for row in range(BOARD_SIZE))
+        assert GROUP_MASKS[2 * BOARD_SIZE] == coords_to_mask((row, col) for row in range(3) for col in range(3))
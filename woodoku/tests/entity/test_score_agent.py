@@ -223,3 +223,20 @@ class TestScoreAgent:
     ) -> None:
         """expect to behave the same as the real world game scoring logs collected manually"""
         assert scorekeeper.get_score() == expected_score
+
+    @pytest.mark.parametrize(
+        ("init_score", "init_streak", "winnings"),
+        [
+            (0, 0, []),
+            (82, 0, [(3, 1), (4, 2)]),
+            (184, 2, [(5, 1)]),
+        ],
+    )
+    def test_restore_snapshot(self, winnings: Iterable[tuple[int, int]], scorekeeper: ScoreAgent) -> None:
+        """restoring a snapshot brings back the score, streak and combo it was taken with"""
+        snapshot = scorekeeper.snapshot()
+        before = (scorekeeper.get_score(), scorekeeper.get_streak(), scorekeeper.get_combo())
+        scorekeeper.calculate_winning(4, 2)
+        scorekeeper.calculate_winning(2, 0)
+        scorekeeper.restore(snapshot)
+        assert (scorekeeper.get_score(), scorekeeper.get_streak(), scorekeeper.get_combo()) == before
@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+from config import BOARD_SIZE, CONFIG_FILE
+from woodoku.entity.bitboard import GROUP_MASKS, masks_to_words
+from woodoku.entity.symmetry import (
+    DIHEDRAL,
+    IDENTITY,
+    BoardSymmetry,
+    inverse_transform,
+    transform_mask,
+    transform_placement,
+    transform_shape,
+    transform_words,
+)
+from woodoku.entity.woodoku_board import WoodokuBoard
+from woodoku.entity.woodoku_shape import WoodokuShape
+from woodoku.shape_catalog import load_shape_catalog
+
+# pylint: disable=protected-access
+
+TRANSFORMS = range(len(DIHEDRAL))
+
+
+def _random_masks(seed: int, count: int) -> list[int]:
+    boards = np.random.default_rng(seed).random((count, BOARD_SIZE * BOARD_SIZE)) < 0.4
+    return [sum(1 << int(cell) for cell in np.flatnonzero(board)) for board in boards]
+
+
+class TestSymmetry:
+    l_shape: WoodokuShape = WoodokuShape([(0, 0), (1, 0), (2, 0), (2, 1)])
+    one_block: WoodokuShape = WoodokuShape([(0, 0)])
+    horizontal_bar_shape: WoodokuShape = WoodokuShape([(0, 0), (0, 1), (0, 2), (0, 3), (0, 4)])
+
+    @pytest.mark.parametrize("transform", TRANSFORMS)
+    def test_groups_map_onto_groups(self, transform: int) -> None:
+        assert {transform_mask(group, transform) for group in GROUP_MASKS} == set(GROUP_MASKS)
+
+    @pytest.mark.parametrize("transform", TRANSFORMS)
+    def test_inverse_transform(self, transform: int) -> None:
+        for mask in _random_masks(transform, 10):
+            assert transform_mask(transform_mask(mask, transform), inverse_transform(transform)) == mask
+        assert transform_shape(transform_shape(self.l_shape, transform), inverse_transform(transform)) is self.l_shape
+
+    @pytest.mark.parametrize("transform", TRANSFORMS)
+    def test_transform_words_matches_transform_mask(self, transform: int) -> None:
+        masks = _random_masks(transform, 10)
+        expected = masks_to_words([transform_mask(mask, transform) for mask in masks])
+        assert (transform_words(masks_to_words(masks), transform) == expected).all()
+
+    @pytest.mark.parametrize("transform", TRANSFORMS)
+    def test_transformed_placement_scores_the_same(self, transform: int) -> None:
+        """Placing a shape on a board scores and clears as placing the transformed shape on the transformed board"""
+        board = WoodokuBoard("bitboard")
+        # the L fills the rest of row 2
+        for y in range(2, BOARD_SIZE):
+            board.add_shape(self.one_block, 2, y)
+        board.add_shape(self.horizontal_bar_shape, 5, 0)
+        transformed = WoodokuBoard("bitboard")
+        transformed._representation.add_mask(transform_mask(board._representation.get_mask(), transform))
+
+        shape, x, y = transform_placement(self.l_shape, 0, 0, transform)
+        assert shape.get_placement_mask(x, y) == transform_mask(self.l_shape.get_placement_mask(0, 0), transform)
+        score = board.get_score()
+        board.add_shape(self.l_shape, 0, 0)
+        transformed.add_shape(shape, x, y)
+        assert transformed._representation.get_mask() == transform_mask(board._representation.get_mask(), transform)
+        assert transformed.get_score() == board.get_score() - score > len(self.l_shape)
+
+    def test_catalog_is_closed_under_every_transform(self) -> None:
+        assert BoardSymmetry(load_shape_catalog(CONFIG_FILE)).transforms == tuple(TRANSFORMS)
+
+    def test_only_transforms_the_catalog_is_closed_under(self) -> None:
+        rotations = [self.l_shape]
+        for _ in range(3):
+            rotations.append(rotations[-1].rotate())
+        # the mirrors of an L are not among its rotations
+        assert BoardSymmetry(rotations).transforms == (0, 1, 2, 3)
+
+    @pytest.mark.parametrize("seed", [0, 1])
+    def test_equivalent_states_share_a_canonical_form(self, seed: int) -> None:
+        symmetry = BoardSymmetry(load_shape_catalog(CONFIG_FILE))
+        hand = [self.l_shape, self.horizontal_bar_shape, self.l_shape]
+        for mask in _random_masks(seed, 5):
+            canonical = symmetry.canonicalize(mask, hand)
+            assert transform_mask(mask, canonical.transform) == canonical.mask
+            for transform in TRANSFORMS:
+                moved = [transform_shape(shape, transform) for shape in reversed(hand)]
+                assert symmetry.canonicalize(transform_mask(mask, transform), moved)[:2] == canonical[:2]
+
+    def test_hand_breaks_ties(self) -> None:
+        symmetry = BoardSymmetry(load_shape_catalog(CONFIG_FILE))
+        vertical = symmetry.canonicalize(0, [transform_shape(self.horizontal_bar_shape, 1)])
+        horizontal = symmetry.canonicalize(0, [self.horizontal_bar_shape])
+        assert vertical[:2] == horizontal[:2]
+        assert symmetry.canonicalize(0).transform == IDENTITY
+
+    def test_canonicalize_words_matches_canonicalize(self) -> None:
+        symmetry = BoardSymmetry(load_shape_catalog(CONFIG_FILE))
+        masks = _random_masks(3, 50) + [0, GROUP_MASKS[0] | GROUP_MASKS[8]]
+        words, transforms = symmetry.canonicalize_words(masks_to_words(masks))
+        canonicals = [symmetry.canonicalize(mask) for mask in masks]
+        assert (words == masks_to_words([canonical.mask for canonical in canonicals])).all()
+        assert transforms.tolist() == [canonical.transform for canonical in canonicals]
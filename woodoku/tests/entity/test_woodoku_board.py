@@ -4,30 +4,37 @@ import numpy as np
 import pytest
 from jaxtyping import Bool
 from config import BOARD_SIZE
+from woodoku.entity.bitboard import ALL_GROUPS, GROUP_MASKS, array_to_mask, coords_to_mask, groups_touching
+from woodoku.entity.bitboard import mask_to_array, words_to_array
 from woodoku.entity.woodoku_board import (
+    Backend,
     WoodokuBoard,
+    _AbstractWoodokuBoardRepresentation,
+    _WoodokuBitboardRepresentation,
     _WoodokuBoardRepresentation,
 )
 from woodoku.entity.woodoku_shape import WoodokuShape
+from woodoku.exceptions.shape_out_of_board_error import ShapeOutOfBoardError
 
 random.seed(69)  # keep the test explorer happy
 
 # pylint: disable=protected-access
 
 
-class TestWoodokuRepresentation:
+@pytest.mark.parametrize("rep_cls", [_WoodokuBoardRepresentation, _WoodokuBitboardRepresentation])
+class TestWoodokuRepresentation:  # pylint: disable=too-many-public-methods
     one_block_lst = [(0, 0)]
     three_block_lst = [(1, 3), (5, 8), (0, 7)]
     five_block_lst = three_block_lst + [(2, 1), (0, 8)]
 
     def board_after_adding(
-        self, rep: _WoodokuBoardRepresentation, lst: list[tuple[int, int]]
+        self, rep: _AbstractWoodokuBoardRepresentation, lst: list[tuple[int, int]]
     ) -> Bool[np.ndarray, "BOARD_SIZE*BOARD_SIZE"]:  # type: ignore[type-arg]
         rep.add_blocks(lst)
         return rep._board
 
     def board_after_removing(
-        self, rep: _WoodokuBoardRepresentation, lst: list[tuple[int, int]]
+        self, rep: _AbstractWoodokuBoardRepresentation, lst: list[tuple[int, int]]
     ) -> Bool[np.ndarray, "BOARD_SIZE*BOARD_SIZE"]:  # type: ignore[type-arg]
         rep.remove_blocks(lst)
         return rep._board
@@ -40,8 +47,10 @@ class TestWoodokuRepresentation:
             five_block_lst,
         ],
     )
-    def test_add_blocks_add_list_of_blocks(self, lst: list[tuple[int, int]]) -> None:
-        board = self.board_after_adding(_WoodokuBoardRepresentation(), lst)
+    def test_add_blocks_add_list_of_blocks(
+        self, rep_cls: type[_AbstractWoodokuBoardRepresentation], lst: list[tuple[int, int]]
+    ) -> None:
+        board = self.board_after_adding(rep_cls(), lst)
 
         expect = np.full((BOARD_SIZE, BOARD_SIZE), False)
         for row, col in lst:
@@ -56,8 +65,10 @@ class TestWoodokuRepresentation:
             five_block_lst,
         ],
     )
-    def test_remove_blocks_remove_list_of_blocks(self, lst: list[tuple[int, int]]) -> None:
-        rep = _WoodokuBoardRepresentation()
+    def test_remove_blocks_remove_list_of_blocks(
+        self, rep_cls: type[_AbstractWoodokuBoardRepresentation], lst: list[tuple[int, int]]
+    ) -> None:
+        rep = rep_cls()
         rep.add_blocks(lst)
         board_removed = self.board_after_removing(rep, lst)
 
@@ -65,8 +76,8 @@ class TestWoodokuRepresentation:
         assert (board_removed == expect).all()
 
     # add five blocks and remove three of them
-    def test_remove_blocks_remove_three_block(self) -> None:
-        rep = _WoodokuBoardRepresentation()
+    def test_remove_blocks_remove_three_block(self, rep_cls: type[_AbstractWoodokuBoardRepresentation]) -> None:
+        rep = rep_cls()
         rep.add_blocks(self.five_block_lst)
         board_removed = self.board_after_removing(rep, self.three_block_lst)
 
@@ -79,61 +90,119 @@ class TestWoodokuRepresentation:
             board_removed == expect
         ).all(), f"test fail because board =\n {board_removed}, \n\n while expect =\n {expect}"
 
-    def test_is_occupied_on_empty_board(self) -> None:
-        rep = _WoodokuBoardRepresentation()
+    def test_is_occupied_on_empty_board(self, rep_cls: type[_AbstractWoodokuBoardRepresentation]) -> None:
+        rep = rep_cls()
         assert not rep.is_occupied(self.one_block_lst)
         assert not rep.is_occupied(self.three_block_lst)
         assert not rep.is_occupied(self.five_block_lst)
 
-    def test_is_occupied_with_empty_lst(self) -> None:
-        rep = _WoodokuBoardRepresentation()
+    def test_is_occupied_with_empty_lst(self, rep_cls: type[_AbstractWoodokuBoardRepresentation]) -> None:
+        rep = rep_cls()
         assert rep.is_occupied([])
 
-    def test_is_occupied_with_all_one_occupied(self) -> None:
-        rep = _WoodokuBoardRepresentation()
+    def test_is_occupied_with_all_one_occupied(self, rep_cls: type[_AbstractWoodokuBoardRepresentation]) -> None:
+        rep = rep_cls()
         rep.add_blocks(self.one_block_lst)
         assert rep.is_occupied(self.one_block_lst)
 
-    def test_is_occupied_with_all_three_occupied(self) -> None:
-        rep = _WoodokuBoardRepresentation()
+    def test_is_occupied_with_all_three_occupied(self, rep_cls: type[_AbstractWoodokuBoardRepresentation]) -> None:
+        rep = rep_cls()
         rep.add_blocks(self.three_block_lst)
         assert rep.is_occupied(self.three_block_lst)
 
-    def test_is_occupied_with_two_out_of_five_occupied(self) -> None:
-        rep = _WoodokuBoardRepresentation()
+    def test_is_occupied_with_two_out_of_five_occupied(
+        self, rep_cls: type[_AbstractWoodokuBoardRepresentation]
+    ) -> None:
+        rep = rep_cls()
         rep.add_blocks(self.five_block_lst)
         rep.remove_blocks(self.three_block_lst)
         assert not rep.is_occupied(self.five_block_lst)
 
-    def test_is_not_occupied_on_empty_board(self) -> None:
-        rep = _WoodokuBoardRepresentation()
+    def test_is_not_occupied_on_empty_board(self, rep_cls: type[_AbstractWoodokuBoardRepresentation]) -> None:
+        rep = rep_cls()
         assert rep.is_not_occupied(self.one_block_lst)
         assert rep.is_not_occupied(self.three_block_lst)
         assert rep.is_not_occupied(self.five_block_lst)
 
-    def test_is_not_occupied_with_empty_list(self) -> None:
-        rep = _WoodokuBoardRepresentation()
+    def test_is_not_occupied_with_empty_list(self, rep_cls: type[_AbstractWoodokuBoardRepresentation]) -> None:
+        rep = rep_cls()
         assert rep.is_not_occupied([])
 
-    def test_is_not_occupied_with_all_occupied(self) -> None:
-        rep = _WoodokuBoardRepresentation()
+    def test_is_not_occupied_with_all_occupied(self, rep_cls: type[_AbstractWoodokuBoardRepresentation]) -> None:
+        rep = rep_cls()
         rep.add_blocks(self.five_block_lst)
         assert not rep.is_not_occupied(self.five_block_lst)
 
-    def test_is_not_occupied_with_some_occupied(self) -> None:
-        rep = _WoodokuBoardRepresentation()
+    def test_is_not_occupied_with_some_occupied(self, rep_cls: type[_AbstractWoodokuBoardRepresentation]) -> None:
+        rep = rep_cls()
         rep.add_blocks(self.five_block_lst)
         rep.remove_blocks(self.three_block_lst)
         assert not rep.is_not_occupied(self.five_block_lst)
 
-    def test_is_not_occupied_with_blocks_added_then_removed(self) -> None:
-        rep = _WoodokuBoardRepresentation()
+    def test_is_not_occupied_with_blocks_added_then_removed(
+        self, rep_cls: type[_AbstractWoodokuBoardRepresentation]
+    ) -> None:
+        rep = rep_cls()
         rep.add_blocks(self.five_block_lst)
         rep.remove_blocks(self.five_block_lst)
         assert rep.is_not_occupied(self.five_block_lst)
 
+    def test_mask_operations_match_block_operations(self, rep_cls: type[_AbstractWoodokuBoardRepresentation]) -> None:
+        rep = rep_cls()
+        rep.add_mask(coords_to_mask(self.five_block_lst))
+        assert rep.get_mask() == coords_to_mask(self.five_block_lst)
+        assert rep.is_mask_occupied(coords_to_mask(self.three_block_lst))
+        assert not rep.is_mask_free(coords_to_mask(self.one_block_lst + self.three_block_lst))
 
-class TestWoodokuBoard:
+        rep.remove_mask(coords_to_mask(self.three_block_lst))
+        assert rep.is_not_occupied(self.three_block_lst)
+        assert rep.is_occupied([(2, 1), (0, 8)])
+        assert (rep.get_board_data() == mask_to_array(rep.get_mask())).all()
+
+    def test_add_blocks_out_of_board(self, rep_cls: type[_AbstractWoodokuBoardRepresentation]) -> None:
+        rep = rep_cls()
+        with pytest.raises(ShapeOutOfBoardError):
+            rep.add_blocks([(0, 0), (BOARD_SIZE, 0)])
+
+    def test_group_fill_follows_board_assignment(self, rep_cls: type[_AbstractWoodokuBoardRepresentation]) -> None:
+        rep = rep_cls()
+        full_row = np.full((BOARD_SIZE, BOARD_SIZE), False)
+        full_row[4] = True
+        rep._board = full_row
+        assert rep.find_complete_groups_among(ALL_GROUPS) == (1, GROUP_MASKS[4])
+
+    def test_occupancy_follows_board_writes(self, rep_cls: type[_AbstractWoodokuBoardRepresentation]) -> None:
+        rep = rep_cls()
+        rep.add_blocks(self.three_block_lst)
+        for x, y in self.one_block_lst:
+            rep._board[x, y] = True
+        assert rep.get_mask() == coords_to_mask(self.three_block_lst + self.one_block_lst)
+        assert not rep.is_not_occupied(self.one_block_lst)
+        assert rep.find_complete_groups_among(ALL_GROUPS) == (0, 0)
+
+    def test_board_data_is_read_only(self, rep_cls: type[_AbstractWoodokuBoardRepresentation]) -> None:
+        rep = rep_cls()
+        board = rep.get_board_data()
+        if isinstance(rep, _WoodokuBoardRepresentation):
+            with pytest.raises(ValueError):
+                board[0, 0] = True
+        else:
+            # the bitboard hands out a copy, which writes cannot reach
+            board[0, 0] = True
+        assert rep.is_not_occupied(self.one_block_lst)
+
+    def test_occupancy_follows_board_assignment(self, rep_cls: type[_AbstractWoodokuBoardRepresentation]) -> None:
+        rep = rep_cls()
+        full_row = np.full((BOARD_SIZE, BOARD_SIZE), False)
+        full_row[4] = True
+        rep._board = full_row
+        assert rep.get_mask() == GROUP_MASKS[4]
+        assert rep.is_mask_occupied(GROUP_MASKS[4]) and not rep.is_mask_free(GROUP_MASKS[4] | GROUP_MASKS[5])
+        assert rep.is_mask_free(GROUP_MASKS[5])
+
+
+@pytest.mark.parametrize("backend", ["array", "bitboard"])
+class TestWoodokuBoard:  # pylint: disable=too-many-public-methods
     l_shape: WoodokuShape = WoodokuShape([(0, 0), (1, 0), (1, 1), (1, 2)])
     horizontal_bar_shape: WoodokuShape = WoodokuShape([(0, 0), (0, 1), (0, 2), (0, 3), (0, 4)])
     gun_shape: WoodokuShape = WoodokuShape([(0, 0), (0, 1), (0, 2), (1, 0)])
@@ -142,56 +211,56 @@ class TestWoodokuBoard:
     cross: WoodokuShape = WoodokuShape([(0, 1), (1, 0), (1, 1), (1, 2), (2, 1)])
 
     @pytest.mark.parametrize("row", list(range(BOARD_SIZE)))
-    def test_find_groups_a_row(self, row: int) -> None:
+    def test_find_groups_a_row(self, backend: Backend, row: int) -> None:
         """
         row should be the only group on the board
         """
-        board = WoodokuBoard()
+        board = WoodokuBoard(backend)
         board_with_a_row_occupied = np.full((BOARD_SIZE, BOARD_SIZE), False)
         board_with_a_row_occupied[row] = np.full((BOARD_SIZE,), True)
         board._representation._board = board_with_a_row_occupied
 
         group, group_blocks = board._find_groups()
         assert group == 1
-        assert group_blocks == set((row, col) for col in range(BOARD_SIZE))
+        assert group_blocks == coords_to_mask((row, col) for col in range(BOARD_SIZE))
 
     @pytest.mark.parametrize("col", list(range(BOARD_SIZE)))
-    def test_find_groups_a_col(self, col: int) -> None:
+    def test_find_groups_a_col(self, backend: Backend, col: int) -> None:
         """
         col column should be the only group on the board
         """
-        board = WoodokuBoard()
+        board = WoodokuBoard(backend)
         board_with_a_col_occupied = np.full((BOARD_SIZE, BOARD_SIZE), False)
         board_with_a_col_occupied[:, col] = np.full((BOARD_SIZE,), True)
         board._representation._board = board_with_a_col_occupied
 
         group, group_blocks = board._find_groups()
         assert group == 1
-        assert group_blocks == set((row, col) for row in range(BOARD_SIZE))
+        assert group_blocks == coords_to_mask((row, col) for row in range(BOARD_SIZE))
 
     @pytest.mark.parametrize("index", list(range(BOARD_SIZE)))
-    def test_find_groups_3_by_3(self, index: int) -> None:
+    def test_find_groups_3_by_3(self, backend: Backend, index: int) -> None:
         """
         The box created according to index is the only group on the board
         """
-        board = WoodokuBoard()
+        board = WoodokuBoard(backend)
         box_coordinate = board._get_box_coords(index)
         for x, y in box_coordinate:
             board._representation._board[x, y] = True
 
         group, group_blocks = board._find_groups()
         assert group == 1
-        assert group_blocks == set(box_coordinate)
+        assert group_blocks == coords_to_mask(box_coordinate)
 
     @pytest.mark.parametrize(
         "row, col, index",
         [(random.randint(0, 8), random.randint(0, 8), random.randint(0, 8))],
     )
-    def test_find_groups_a_col_a_row_and_a_3_by_3_block(self, row: int, col: int, index: int) -> None:
+    def test_find_groups_a_col_a_row_and_a_3_by_3_block(self, backend: Backend, row: int, col: int, index: int) -> None:
         """
         three groups is expected to be found
         """
-        board = WoodokuBoard()
+        board = WoodokuBoard(backend)
         repo = np.full((BOARD_SIZE, BOARD_SIZE), False)
         repo[row] = np.full((BOARD_SIZE,), True)  # add a row to the board
         repo[:, col] = np.full((BOARD_SIZE,), True)  # add a column to the board
@@ -206,7 +275,7 @@ class TestWoodokuBoard:
         expected_set = set((row, i) for i in range(BOARD_SIZE))
         expected_set.update([(i, col) for i in range(BOARD_SIZE)])
         expected_set.update(box_coordinate)
-        assert group_blocks == expected_set
+        assert group_blocks == coords_to_mask(expected_set)
 
     @pytest.mark.parametrize(
         "shape",
@@ -219,15 +288,29 @@ class TestWoodokuBoard:
             cross,
         ],
     )
-    def test_add_shape_on_empty_board(self, shape: WoodokuShape) -> None:
+    def test_add_shape_on_empty_board(self, backend: Backend, shape: WoodokuShape) -> None:
         """
         Add shape to valid position on the board and remove all blocks of the shape to test add_shape
         """
-        board = WoodokuBoard()
+        board = WoodokuBoard(backend)
         board.add_shape(shape, 5, 0)
         board._representation.remove_blocks(shape.map_to_board_at(5, 0))
         assert (board._representation._board == np.full((BOARD_SIZE, BOARD_SIZE), False)).all()
 
+    @pytest.mark.parametrize(
+        "shape, location",
+        [
+            (l_shape, (8, 0)),
+            (horizontal_bar_shape, (0, 5)),
+            (one_block, (0, BOARD_SIZE)),
+        ],
+    )
+    def test_add_shape_out_of_board(self, backend: Backend, shape: WoodokuShape, location: tuple[int, int]) -> None:
+        board = WoodokuBoard(backend)
+        with pytest.raises(ShapeOutOfBoardError):
+            board.add_shape(shape, *location)
+        assert not board.get_board_data().any()
+
     @pytest.mark.parametrize(
         "first_shape, first_position, sec_shape, sec_position",
         [
@@ -238,6 +321,7 @@ class TestWoodokuBoard:
     )
     def test_add_shape_without_conflict(
         self,
+        backend: Backend,
         first_shape: WoodokuShape,
         first_position: tuple[int, int],
         sec_shape: WoodokuShape,
@@ -247,7 +331,7 @@ class TestWoodokuBoard:
         first_shape and first_location are chosen so that sec_shape will be NOT overlapped with first_shape when
         adding it at sec_location and no group will form
         """
-        board = WoodokuBoard()
+        board = WoodokuBoard(backend)
         board.add_shape(first_shape, *first_position)
         board.add_shape(sec_shape, *sec_position)
 
@@ -258,36 +342,36 @@ class TestWoodokuBoard:
             expected[x, y] = True
         assert (board._representation._board == expected).all()
 
-    def test_add_shape_with_a_row_formed(self) -> None:
+    def test_add_shape_with_a_row_formed(self, backend: Backend) -> None:
         """
         a row group should be removed by add_shape
         """
-        board = WoodokuBoard()
+        board = WoodokuBoard(backend)
         board.add_shape(self.horizontal_bar_shape, 0, 0)
         board.add_shape(self.gun_shape, 0, 5)
         board.add_shape(self.vertical_two_block, 0, 8)
         group, group_blocks = board._find_groups()
         assert group == 0
-        assert group_blocks == set([])
+        assert group_blocks == 0
 
-    def test_find_groups_almost_a_col_formed(self) -> None:
+    def test_find_groups_almost_a_col_formed(self, backend: Backend) -> None:
         """
         No column is formed
         """
-        board = WoodokuBoard()
+        board = WoodokuBoard(backend)
         board.add_shape(self.gun_shape, 0, 1)
         board.add_shape(self.vertical_two_block, 2, 1)
         board.add_shape(self.gun_shape, 4, 1)
         board.add_shape(self.vertical_two_block, 6, 1)
         group, group_blocks = board._find_groups()
         assert group == 0
-        assert len(group_blocks) == 0
+        assert group_blocks == 0
 
-    def test_add_shape_with_a_col_formed(self) -> None:
+    def test_add_shape_with_a_col_formed(self, backend: Backend) -> None:
         """
         A column group should be removed by add_shape
         """
-        board = WoodokuBoard()
+        board = WoodokuBoard(backend)
         board.add_shape(self.gun_shape, 0, 1)
         board.add_shape(self.vertical_two_block, 2, 1)
         board.add_shape(self.gun_shape, 4, 1)
@@ -295,19 +379,19 @@ class TestWoodokuBoard:
         board.add_shape(self.l_shape, 7, 0)
         group, group_blocks = board._find_groups()
         assert group == 0
-        assert group_blocks == set([])
+        assert group_blocks == 0
 
-    def test_add_shape_with_a_three_by_three_block_formed(self) -> None:
+    def test_add_shape_with_a_three_by_three_block_formed(self, backend: Backend) -> None:
         """
         A 3X3 block group should be removed by add_shape
         """
-        board = WoodokuBoard()
+        board = WoodokuBoard(backend)
         board.add_shape(self.gun_shape, 0, 0)
         board.add_shape(self.horizontal_bar_shape, 1, 1)
         board.add_shape(self.gun_shape, 2, 0)
         group, group_blocks = board._find_groups()
         assert group == 0
-        assert group_blocks == set([])
+        assert group_blocks == 0
 
     @pytest.mark.parametrize(
         "shape, location",
@@ -318,12 +402,12 @@ class TestWoodokuBoard:
         ],
     )
     def test_can_add_shape_at_location_on_empty_board_within_board(
-        self, shape: WoodokuShape, location: tuple[int, int]
+        self, backend: Backend, shape: WoodokuShape, location: tuple[int, int]
     ) -> None:
         """
         Add shape to an empty board where each location to add is at the edge of the game board
         """
-        board = WoodokuBoard()
+        board = WoodokuBoard(backend)
         assert board.can_add_shape_at_location(shape, *location)
 
     @pytest.mark.parametrize(
@@ -335,12 +419,12 @@ class TestWoodokuBoard:
         ],
     )
     def test_can_add_shape_at_location_on_empty_board_go_beyond_board(
-        self, shape: WoodokuShape, location: tuple[int, int]
+        self, backend: Backend, shape: WoodokuShape, location: tuple[int, int]
     ) -> None:
         """
         Add shape to an empty board where location goes beyond the game board
         """
-        board = WoodokuBoard()
+        board = WoodokuBoard(backend)
         assert not board.can_add_shape_at_location(shape, *location)
 
     @pytest.mark.parametrize(
@@ -353,6 +437,7 @@ class TestWoodokuBoard:
     )
     def test_can_add_shape_at_occupied_location(
         self,
+        backend: Backend,
         first_shape: WoodokuShape,
         first_position: tuple[int, int],
         sec_shape: WoodokuShape,
@@ -362,7 +447,7 @@ class TestWoodokuBoard:
         first_shape and first_location are chosen so that sec_shape will be overlapped with first_shape when
         adding it at sec_location
         """
-        board = WoodokuBoard()
+        board = WoodokuBoard(backend)
         board.add_shape(first_shape, *first_position)
         assert not board.can_add_shape_at_location(sec_shape, *sec_position)
 
@@ -377,29 +462,192 @@ class TestWoodokuBoard:
             cross,
         ],
     )
-    def test_can_add_shape_to_board_on_empty_board(self, shape: WoodokuShape) -> None:
-        board = WoodokuBoard()
+    def test_can_add_shape_to_board_on_empty_board(self, backend: Backend, shape: WoodokuShape) -> None:
+        board = WoodokuBoard(backend)
         assert board.can_add_shape_to_board(shape)
 
     @pytest.mark.parametrize("shape", [l_shape, horizontal_bar_shape, gun_shape, vertical_two_block, cross])
-    def test_can_add_shape_to_board_on_crowded_board_fail(self, shape: WoodokuShape) -> None:
+    def test_can_add_shape_to_board_on_crowded_board_fail(self, backend: Backend, shape: WoodokuShape) -> None:
         """
         The board is designed that all positions are occupied except the left diagonal
         """
-        board = WoodokuBoard()
+        board = WoodokuBoard(backend)
         repo = np.full((BOARD_SIZE, BOARD_SIZE), True)
         for x, y in [(i, i) for i in range(BOARD_SIZE)]:
             repo[x, y] = False
         board._representation._board = repo
         assert not board.can_add_shape_to_board(shape)
 
-    def test_can_add_shape_to_board_on_crowded_board_success(self) -> None:
+    def test_can_add_shape_to_board_on_crowded_board_success(self, backend: Backend) -> None:
         """
         The board is designed that all positions are occupied except the left diagonal
         """
-        board = WoodokuBoard()
+        board = WoodokuBoard(backend)
         repo = np.full((BOARD_SIZE, BOARD_SIZE), True)
         for x, y in [(i, i) for i in range(BOARD_SIZE)]:
             repo[x, y] = False
         board._representation._board = repo
         assert board.can_add_shape_to_board(self.one_block)
+
+    @pytest.mark.parametrize("seed", [0, 1, 2])
+    def test_legal_placements_matches_can_add_shape_at_location(self, backend: Backend, seed: int) -> None:
+        """
+        Every entry of the vectorized mask agrees with checking the anchor one at a time on a random board
+        """
+        board = WoodokuBoard(backend)
+        board._representation._board = np.random.default_rng(seed).random((BOARD_SIZE, BOARD_SIZE)) < 0.3
+        shapes = [self.l_shape, self.horizontal_bar_shape, self.cross, self.one_block]
+
+        mask = board.legal_placements(shapes)
+        assert mask.shape == (len(shapes), BOARD_SIZE, BOARD_SIZE)
+        for i, shape in enumerate(shapes):
+            for x in range(BOARD_SIZE):
+                for y in range(BOARD_SIZE):
+                    assert mask[i, x, y] == board.can_add_shape_at_location(shape, x, y)
+
+    def test_legal_placements_on_empty_board(self, backend: Backend) -> None:
+        board = WoodokuBoard(backend)
+        mask = board.legal_placements([self.horizontal_bar_shape])
+        # the bar is 5 blocks wide, so it only fits with its top left corner in the first 5 columns
+        assert mask[0, :, :5].all()
+        assert not mask[0, :, 5:].any()
+
+    @pytest.mark.parametrize("seed", [0, 1, 2, 3])
+    def test_incremental_find_groups_matches_full_scan(self, backend: Backend, seed: int) -> None:
+        """
+        Play a random game and check before each clear that looking only at the groups the placed shape touches finds
+        exactly what a scan of all groups finds
+        """
+        rng = np.random.default_rng(seed)
+        shapes = [self.l_shape, self.horizontal_bar_shape, self.gun_shape, self.vertical_two_block, self.cross]
+        board = WoodokuBoard(backend)
+        rep = board._representation
+        for _ in range(200):
+            shape = shapes[rng.integers(len(shapes))]
+            anchors = np.argwhere(board.legal_placements([shape])[0])
+            if len(anchors) == 0:
+                break
+            x, y = anchors[rng.integers(len(anchors))]
+            shape_mask = shape.get_placement_mask(x, y)
+            rep.add_mask(shape_mask)
+            assert shape.get_placement_groups(x, y) == groups_touching(shape_mask)
+            assert board._find_groups(shape.get_placement_groups(x, y)) == board._find_groups()
+            assert board._find_groups(ALL_GROUPS) == board._find_groups()
+            rep.remove_mask(board._find_groups()[1])
+            if isinstance(rep, _WoodokuBoardRepresentation):
+                assert rep._group_fill == [(rep.get_mask() & group).bit_count() for group in GROUP_MASKS]
+
+    @staticmethod
+    def _state(board: WoodokuBoard) -> tuple[int, int, int, int]:
+        return board._representation.get_mask(), board.get_score(), board.get_streak(), board.get_combo()
+
+    @pytest.mark.parametrize("seed", [0, 1, 2])
+    def test_undo_restores_every_placement(self, backend: Backend, seed: int) -> None:
+        """
+        Play a random game with apply, then undo it placement by placement and check that each undo brings back the
+        board and score as they were before the placement, clears included
+        """
+        rng = np.random.default_rng(seed)
+        # single blocks keep the game going long enough to complete groups
+        shapes = [self.l_shape, self.gun_shape, self.vertical_two_block, self.cross] + [self.one_block] * 4
+        board = WoodokuBoard(backend)
+        history = []
+        for _ in range(200):
+            shape = shapes[rng.integers(len(shapes))]
+            anchors = np.argwhere(board.legal_placements([shape])[0])
+            if len(anchors) == 0:
+                continue
+            x, y = anchors[rng.integers(len(anchors))]
+            state = self._state(board)
+            history.append((state, board.apply(shape, x, y)))
+        assert any(token.cleared for _, token in history)
+
+        for state, token in reversed(history):
+            board.undo(token)
+            assert self._state(board) == state
+            rep = board._representation
+            assert (rep.get_board_data() == mask_to_array(rep.get_mask())).all()
+            if isinstance(rep, _WoodokuBoardRepresentation):
+                assert rep._group_fill == [(rep.get_mask() & group).bit_count() for group in GROUP_MASKS]
+
+    def test_get_mask(self, backend: Backend) -> None:
+        board = WoodokuBoard(backend)
+        board.add_shape(self.l_shape, 2, 3)
+        assert board.get_mask() == array_to_mask(board.get_board_data()) == self.l_shape.get_placement_mask(2, 3)
+
+    def test_apply_matches_add_shape(self, backend: Backend) -> None:
+        applied = WoodokuBoard(backend)
+        added = WoodokuBoard(backend)
+        for y in range(4):
+            applied.apply(self.one_block, 0, y)
+            added.add_shape(self.one_block, 0, y)
+        token = applied.apply(self.horizontal_bar_shape, 0, 4)
+        added.add_shape(self.horizontal_bar_shape, 0, 4)
+        assert self._state(applied) == self._state(added)
+        assert token.cleared == GROUP_MASKS[0]
+
+    def test_apply_out_of_board(self, backend: Backend) -> None:
+        board = WoodokuBoard(backend)
+        with pytest.raises(ShapeOutOfBoardError):
+            board.apply(self.horizontal_bar_shape, 0, 5)
+        assert self._state(board) == (0, 0, 0, 0)
+
+    def test_clone_is_independent(self, backend: Backend) -> None:
+        board = WoodokuBoard(backend)
+        board.add_shape(self.cross, 3, 3)
+        cloned = board.clone()
+        assert self._state(cloned) == self._state(board)
+        cloned.add_shape(self.l_shape, 0, 0)
+        assert board.get_score() == len(self.cross)
+        assert not board.get_board_data()[0, 0]
+        board.add_shape(self.one_block, 8, 8)
+        assert not cloned.get_board_data()[8, 8]
+        assert type(cloned._representation) is type(board._representation)
+
+    @pytest.mark.parametrize("seed", [0, 1, 2])
+    def test_afterstates_match_apply(self, backend: Backend, seed: int) -> None:
+        """
+        Each afterstate is the board, points and streak that applying its placement to a clone of the board gives, on
+        a random board with a streak going, so that placements complete groups and extend the streak
+        """
+        board = WoodokuBoard(backend)
+        for y in range(BOARD_SIZE):
+            board.apply(self.one_block, 0, y)
+        blocks = np.random.default_rng(seed).random((BOARD_SIZE, BOARD_SIZE)) < 0.5
+        blocks[0] = False
+        # row 1 is one block short of complete
+        blocks[1] = True
+        blocks[1, 8] = False
+        board._representation.add_mask(array_to_mask(blocks))
+        shapes = [self.l_shape, self.horizontal_bar_shape, self.one_block]
+
+        afterstates = board.afterstates(shapes)
+        assert any(afterstates.complete.any(axis=1))
+        assert (afterstates.boards == words_to_array(afterstates.words)).all()
+        for i, (choice, x, y) in enumerate(zip(afterstates.shape_choice, afterstates.x, afterstates.y)):
+            cloned = board.clone()
+            token = cloned.apply(shapes[choice], x, y)
+            assert array_to_mask(afterstates.boards[i]) == cloned._representation.get_mask()
+            assert afterstates.rewards[i] == cloned.get_score() - board.get_score()
+            assert afterstates.streaks[i] == cloned.get_streak()
+            cleared = 0
+            for group in np.flatnonzero(afterstates.complete[i]):
+                cleared |= GROUP_MASKS[group]
+            assert cleared == token.cleared
+
+    def test_afterstates_follow_legal_placements(self, backend: Backend) -> None:
+        board = WoodokuBoard(backend)
+        board.add_shape(self.cross, 3, 3)
+        shapes = [self.l_shape, self.horizontal_bar_shape, self.gun_shape]
+        afterstates = board.afterstates(shapes, [True, False, True])
+        legal = board.legal_placements(shapes)
+        legal[1] = False
+        placements = np.column_stack([afterstates.shape_choice, afterstates.x, afterstates.y])
+        assert (placements == np.argwhere(legal)).all()
+        assert self._state(board) == (coords_to_mask(self.cross.map_to_board_at(3, 3)), len(self.cross), 0, 0)
+
+    def test_afterstates_without_placements(self, backend: Backend) -> None:
+        afterstates = WoodokuBoard(backend).afterstates([self.one_block], [False])
+        assert afterstates.words.shape == (0, 2)
+        assert afterstates.boards.shape == (0, BOARD_SIZE, BOARD_SIZE)
+        assert len(afterstates.rewards) == len(afterstates.streaks) == 0
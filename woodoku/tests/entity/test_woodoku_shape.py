@@ -1,4 +1,8 @@
+import pickle
+
 import pytest
+from config import BOARD_SIZE, MAX_SHAPE_SIZE
+from woodoku.entity.bitboard import coords_to_mask
 from woodoku.entity.woodoku_shape import WoodokuShape
 
 
@@ -106,3 +110,65 @@ class TestWoodokuShape:
         coords2: list[tuple[int, int]],
     ) -> None:
         assert set(WoodokuShape(coords1).map_to_board_at(x, y)) == set(coords2)
+
+    @pytest.mark.parametrize(
+        "coords",
+        [
+            ([(0, 0)]),
+            ([(0, 0), (1, 0), (2, 0)]),
+            ([(0, 1), (1, 0), (1, 1), (2, 1)]),
+            ([(0, 0), (0, 1), (0, 2), (0, 3), (0, 4)]),
+        ],
+    )
+    def test_get_placement_mask(self, coords: list[tuple[int, int]]) -> None:
+        shape = WoodokuShape(coords)
+        for x in range(BOARD_SIZE):
+            for y in range(BOARD_SIZE):
+                blocks = shape.map_to_board_at(x, y)
+                if all(0 <= row < BOARD_SIZE and 0 <= col < BOARD_SIZE for row, col in blocks):
+                    assert shape.get_placement_mask(x, y) == coords_to_mask(blocks)
+                else:
+                    assert shape.get_placement_mask(x, y) == 0
+
+    @pytest.mark.parametrize("x, y", [(-1, 0), (0, -1), (BOARD_SIZE, 0), (0, BOARD_SIZE)])
+    def test_get_placement_mask_anchor_out_of_board(self, x: int, y: int) -> None:
+        assert WoodokuShape([(0, 0)]).get_placement_mask(x, y) == 0
+
+    def test_get_shape_data_is_cached(self) -> None:
+        shape = WoodokuShape([(0, 1), (1, 0), (1, 1), (2, 1)])
+        shape_data = shape.get_shape_data()
+        assert shape.get_shape_data() is shape_data
+        assert shape_data.sum() == 4 and shape_data[0, 1] == 1
+        with pytest.raises(ValueError):
+            shape_data[0, 0] = 1
+
+    def test_equal_shapes_are_interned(self) -> None:
+        shape = WoodokuShape([(1, 1), (2, 1), (2, 2)])
+        same = WoodokuShape([(0, 0), (1, 0), (1, 1)])
+        assert shape is same
+        assert hash(shape) == hash(same)
+        assert shape.get_id() == 0b1 | 0b1 << MAX_SHAPE_SIZE | 0b10 << MAX_SHAPE_SIZE
+        assert not hasattr(shape, "__dict__")
+
+    def test_rotate_is_cached(self) -> None:
+        shape = WoodokuShape([(0, 0), (0, 1), (0, 2), (1, 0)])
+        assert shape.rotate() is shape.rotate()
+        assert shape.rotate().rotate().rotate().rotate() is shape
+
+    def test_bounding_box_and_mask(self) -> None:
+        shape = WoodokuShape([(0, 0), (0, 1), (0, 2), (1, 0)])
+        assert (shape.get_height(), shape.get_width()) == (2, 3)
+        assert shape.get_mask() == shape.get_placement_mask(0, 0) == coords_to_mask(shape.get_coords())
+
+    def test_pickle_interns(self) -> None:
+        shape = WoodokuShape([(0, 1), (1, 0), (1, 1), (2, 1)])
+        assert pickle.loads(pickle.dumps(shape)) is shape
+
+    @pytest.mark.parametrize("coords", [[(0, 0), (0, MAX_SHAPE_SIZE)], [(0, 0), (MAX_SHAPE_SIZE, 1)]])
+    def test_invalid_shape(self, coords: list[tuple[int, int]]) -> None:
+        with pytest.raises(ValueError, match="must fit"):
+            WoodokuShape(coords)
+
+    def test_empty_shape(self) -> None:
+        with pytest.raises(ValueError, match="at least one block"):
+            WoodokuShape([])
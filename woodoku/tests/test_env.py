@@ -1,7 +1,11 @@
 import numpy as np
 import pytest
 
-from woodoku.env import Action, Observation, WoodokuGameEnv
+from config import BOARD_SIZE, NUM_SHAPES, OBSERVATION_N
+
+from woodoku.env import PACKED_OBSERVATION_N, Action, Observation, WoodokuGameEnv
+
+# pylint: disable=protected-access
 
 
 def to_action(shape_choice: int, x: int, y: int) -> Action:
@@ -50,3 +54,64 @@ class TestWoodokuGameEnv:
         env = WoodokuGameEnv()
         obs = env.reset()
         assert isinstance(obs, Observation)
+
+    def test_action_mask_on_new_game(self) -> None:
+        env = WoodokuGameEnv()
+        mask = env.action_mask()
+        assert mask.shape == (NUM_SHAPES, BOARD_SIZE, BOARD_SIZE)
+        # every shape fits somewhere on an empty board
+        assert mask.reshape(NUM_SHAPES, -1).any(axis=1).all()
+
+    def test_action_mask_excludes_unavailable_shape(self) -> None:
+        env = WoodokuGameEnv()
+        shape_choice, x, y = np.argwhere(env.action_mask())[0]
+        env.step(to_action(shape_choice, x, y))
+        assert not env.action_mask()[shape_choice].any()
+
+    @pytest.mark.parametrize("dtype", [np.uint8, np.float32])
+    def test_observation_dtype(self, dtype: type) -> None:
+        env = WoodokuGameEnv()
+        compact_env = WoodokuGameEnv(observation_dtype=dtype)
+        compact_env._woodoku_board, compact_env._shapes = env._woodoku_board, env._shapes
+        obs = compact_env.observe()
+        assert obs.data.dtype == dtype
+        assert (obs.data == env.observe().data).all()
+
+    def test_observe_into_buffer(self) -> None:
+        env = WoodokuGameEnv()
+        buffer = np.full((2, OBSERVATION_N), -1.0)
+        obs = env.observe(out=buffer[1])
+        assert obs.data.base is buffer
+        assert (buffer[1] == env.observe().data).all()
+        assert (buffer[0] == -1).all()
+
+
+class TestObservationPacking:
+    def test_pack_size(self) -> None:
+        assert Observation.pack(WoodokuGameEnv().observe().data).shape == (PACKED_OBSERVATION_N,)
+        assert PACKED_OBSERVATION_N <= 21
+
+    def test_round_trip(self) -> None:
+        rng = np.random.default_rng(0)
+        data = rng.integers(2, size=(3, 4, OBSERVATION_N)).astype(np.float64)
+        data[..., -1] = rng.integers(256, size=(3, 4))
+        packed = Observation.pack(data)
+        assert packed.shape == (3, 4, PACKED_OBSERVATION_N)
+        assert (Observation.unpack(packed) == data).all()
+
+    def test_round_trip_game(self) -> None:
+        env = WoodokuGameEnv()
+        shape_choice, x, y = np.argwhere(env.action_mask())[0]
+        data = env.step(to_action(shape_choice, x, y))[0].data
+        assert (Observation.unpack(Observation.pack(data)) == data).all()
+
+    def test_pack_saturates_streak(self) -> None:
+        data = np.zeros(OBSERVATION_N)
+        data[-1] = 1000
+        assert Observation.unpack(Observation.pack(data))[-1] == 255
+
+    def test_unpack_into_buffer(self) -> None:
+        data = np.ones((2, OBSERVATION_N), dtype=np.float32)
+        buffer = np.zeros((2, OBSERVATION_N), dtype=np.float32)
+        assert Observation.unpack(Observation.pack(data), out=buffer) is buffer
+        assert (buffer == data).all()
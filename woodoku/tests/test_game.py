@@ -1,3 +1,4 @@
+import random
 from unittest.mock import MagicMock
 import pytest
 
@@ -62,6 +63,10 @@ class TestGame:
         selected = random_shapes(shapes, num)
         assert len(selected) == num
 
+    def test_random_shapes_with_generator(self) -> None:
+        shapes = [WoodokuShape([(0, 0)]), WoodokuShape([(0, 0), (1, 0)]), WoodokuShape([(0, 0), (0, 1)])]
+        assert random_shapes(shapes, 5, random.Random(3)) == random_shapes(shapes, 5, random.Random(3))
+
     def test_is_not_out_of_space(self) -> None:
         board = WoodokuBoard()
         board.can_add_shape_to_board = MagicMock(side_effect=[True, True])  # type: ignore[method-assign]
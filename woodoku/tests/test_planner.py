@@ -0,0 +1,168 @@
+import random
+from typing import Sequence
+
+import numpy as np
+import pytest
+from jaxtyping import Float
+
+from config import BOARD_SIZE, CONFIG_FILE, NUM_SHAPES
+from woodoku.entity.symmetry import BoardSymmetry
+from woodoku.entity.woodoku_board import Afterstates, WoodokuBoard
+from woodoku.entity.woodoku_shape import WoodokuShape
+from woodoku.planner import FREE_CELL_VALUE, GAME_OVER_VALUE, HOLE_PENALTY, ExpectimaxPlanner, board_heuristic
+from woodoku.shape_catalog import load_shape_catalog
+from woodoku.utils import random_shapes
+
+# pylint: disable=protected-access
+
+
+def _no_heuristic(afterstates: Afterstates) -> Float[np.ndarray, "P"]:  # type: ignore[type-arg]
+    return np.zeros(len(afterstates.rewards))
+
+
+def _best_points(board: WoodokuBoard, left: Sequence[WoodokuShape]) -> float:
+    """The most points placing every shape of `left` in any order can score, by trying every order and placement"""
+    if not left:
+        return 0.0
+    best = GAME_OVER_VALUE
+    found = False
+    for i, shape in enumerate(left):
+        for x, y in np.argwhere(board.legal_placements([shape])[0]):
+            child = board.clone()
+            child.apply(shape, x, y)
+            points = child.get_score() - board.get_score() + _best_points(child, list(left[:i]) + list(left[i + 1 :]))
+            best = points if not found else max(best, points)
+            found = True
+    return best
+
+
+def _random_board(seed: int, density: float) -> WoodokuBoard:
+    board = WoodokuBoard("bitboard")
+    board._representation._board = np.random.default_rng(seed).random((BOARD_SIZE, BOARD_SIZE)) < density
+    return board
+
+
+class TestExpectimaxPlanner:
+    one_block: WoodokuShape = WoodokuShape([(0, 0)])
+    vertical_two_block: WoodokuShape = WoodokuShape([(0, 0), (1, 0)])
+    l_shape: WoodokuShape = WoodokuShape([(0, 0), (1, 0), (1, 1)])
+    square_shape: WoodokuShape = WoodokuShape([(0, 0), (0, 1), (1, 0), (1, 1)])
+    horizontal_bar_shape: WoodokuShape = WoodokuShape([(0, 0), (0, 1), (0, 2), (0, 3), (0, 4)])
+
+    @pytest.mark.parametrize("seed", [0, 1, 2, 3])
+    def test_plan_matches_exhaustive_search(self, seed: int) -> None:
+        """
+        With every placement expanded and no heuristic, the plan scores the most points any order and placements of
+        the hand can, and following it scores exactly its value
+        """
+        board = _random_board(seed, 0.7)
+        hand = [self.one_block, self.vertical_two_block, self.l_shape]
+        planner = ExpectimaxPlanner([], width=BOARD_SIZE**3, heuristic=_no_heuristic)
+        mask = board._representation.get_mask()
+
+        plan = planner.plan(board, hand)
+        assert board._representation.get_mask() == mask
+        assert plan.value == _best_points(board, hand)
+        if plan.value > GAME_OVER_VALUE / 2:
+            assert sorted(choice for choice, _, _ in plan.placements) == [0, 1, 2]
+            for choice, x, y in plan.placements:
+                board.add_shape(hand[choice], x, y)
+            assert board.get_score() == plan.value
+
+    @pytest.mark.parametrize("seed", [0, 1])
+    def test_identical_shapes_match_exhaustive_search(self, seed: int) -> None:
+        board = _random_board(seed, 0.7)
+        hand = [self.one_block, self.vertical_two_block, self.one_block]
+        plan = ExpectimaxPlanner([], width=BOARD_SIZE**3, heuristic=_no_heuristic).plan(board, hand)
+        assert plan.value == _best_points(board, hand)
+        assert sorted(choice for choice, _, _ in plan.placements) == [0, 1, 2]
+
+    def test_each_position_is_searched_once(self) -> None:
+        """
+        Three blocks cannot complete a group of a checkerboard, so the positions of a turn are the sets of up to three
+        of its free cells, each searched once whatever the order and copy of the blocks that reach it
+        """
+        board = WoodokuBoard("bitboard")
+        board._representation._board = np.indices((BOARD_SIZE, BOARD_SIZE)).sum(axis=0) % 2 == 0
+        free = BOARD_SIZE**2 // 2
+        planner = ExpectimaxPlanner([], width=BOARD_SIZE**3, heuristic=_no_heuristic)
+        plan = planner.plan(board, [self.one_block] * 3)
+        assert plan.value == 3
+        # the positions with no block, one block and two blocks placed, the last block being valued at once
+        assert planner.nodes == 1 + free + free * (free - 1) // 2
+
+    @pytest.mark.parametrize("depth, width", [(0, 6), (1, 2)])
+    def test_pruning_keeps_the_plan_of_a_beam(self, depth: int, width: int) -> None:
+        """Below the full branching, pruning still finds the plan of the unpruned search, with fewer states searched"""
+        catalog = load_shape_catalog(CONFIG_FILE)
+        rng = random.Random(0)
+        planners = [
+            ExpectimaxPlanner(catalog, depth=depth, width=width, samples=2, prune=prune, seed=0)
+            for prune in (True, False)
+        ]
+        for seed in range(8):
+            board = _random_board(seed, 0.4)
+            hand = random_shapes(catalog, NUM_SHAPES, rng)
+            hand[2] = hand[0]
+            assert planners[0].plan(board, hand) == planners[1].plan(board, hand)
+        assert planners[0].nodes < planners[1].nodes
+
+    def test_plan_uses_available_shapes(self) -> None:
+        board = _random_board(5, 0.3)
+        hand = [self.horizontal_bar_shape, self.one_block, self.one_block]
+        plan = ExpectimaxPlanner([]).plan(board, hand, [False, True, True])
+        assert sorted(choice for choice, _, _ in plan.placements) == [1, 2]
+        for choice, x, y in plan.placements:
+            assert board.can_add_shape_at_location(hand[choice], x, y)
+            board.add_shape(hand[choice], x, y)
+
+    def test_game_over(self) -> None:
+        board = _random_board(0, 1.0)
+        plan = ExpectimaxPlanner([]).plan(board, [self.one_block])
+        assert plan == ((), GAME_OVER_VALUE)
+
+    def test_transpositions_are_found(self) -> None:
+        """Placing two shapes in either order reaches the same board, which is searched only once"""
+        planner = ExpectimaxPlanner([], width=BOARD_SIZE**3)
+        planner.plan(_random_board(1, 0.7), [self.one_block, self.vertical_two_block, self.l_shape])
+        assert planner.table.hits > 0
+
+    def test_symmetric_states_are_found(self) -> None:
+        """
+        On an empty board, the boards one block leads to are rotations and mirrors of 15 of them, with a square left to
+        place that they leave as it is
+        """
+        catalog = load_shape_catalog(CONFIG_FILE)
+        hand = [self.one_block, self.square_shape]
+        plain = ExpectimaxPlanner(catalog, width=BOARD_SIZE**3)
+        symmetric = ExpectimaxPlanner(catalog, width=BOARD_SIZE**3, symmetry=BoardSymmetry(catalog))
+        board = WoodokuBoard("bitboard")
+        plans = [plain.plan(board, hand), symmetric.plan(board, hand)]
+        assert plans[0].value == plans[1].value
+        assert plain.table.hits == 0
+        assert symmetric.table.hits == BOARD_SIZE**2 - 15
+        for choice, x, y in plans[1].placements:
+            board.add_shape(hand[choice], x, y)
+        assert board.get_score() == len(self.one_block) + len(self.square_shape)
+
+    def test_plan_ahead(self) -> None:
+        catalog = load_shape_catalog(CONFIG_FILE)
+        board = _random_board(2, 0.4)
+        hand = [self.l_shape, self.horizontal_bar_shape, self.one_block]
+        plans = [ExpectimaxPlanner(catalog, depth=1, width=2, samples=2, seed=7).plan(board, hand) for _ in range(2)]
+        assert plans[0] == plans[1]
+        for choice, x, y in plans[0].placements:
+            board.add_shape(hand[choice], x, y)
+        assert len(plans[0].placements) == 3
+
+    def test_board_heuristic(self) -> None:
+        board = WoodokuBoard("bitboard")
+        # walls the corner cell (0, 0) in
+        board.add_shape(self.vertical_two_block, 0, 1)
+        board.add_shape(self.one_block, 1, 0)
+        afterstates = board.afterstates([self.one_block])
+        values = board_heuristic(afterstates)
+        corner = (afterstates.x == 0) & (afterstates.y == 0)
+        # filling the corner leaves no hole, filling any other cell keeps it
+        assert values[corner] == [FREE_CELL_VALUE * (BOARD_SIZE**2 - 4)]
+        assert (values[~corner] == FREE_CELL_VALUE * (BOARD_SIZE**2 - 4) - HOLE_PENALTY).all()
@@ -0,0 +1,100 @@
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+
+from config import BOARD_SIZE, CONFIG_FILE
+from woodoku import shape_catalog
+from woodoku.entity.woodoku_shape import WoodokuShape
+from woodoku.shape_catalog import load_shape_catalog
+from woodoku.utils import get_all_shapes_from_file
+
+# pylint: disable=protected-access
+
+
+def modify_config(config_path: str) -> None:
+    """Replace the shapes of the config file by a single block, making sure its modification time changes"""
+    stat = os.stat(config_path)
+    with open(config_path, "w", encoding="utf-8") as config:
+        config.write("raw_shapes:\n  - [[0, 0]]\n")
+    os.utime(config_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+
+
+def parse_forbidden(config_path: str) -> list[WoodokuShape]:
+    raise AssertionError(f"{config_path} should not be parsed")
+
+
+@pytest.fixture(name="config_path")
+def fixture_config_path(tmp_path: Path) -> str:
+    """A copy of the shape config file that the tests are free to modify"""
+    config_path = str(tmp_path / "config.yaml")
+    shutil.copy(CONFIG_FILE, config_path)
+    return config_path
+
+
+def test_load_shape_catalog_matches_config_file(config_path: str) -> None:
+    assert load_shape_catalog(config_path) == get_all_shapes_from_file(config_path)
+
+
+def test_load_shape_catalog_is_cached(config_path: str) -> None:
+    shapes = load_shape_catalog(config_path)
+    again = load_shape_catalog(config_path)
+    assert all(shape is same for shape, same in zip(shapes, again))
+    # callers get their own list
+    again.pop()
+    assert len(load_shape_catalog(config_path)) == len(shapes)
+
+
+def test_load_shape_catalog_reloads_modified_config_file(config_path: str) -> None:
+    shapes = load_shape_catalog(config_path)
+    modify_config(config_path)
+    assert len(load_shape_catalog(config_path)) == 1 < len(shapes)
+
+
+def test_compiled_catalog_round_trip(config_path: str, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    compiled_path = str(tmp_path / "shapes.npz")
+    expected = get_all_shapes_from_file(config_path)
+    load_shape_catalog(config_path, compiled_path)
+
+    # a later process reads the compiled catalog without parsing the config file
+    monkeypatch.setattr(shape_catalog, "_CATALOGS", {})
+    monkeypatch.setattr(shape_catalog, "get_all_shapes_from_file", parse_forbidden)
+    shapes = load_shape_catalog(config_path, compiled_path)
+    assert shapes == expected
+    for shape, expected_shape in zip(shapes, expected):
+        assert shape.get_placement_masks() == expected_shape.get_placement_masks()
+        assert shape.get_anchor_mask() == expected_shape.get_anchor_mask()
+        for x in range(BOARD_SIZE):
+            for y in range(BOARD_SIZE):
+                assert shape.get_placement_groups(x, y) == expected_shape.get_placement_groups(x, y)
+
+
+def test_stale_compiled_catalog_is_rewritten(config_path: str, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    compiled_path = str(tmp_path / "shapes.npz")
+    load_shape_catalog(config_path, compiled_path)
+    modify_config(config_path)
+    assert len(load_shape_catalog(config_path, compiled_path)) == 1
+
+    monkeypatch.setattr(shape_catalog, "_CATALOGS", {})
+    monkeypatch.setattr(shape_catalog, "get_all_shapes_from_file", parse_forbidden)
+    assert len(load_shape_catalog(config_path, compiled_path)) == 1
+
+
+def test_compiled_catalog_without_npz_suffix(config_path: str, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    compiled_path = str(tmp_path / "shapes.catalog")
+    shapes = load_shape_catalog(config_path, compiled_path)
+    # the exact path is written, and no temporary file is left behind
+    assert sorted(os.listdir(tmp_path)) == ["config.yaml", "shapes.catalog"]
+
+    monkeypatch.setattr(shape_catalog, "_CATALOGS", {})
+    monkeypatch.setattr(shape_catalog, "get_all_shapes_from_file", parse_forbidden)
+    assert load_shape_catalog(config_path, compiled_path) == shapes
+
+
+def test_modified_config_file_evicts_cached_catalog(config_path: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(shape_catalog, "_CATALOGS", {})
+    load_shape_catalog(config_path)
+    modify_config(config_path)
+    load_shape_catalog(config_path)
+    assert [mtime_ns for _, mtime_ns in shape_catalog._CATALOGS] == [os.stat(config_path).st_mtime_ns]
@@ -0,0 +1,78 @@
+import pytest
+
+from woodoku.entity.bitboard import FULL_MASK, GROUP_MASKS, cell_bit
+from woodoku.entity.woodoku_shape import WoodokuShape
+from woodoku.transposition import TranspositionTable, ZobristKeys
+
+
+class TestZobristKeys:
+    one_block: WoodokuShape = WoodokuShape([(0, 0)])
+    three_bar: WoodokuShape = WoodokuShape([(0, 0), (0, 1), (0, 2)])
+
+    def test_board_key_is_xor_of_cell_keys(self) -> None:
+        keys = ZobristKeys()
+        assert keys.board(0) == 0
+        cells = [keys.board(cell_bit(x, y)) for x in range(9) for y in range(9)]
+        assert len(set(cells)) == len(cells)
+        expected = 0
+        for cell in cells:
+            expected ^= cell
+        assert keys.board(FULL_MASK) == expected
+
+    def test_board_key_changes_incrementally(self) -> None:
+        keys = ZobristKeys()
+        before = GROUP_MASKS[0] & ~cell_bit(0, 8) | cell_bit(4, 4)
+        placed = cell_bit(0, 8) | cell_bit(1, 8)
+        after = (before | placed) & ~GROUP_MASKS[0]
+        assert keys.board(after) == keys.board(before) ^ keys.board(placed ^ GROUP_MASKS[0])
+
+    def test_shapes_key_is_of_the_multiset(self) -> None:
+        keys = ZobristKeys()
+        assert keys.shapes([self.one_block, self.three_bar]) == keys.shapes([self.three_bar, self.one_block])
+        # identical shapes do not cancel out
+        assert keys.shapes([self.one_block, self.one_block]) not in (0, keys.shapes([]))
+        assert keys.shapes([self.one_block, self.three_bar, self.one_block]) == keys.shapes(
+            [self.one_block, self.one_block]
+        ) ^ keys.shape(self.three_bar, 0)
+
+    def test_same_seed_same_keys(self) -> None:
+        assert ZobristKeys(1).state(12345, 2, [self.three_bar]) == ZobristKeys(1).state(12345, 2, [self.three_bar])
+        assert ZobristKeys(1).board(FULL_MASK) != ZobristKeys(2).board(FULL_MASK)
+
+
+class TestTranspositionTable:
+    def test_get_what_was_put(self) -> None:
+        table = TranspositionTable(8)
+        table.put(21, 1, 3.5, ())
+        entry = table.get(21)
+        assert entry is not None and (entry.depth, entry.value) == (1, 3.5)
+        # same slot, other key
+        assert table.get(21 + 8) is None
+        assert (table.hits, table.misses, len(table)) == (1, 1, 1)
+
+    def test_depth_preferred_replacement(self) -> None:
+        table = TranspositionTable(8)
+        table.put(3, 2, 1.0, ())
+        table.put(11, 1, 2.0, ())
+        assert table.get(11) is None and table.get(3) is not None
+        table.put(11, 2, 2.0, ())
+        assert table.get(3) is None and table.get(11) is not None
+
+    def test_new_search_replaces_old_results(self) -> None:
+        table = TranspositionTable(8)
+        table.put(3, 5, 1.0, ())
+        table.new_search()
+        assert table.get(3) is not None
+        table.put(11, 0, 2.0, ())
+        assert table.get(11) is not None
+
+    def test_clear(self) -> None:
+        table = TranspositionTable(4)
+        table.put(1, 0, 1.0, ())
+        table.get(1)
+        table.clear()
+        assert (len(table), table.hits, table.misses) == (0, 0, 0)
+
+    def test_capacity_is_a_power_of_two(self) -> None:
+        with pytest.raises(AssertionError):
+            TranspositionTable(6)
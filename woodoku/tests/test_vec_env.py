@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+
+from config import BOARD_SIZE, NUM_SHAPES, OBSERVATION_N, REWARD_INVALID_LOCATION, REWARD_INVALID_SHAPE
+from woodoku.entity.bitboard import FULL_MASK, masks_to_words
+from woodoku.entity.score_agent import ScoreAgent, batch_calculate_winning
+from woodoku.env import Action, WoodokuGameEnv
+from woodoku.vec_env import VecWoodokuGameEnv
+
+# pylint: disable=protected-access
+
+
+def sync_shapes(env: WoodokuGameEnv, vec_env: VecWoodokuGameEnv, i: int) -> None:
+    """Give the single game the shapes game `i` of `vec_env` is playing with, since both draw them at random"""
+    all_shapes = vec_env.get_all_shapes()
+    env._shapes = [all_shapes[shape_id] for shape_id in vec_env.get_shapes()[i]]
+    env._availability = list(vec_env.get_availability()[i])
+    env._available_count = sum(env._availability)
+
+
+class TestVecWoodokuGameEnv:
+    def test_reset(self) -> None:
+        vec_env = VecWoodokuGameEnv(4, seed=0)
+        obs = vec_env.reset()
+        assert obs.shape == (4, OBSERVATION_N)
+        assert not vec_env.get_board_data().any()
+        assert vec_env.get_availability().all()
+
+    @pytest.mark.parametrize("seed", [0, 1, 2])
+    def test_step_matches_single_env(self, seed: int) -> None:
+        """
+        Step N games with random actions, mostly legal ones, and check every reward, done flag and observation against
+        N WoodokuGameEnv fed the same shapes and actions
+        """
+        n = 8
+        rng = np.random.default_rng(seed)
+        vec_env = VecWoodokuGameEnv(n, seed=seed)
+        envs = [WoodokuGameEnv() for _ in range(n)]
+        for i, env in enumerate(envs):
+            sync_shapes(env, vec_env, i)
+        for _ in range(200):
+            masks = vec_env.action_mask()
+            for i, env in enumerate(envs):
+                assert (masks[i] == env.action_mask()).all()
+            actions = np.array(
+                [
+                    (
+                        np.argwhere(mask)[rng.integers(mask.sum())]
+                        if mask.any() and rng.random() < 0.8
+                        # out of board anchors are invalid locations too
+                        else [
+                            rng.integers(NUM_SHAPES),
+                            rng.integers(-1, BOARD_SIZE + 1),
+                            rng.integers(-1, BOARD_SIZE + 1),
+                        ]
+                    )
+                    for mask in masks
+                ]
+            )
+            obs, rewards, dones = vec_env.step(actions)
+            for i, env in enumerate(envs):
+                _, expected_reward, expected_done = env.step(Action(actions[i]))
+                assert rewards[i] == expected_reward
+                assert dones[i] == expected_done
+                if expected_done:
+                    env.reset()
+                sync_shapes(env, vec_env, i)
+                assert (obs[i] == env._observe().data).all()
+
+    def test_step_into_buffer(self) -> None:
+        vec_env = VecWoodokuGameEnv(3, seed=0, observation_dtype=np.uint8)
+        buffer = np.zeros((3, OBSERVATION_N), dtype=np.uint8)
+        obs, _, _ = vec_env.step(np.zeros((3, 3), dtype=np.int_), out=buffer)
+        assert obs is buffer
+        assert (obs == vec_env.observe().astype(np.uint8)).all()
+        assert obs[:, : BOARD_SIZE * BOARD_SIZE].any()
+
+    def test_step_invalid_actions(self) -> None:
+        vec_env = VecWoodokuGameEnv(2, seed=0)
+        vec_env.step(np.array([[0, 0, 0], [0, 0, 0]]))
+        _, rewards, dones = vec_env.step(np.array([[0, 4, 4], [1, 0, 0]]))
+        assert list(rewards) == [REWARD_INVALID_SHAPE, REWARD_INVALID_LOCATION]
+        assert not dones.any()
+
+    def test_full_board_ends_and_resets(self) -> None:
+        vec_env = VecWoodokuGameEnv(2, seed=0)
+        vec_env._boards[0] = masks_to_words([FULL_MASK])[0]
+        obs, rewards, dones = vec_env.step(np.array([[0, 0, 0], [0, 0, 0]]))
+        assert list(dones) == [True, False]
+        assert rewards[0] == 0 and rewards[1] > 0
+        assert not obs[0, : BOARD_SIZE * BOARD_SIZE].any()
+        assert vec_env.get_scores()[0] == 0
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_batch_calculate_winning_matches_score_agent(seed: int) -> None:
+    rng = np.random.default_rng(seed)
+    blocks = rng.integers(1, 6, size=(50, 4))
+    groups = rng.choice(4, p=[0.6, 0.2, 0.1, 0.1], size=(50, 4))
+    agents = [ScoreAgent() for _ in range(4)]
+    scores, streaks = np.zeros(4, dtype=np.int_), np.zeros(4, dtype=np.int_)
+    for step_blocks, step_groups in zip(blocks, groups):
+        gains, streaks = batch_calculate_winning(step_blocks, step_groups, streaks)
+        scores += gains
+        for agent, block, group in zip(agents, step_blocks, step_groups):
+            agent.calculate_winning(int(block), int(group))
+        assert list(scores) == [agent.get_score() for agent in agents]
+        assert list(streaks) == [agent.get_streak() for agent in agents]
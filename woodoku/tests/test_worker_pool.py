@@ -0,0 +1,75 @@
+import os
+from typing import Any, Iterator
+
+import numpy as np
+import numpy.typing as npt
+import pytest
+
+from config import NUM_SHAPES, OBSERVATION_N
+from woodoku import worker_pool
+from woodoku.worker_pool import WoodokuWorkerPool
+
+# pylint: disable=protected-access
+
+
+def random_legal_actions(masks: npt.NDArray[np.bool_], rng: np.random.Generator) -> npt.NDArray[np.int_]:
+    """Choose a random legal action for every game, or any action for the games that have none"""
+    return np.array([np.argwhere(mask)[rng.integers(mask.sum())] if mask.any() else [0, 0, 0] for mask in masks])
+
+
+def crashing_worker(*_: Any) -> None:
+    """A worker that crashes as soon as it starts"""
+    os._exit(3)
+
+
+class TestWoodokuWorkerPool:
+    @pytest.fixture(name="pool")
+    def fixture_pool(self) -> Iterator[WoodokuWorkerPool]:
+        with WoodokuWorkerPool(5, num_workers=2, seed=0) as pool:
+            yield pool
+
+    def test_reset(self, pool: WoodokuWorkerPool) -> None:
+        obs = pool.reset()
+        assert obs.shape == (5, OBSERVATION_N)
+        assert not obs[:, :81].any()
+        assert pool.action_mask().reshape(5, NUM_SHAPES, -1).any(axis=2).all()
+
+    def test_step_until_games_end(self, pool: WoodokuWorkerPool) -> None:
+        rng = np.random.default_rng(0)
+        pool.reset()
+        ended = np.zeros(5, dtype=bool)
+        for _ in range(300):
+            obs, rewards, dones = pool.step(random_legal_actions(pool.action_mask(), rng))
+            # legal placements always score, games that end score nothing and start over on an empty board
+            assert (rewards[~dones] > 0).all()
+            assert (rewards[dones] == 0).all()
+            assert not obs[dones, :81].any()
+            ended |= dones
+        assert ended.all()
+
+    def test_restarts_crashed_worker(self, pool: WoodokuWorkerPool) -> None:
+        rng = np.random.default_rng(0)
+        pool.reset()
+        pool.step(random_legal_actions(pool.action_mask(), rng))
+        pool._processes[0].kill()
+        pool._processes[0].join()
+        obs, rewards, dones = pool.step(random_legal_actions(pool.action_mask(), rng))
+        assert pool.restarts == 1
+        # the first worker runs the first 2 games, which are lost
+        assert list(dones) == [True, True, False, False, False]
+        assert (rewards[:2] == 0).all()
+        assert not obs[:2, :81].any()
+        _, rewards, dones = pool.step(random_legal_actions(pool.action_mask(), rng))
+        assert (rewards > 0).all()
+
+    def test_gives_up_on_worker_that_keeps_crashing(
+        self, pool: WoodokuWorkerPool, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        pool.reset()
+        pool._processes[1].kill()
+        pool._processes[1].join()
+        # forked replacements run the module's worker function as it is when they start
+        monkeypatch.setattr(worker_pool, "_worker", crashing_worker)
+        with pytest.raises(RuntimeError, match="worker 1 .* exit code 3"):
+            pool.step(np.zeros((5, 3), dtype=np.int_))
+        assert pool.restarts == worker_pool._MAX_RESTARTS
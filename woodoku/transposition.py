@@ -0,0 +1,157 @@
+from __future__ import annotations
+import random
+from typing import NamedTuple, Optional, Sequence
+
+from woodoku.entity.bitboard import CELL_COUNT
+from woodoku.entity.woodoku_shape import WoodokuShape
+
+_KEY_BITS = 64
+_BYTE_BITS = 8
+
+
+class ZobristKeys:
+    """
+    Random 64-bit keys that hash a search state, made of a board, a streak, the shapes left to place and a search depth,
+    as the XOR of the keys of its parts.
+
+    Every cell has a key, and the key of a bitboard is the XOR of the keys of its occupied cells, looked up a byte of the
+    bitboard at a time. XOR is its own inverse, so placing a shape that clears groups changes the key of the board by the
+    key of `placed ^ cleared`, without hashing the whole board again. The shapes left are a multiset: the k-th copy of a
+    shape has a key of its own, so that two identical shapes do not cancel out.
+    """
+
+    _rng: random.Random
+    _bytes: list[list[int]]
+    _streaks: list[int]
+    _depths: list[int]
+    _shapes: dict[tuple[WoodokuShape, int], int]
+
+    def __init__(self, seed: Optional[int] = 0) -> None:
+        """
+        Args:
+            seed: The seed of the keys.
+        """
+        self._rng = random.Random(seed)
+        cells = [self._rng.getrandbits(_KEY_BITS) for _ in range(CELL_COUNT)]
+        self._bytes = []
+        for start in range(0, CELL_COUNT, _BYTE_BITS):
+            table = [0] * (1 << _BYTE_BITS)
+            for value in range(1, 1 << _BYTE_BITS):
+                # the key of a byte is the key of the byte without its highest bit, and the key of that bit
+                high = value.bit_length() - 1
+                table[value] = table[value ^ (1 << high)] ^ (cells[start + high] if start + high < CELL_COUNT else 0)
+            self._bytes.append(table)
+        self._streaks = []
+        self._depths = []
+        self._shapes = {}
+
+    def board(self, mask: int) -> int:
+        """The key of the bitboard `mask`."""
+        key = 0
+        for table in self._bytes:
+            key ^= table[mask & 0xFF]
+            mask >>= _BYTE_BITS
+        return key
+
+    def streak(self, streak: int) -> int:
+        return self._key(self._streaks, streak)
+
+    def depth(self, depth: int) -> int:
+        return self._key(self._depths, depth)
+
+    def shape(self, shape: WoodokuShape, copy: int) -> int:
+        """The key of the `copy`-th copy of `shape` among the shapes left, counting from 0."""
+        key = self._shapes.get((shape, copy))
+        if key is None:
+            key = self._shapes[(shape, copy)] = self._rng.getrandbits(_KEY_BITS)
+        return key
+
+    def shapes(self, shapes: Sequence[WoodokuShape]) -> int:
+        """The key of the multiset of `shapes`."""
+        key = 0
+        for i, shape in enumerate(shapes):
+            key ^= self.shape(shape, shapes[:i].count(shape))
+        return key
+
+    def state(self, mask: int, streak: int, shapes: Sequence[WoodokuShape]) -> int:
+        """The key of the board `mask` with `streak` and `shapes` left to place."""
+        return self.board(mask) ^ self.streak(streak) ^ self.shapes(shapes)
+
+    def _key(self, keys: list[int], index: int) -> int:
+        """The `index`-th key of `keys`, drawing the keys up to it the first time it is asked for."""
+        while len(keys) <= index:
+            keys.append(self._rng.getrandbits(_KEY_BITS))
+        return keys[index]
+
+
+class TableEntry(NamedTuple):
+    """
+    A search result stored in a `TranspositionTable`.
+
+    Attributes:
+        key: The Zobrist key of the searched state, depth included.
+        depth: How many shapes are drawn ahead in the search, the deeper the more work the result saves.
+        value: The value of the state.
+        moves: The best placements from the state, as the placed shape, x and y.
+        generation: The search the result was stored in.
+    """
+
+    key: int
+    depth: int
+    value: float
+    moves: tuple[tuple[WoodokuShape, int, int], ...]
+    generation: int
+
+
+class TranspositionTable:
+    """
+    Search results in a fixed number of slots, indexed by the low bits of their Zobrist key, so memory stays bounded
+    however long the search runs.
+
+    A result is kept in the slot of its key, and found again only if the full key matches. Replacement is
+    depth-preferred: a result does not replace one of the current search that was searched deeper, since that one saves
+    more work when found again. Results of earlier searches, from before the last `new_search`, are always replaced.
+    """
+
+    _slots: list[Optional[TableEntry]]
+    _generation: int
+
+    def __init__(self, capacity: int = 1 << 16) -> None:
+        """
+        Args:
+            capacity: The number of slots, a power of two.
+        """
+        assert capacity > 0 and capacity & (capacity - 1) == 0, "the capacity must be a power of two"
+        self._slots = [None] * capacity
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: int) -> Optional[TableEntry]:
+        """The result stored for `key`, if any."""
+        entry = self._slots[key & (len(self._slots) - 1)]
+        if entry is None or entry.key != key:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def put(self, key: int, depth: int, value: float, moves: tuple[tuple[WoodokuShape, int, int], ...]) -> None:
+        """Store a result, unless its slot holds a result of the current search that was searched deeper."""
+        slot = key & (len(self._slots) - 1)
+        entry = self._slots[slot]
+        if entry is None or entry.generation != self._generation or entry.depth <= depth:
+            self._slots[slot] = TableEntry(key, depth, value, moves, self._generation)
+
+    def new_search(self) -> None:
+        """Start a new search, after which the results stored so far make way for any new result."""
+        self._generation += 1
+
+    def clear(self) -> None:
+        self._slots = [None] * len(self._slots)
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        """The number of results stored."""
+        return sum(entry is not None for entry in self._slots)
@@ -1,4 +1,5 @@
 import random
+from typing import Optional
 import yaml
 from config import NUM_SHAPES
 
@@ -30,39 +31,59 @@ def _rotate_all_shapes(raw_shapes: list[WoodokuShape]) -> list[WoodokuShape]:
     Returns:
         The original shapes and all the rotated shapes (non-repeated).
     """
-    shapes = set()
+    # A dict rather than a set, so that the order of the shapes does not depend on the hash seed of the process.
+    shapes: dict[WoodokuShape, None] = {}
 
-    # All the raw shape itself was added first, then rotates three times and add to set after each rotate.
-    # Duplicates are eliminated by set operation.
+    # All the raw shape itself was added first, then rotates three times and add to dict after each rotate.
+    # Duplicates are eliminated by the dict keys.
     for shape in raw_shapes:
-        shapes.add(shape)
+        shapes[shape] = None
         new_shape = shape
         for _ in range(NUM_SHAPES):
             new_shape = new_shape.rotate()
-            shapes.add(new_shape)
+            shapes[new_shape] = None
 
     return list(shapes)
 
 
+def _build_placement_index(shapes: list[WoodokuShape]) -> list[WoodokuShape]:
+    """
+    Precompute the placement mask of every shape at every anchor, so that fit checks during the game need neither
+    allocation nor out-of-board exception handling.
+
+    Args:
+        shapes: The shapes to index.
+
+    Returns:
+        The same shapes, with their placement masks built.
+    """
+    for shape in shapes:
+        shape.get_placement_masks()
+    return shapes
+
+
 def get_all_shapes_from_file(config_path: str) -> list[WoodokuShape]:
     """
     gather all possible shape from shape config file
     """
 
-    return _rotate_all_shapes(_read_shapes_from_file(config_path))
+    return _build_placement_index(_rotate_all_shapes(_read_shapes_from_file(config_path)))
 
 
-def random_shapes(shapes: list[WoodokuShape], num: int) -> list[WoodokuShape]:
+def random_shapes(shapes: list[WoodokuShape], num: int, rng: Optional[random.Random] = None) -> list[WoodokuShape]:
     """Choose `num` random shapes from `shapes` the shapes can be the same (with replacements).
 
     Args:
         shapes (list[WoodokuShape]): All shapes available to choose in the game
         num (int): Number of shapes to choose for this round
+        rng (Optional[random.Random]): The generator to draw with, the global one of `random` if None
 
     Returns:
         list[WoodokuShape]: The shapes for this round.
     """
-    return list(random.choices(shapes, k=num))
+    if rng is None:
+        return list(random.choices(shapes, k=num))
+    return rng.choices(shapes, k=num)
 
 
 def is_out_of_space(board: WoodokuBoard, shapes: list[WoodokuShape], shape_availability: list[bool]) -> bool:
@@ -0,0 +1,191 @@
+from __future__ import annotations
+from typing import Optional
+from jaxtyping import Bool, Int, Float, UInt64
+
+import numpy as np
+from numpy.typing import DTypeLike
+
+from config import BOARD_SIZE, CONFIG_FILE, NUM_SHAPES, REWARD_INVALID_LOCATION, REWARD_INVALID_SHAPE
+from woodoku.entity.bitboard import CELL_COUNT, WORDS, clear_complete_groups, masks_to_words, words_to_array
+from woodoku.entity.score_agent import batch_calculate_winning
+from woodoku.entity.woodoku_shape import WoodokuShape
+from woodoku.env import Observation
+from woodoku.shape_catalog import load_shape_catalog
+
+
+class VecWoodokuGameEnv:  # pylint: disable=too-many-instance-attributes
+    """
+    N woodoku game environments stepped together.
+
+    Every game is a bitboard split into uint64 words (see `masks_to_words`), so placing shapes, detecting complete groups
+    and scoring is done with numpy operations over all games at once instead of one python call per game. The rewards
+    are the same as `WoodokuGameEnv.step` gives for the same board, shapes and action.
+
+    A game that has no legal action left at the start of a step ends with reward 0 and done True, as in
+    `WoodokuGameEnv`, and is immediately reset: the observation returned for it is the first one of its new game.
+    """
+
+    _n: int
+    _observation_dtype: DTypeLike
+    _rng: np.random.Generator
+    _all_shapes: list[WoodokuShape]
+    _placements: UInt64[np.ndarray, "WORDS S CELL_COUNT"]
+    _anchor_valid: Bool[np.ndarray, "S CELL_COUNT"]
+    _shape_data: Float[np.ndarray, "S MAX_SHAPE_SIZE*MAX_SHAPE_SIZE"]
+    _shape_sizes: Int[np.ndarray, "S"]
+    _boards: UInt64[np.ndarray, "N WORDS"]
+    _shapes: Int[np.ndarray, "N NUM_SHAPES"]
+    _availability: Bool[np.ndarray, "N NUM_SHAPES"]
+    _scores: Int[np.ndarray, "N"]
+    _streaks: Int[np.ndarray, "N"]
+
+    def __init__(self, n: int, seed: Optional[int] = None, observation_dtype: DTypeLike = np.float64) -> None:
+        """
+        Args:
+            n: The number of games.
+            seed: The seed of the shapes drawn for all games.
+            observation_dtype: The dtype of the observations, uint8 and float32 are enough to hold them.
+        """
+        self._n = n
+        self._observation_dtype = observation_dtype
+        self._rng = np.random.default_rng(seed)
+        self._all_shapes = load_shape_catalog(CONFIG_FILE)
+        # word w of the placement of shape s with its top left corner at (x, y) is _placements[w, s, x * BOARD_SIZE + y],
+        # all zero if any block of the shape would be out of the board. Words come first so that each is contiguous.
+        placements = np.stack([masks_to_words(shape.get_placement_masks()) for shape in self._all_shapes])
+        self._placements = np.ascontiguousarray(placements.transpose(2, 0, 1))
+        self._anchor_valid = placements.any(axis=-1)
+        self._shape_data = np.stack([shape.get_shape_data().ravel() for shape in self._all_shapes]).astype(
+            observation_dtype
+        )
+        self._shape_sizes = np.array([len(shape.get_coords()) for shape in self._all_shapes])
+        self.reset()
+
+    @property
+    def num_envs(self) -> int:
+        return self._n
+
+    def get_all_shapes(self) -> list[WoodokuShape]:
+        """The shapes the games draw from. `get_shapes` returns indices into this list."""
+        return self._all_shapes
+
+    def get_shapes(self) -> Int[np.ndarray, "N NUM_SHAPES"]:
+        return self._shapes.copy()
+
+    def get_availability(self) -> Bool[np.ndarray, "N NUM_SHAPES"]:
+        return self._availability.copy()
+
+    def get_scores(self) -> Int[np.ndarray, "N"]:
+        return self._scores.copy()
+
+    def get_board_data(self) -> Bool[np.ndarray, "N BOARD_SIZE BOARD_SIZE"]:
+        return words_to_array(self._boards)
+
+    def reset(self, out: Optional[np.ndarray] = None) -> Float[np.ndarray, "N OBSERVATION_N"]:
+        """
+        Reset every game and return the initial observations, written into `out` if given.
+        """
+        self._boards = np.zeros((self._n, WORDS), dtype=np.uint64)
+        self._shapes = np.zeros((self._n, NUM_SHAPES), dtype=np.int_)
+        self._availability = np.zeros((self._n, NUM_SHAPES), dtype=bool)
+        self._scores = np.zeros(self._n, dtype=np.int_)
+        self._streaks = np.zeros(self._n, dtype=np.int_)
+        self._reset_games(np.ones(self._n, dtype=bool))
+        return self.observe(out)
+
+    def step(
+        self, actions: Int[np.ndarray, "N 3"], out: Optional[np.ndarray] = None
+    ) -> tuple[Float[np.ndarray, "N OBSERVATION_N"], Int[np.ndarray, "N"], Bool[np.ndarray, "N"]]:
+        """
+        Take a step on every game, each with its own action.
+        Args:
+            actions: One action per game, laid out as `Action.data`: shape choice, x and y.
+            out: A reusable (N, OBSERVATION_N) array to write the observations into.
+
+        Returns:
+            A tuple of the observations, rewards (points earned) and whether each game has ended. Ended games are reset.
+        """
+        rows = np.arange(self._n)
+        shape_choice, x, y = np.asarray(actions, dtype=np.int_).T
+        dones = ~self.action_mask().reshape(self._n, -1).any(axis=1)
+
+        # an anchor out of the board selects no placement, which is never legal
+        in_board = (x >= 0) & (x < BOARD_SIZE) & (y >= 0) & (y < BOARD_SIZE)
+        anchors = np.where(in_board, x * BOARD_SIZE + y, 0)
+        placements = self._placements[:, self._shapes[rows, shape_choice], anchors].T * in_board[:, None]
+        fits = placements.any(axis=1) & ~(self._boards & placements).any(axis=1)
+        available = self._availability[rows, shape_choice]
+
+        # penalize choosing an unavailable shape, then choosing an occupied location
+        rewards = np.where(available, REWARD_INVALID_LOCATION, REWARD_INVALID_SHAPE)
+        rewards[dones] = 0
+        placed = np.flatnonzero(~dones & available & fits)
+        rewards[placed] = self._place(placed, shape_choice[placed], placements[placed])
+
+        self._reset_games(dones)
+        return self.observe(out), rewards, dones
+
+    def action_mask(self) -> Bool[np.ndarray, "N NUM_SHAPES BOARD_SIZE BOARD_SIZE"]:
+        """
+        Get the mask of legal actions of every game, as `WoodokuGameEnv.action_mask` does for one.
+
+        Returns:
+            A boolean array where entry [i, shape_choice, x, y] is True if the action places an available shape of game
+            i at a location it fits.
+        """
+        conflicts = np.zeros((self._n, NUM_SHAPES, CELL_COUNT), dtype=np.uint64)
+        for word in range(WORDS):
+            conflicts |= self._placements[word][self._shapes] & self._boards[:, word, None, None]
+        legal = self._anchor_valid[self._shapes] & (conflicts == 0) & self._availability[:, :, None]
+        mask: Bool[np.ndarray, "N NUM_SHAPES BOARD_SIZE BOARD_SIZE"] = legal.reshape(
+            self._n, NUM_SHAPES, BOARD_SIZE, BOARD_SIZE
+        )
+        return mask
+
+    def _place(
+        self,
+        games: Int[np.ndarray, "P"],
+        shape_choice: Int[np.ndarray, "P"],
+        placements: UInt64[np.ndarray, "P WORDS"],
+    ) -> Int[np.ndarray, "P"]:
+        """
+        Place the chosen shapes, which must fit, clear the groups they complete and score the games.
+
+        Returns:
+            The points each game gained.
+        """
+        self._boards[games], complete = clear_complete_groups(self._boards[games] | placements)
+
+        blocks = self._shape_sizes[self._shapes[games, shape_choice]]
+        gains, streaks = batch_calculate_winning(blocks, complete.sum(axis=1), self._streaks[games])
+        self._streaks[games] = streaks
+        self._scores[games] += gains
+
+        # if all shapes are used up, reset the shapes for the next round
+        self._availability[games, shape_choice] = False
+        self._draw_shapes(~self._availability.any(axis=1))
+        return gains
+
+    def _reset_games(self, games: Bool[np.ndarray, "N"]) -> None:
+        self._boards[games] = 0
+        self._scores[games] = 0
+        self._streaks[games] = 0
+        self._draw_shapes(games)
+
+    def _draw_shapes(self, games: Bool[np.ndarray, "N"]) -> None:
+        count = int(games.sum())
+        self._shapes[games] = self._rng.integers(len(self._all_shapes), size=(count, NUM_SHAPES))
+        self._availability[games] = True
+
+    def observe(self, out: Optional[np.ndarray] = None) -> Float[np.ndarray, "N OBSERVATION_N"]:
+        """
+        Convert every game to an observation laid out as `Observation.from_game`, written into `out` if given.
+        Args:
+            out: A reusable (N, OBSERVATION_N) array to write the observations into.
+
+        Returns:
+            The observations.
+        """
+        return Observation.encode_batch(
+            words_to_array(self._boards), self._shape_data[self._shapes], self._streaks, out, self._observation_dtype
+        )
@@ -0,0 +1,278 @@
+from __future__ import annotations
+import random
+from dataclasses import dataclass, fields
+from multiprocessing import get_context
+from multiprocessing.connection import Connection
+from multiprocessing.process import BaseProcess
+from multiprocessing.shared_memory import SharedMemory
+from types import TracebackType
+from typing import TYPE_CHECKING, Literal, Optional, cast
+from jaxtyping import Bool, Int, Float
+
+import numpy as np
+
+from config import BOARD_SIZE, NUM_SHAPES
+from woodoku.env import Action, Observation, WoodokuGameEnv
+from woodoku.shared_memory import SharedArray
+
+if TYPE_CHECKING:
+    # the fork contexts do not exist on windows
+    from multiprocessing.context import ForkContext, ForkServerContext, SpawnContext
+
+# The commands sent to a worker. They are single bytes so that a step pickles nothing: the actions and the results
+# travel through shared memory.
+_RESET = b"r"
+_STEP = b"s"
+_CLOSE = b"c"
+_DONE = b"d"
+
+StartMethod = Literal["fork", "spawn", "forkserver"]
+
+# How many times in a row a crashed worker is restarted before the pool gives up on it.
+_MAX_RESTARTS = 3
+
+
+@dataclass(frozen=True)
+class _SharedBuffers:
+    actions: SharedArray
+    observations: SharedArray
+    rewards: SharedArray
+    dones: SharedArray
+    action_masks: SharedArray
+
+
+def _worker(conn: Connection, buffers: _SharedBuffers, games: range, seed: Optional[int]) -> None:
+    """
+    Run the games of `games` in this process, answering the commands of the pool until it is told to close.
+
+    Each command reads the actions of its games from shared memory and writes back their observations, rewards, done
+    flags and action masks.
+    """
+    # forked workers inherit the random state of the pool, which would make them all draw the same shapes
+    random.seed(seed)
+    attached = {field.name: getattr(buffers, field.name).attach() for field in fields(buffers)}
+    arrays = {name: array for name, (array, _) in attached.items()}
+    envs = [WoodokuGameEnv() for _ in games]
+
+    def write(i: int, env: WoodokuGameEnv, obs: Observation, reward: int, done: bool) -> None:
+        arrays["observations"][i] = obs.data
+        arrays["rewards"][i] = reward
+        arrays["dones"][i] = done
+        arrays["action_masks"][i] = env.action_mask()
+
+    try:
+        while True:
+            command = conn.recv_bytes()
+            if command == _CLOSE:
+                break
+            for i, env in zip(games, envs):
+                if command == _RESET:
+                    write(i, env, env.reset(), 0, False)
+                    continue
+                obs, reward, done = env.step(Action(arrays["actions"][i].copy()))
+                write(i, env, env.reset() if done else obs, reward, done)
+            conn.send_bytes(_DONE)
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        arrays.clear()
+        for _, memory in attached.values():
+            memory.close()
+        conn.close()
+
+
+class WoodokuWorkerPool:  # pylint: disable=too-many-instance-attributes
+    """
+    N woodoku game environments run by a pool of subprocesses, stepped together.
+
+    The games are split evenly among the workers, each of which runs a `WoodokuGameEnv` per game. Actions, observations,
+    rewards, done flags and action masks live in shared memory, so a step only sends each worker one byte and pickles
+    nothing. The interface is that of `VecWoodokuGameEnv`: a game that ends is immediately reset and the observation
+    returned for it is the first one of its new game.
+
+    A worker that crashes is restarted. Its games are lost, so they are reported as done with reward 0 and start over.
+    A worker whose replacements keep crashing before they reset their games is given up on with a `RuntimeError`.
+    """
+
+    _num_envs: int
+    _seed: Optional[int]
+    _context: ForkContext | SpawnContext | ForkServerContext
+    _buffers: _SharedBuffers
+    _memories: list[SharedMemory]
+    _arrays: dict[str, np.ndarray]
+    _games: list[range]
+    _processes: list[BaseProcess]
+    _conns: list[Connection]
+    _restarts: int
+
+    def __init__(
+        self,
+        num_envs: int,
+        num_workers: Optional[int] = None,
+        seed: Optional[int] = None,
+        start_method: StartMethod = "fork",
+    ) -> None:
+        """
+        Args:
+            num_envs: The number of games.
+            num_workers: The number of subprocesses, one per cpu if None. Never more than the number of games.
+            seed: The seed of the shapes drawn, each worker offsets it by its index. Random if None.
+            start_method: The multiprocessing start method of the workers.
+        """
+        self._num_envs = num_envs
+        self._seed = seed
+        # typeshed only narrows get_context to the concrete context for a single literal
+        self._context = cast("ForkContext | SpawnContext | ForkServerContext", get_context(start_method))
+        num_workers = min(num_workers or self._context.cpu_count(), num_envs)
+
+        shapes = {
+            "actions": ((num_envs,) + Action.shape, np.int_),
+            "observations": ((num_envs,) + Observation.shape, np.float64),
+            "rewards": ((num_envs,), np.int_),
+            "dones": ((num_envs,), bool),
+            "action_masks": ((num_envs, NUM_SHAPES, BOARD_SIZE, BOARD_SIZE), bool),
+        }
+        created = {name: SharedArray.create(shape, dtype) for name, (shape, dtype) in shapes.items()}
+        self._buffers = _SharedBuffers(**{name: shared for name, (shared, _) in created.items()})
+        self._memories = [memory for _, memory in created.values()]
+        self._arrays = {name: shared.view(memory) for name, (shared, memory) in created.items()}
+
+        bounds = np.linspace(0, num_envs, num_workers + 1).astype(int)
+        self._games = [range(start, stop) for start, stop in zip(bounds[:-1], bounds[1:])]
+        self._processes = []
+        self._conns = []
+        self._restarts = 0
+        for worker in range(num_workers):
+            process, conn = self._start_worker(worker)
+            self._processes.append(process)
+            self._conns.append(conn)
+
+    @property
+    def num_envs(self) -> int:
+        return self._num_envs
+
+    @property
+    def num_workers(self) -> int:
+        return len(self._processes)
+
+    @property
+    def restarts(self) -> int:
+        """The number of workers restarted after a crash so far."""
+        return self._restarts
+
+    def reset(self) -> Float[np.ndarray, "N OBSERVATION_N"]:
+        """
+        Reset every game and return the initial observations.
+        """
+        self._run(_RESET)
+        return self._arrays["observations"].copy()
+
+    def step(
+        self, actions: Int[np.ndarray, "N 3"]
+    ) -> tuple[Float[np.ndarray, "N OBSERVATION_N"], Int[np.ndarray, "N"], Bool[np.ndarray, "N"]]:
+        """
+        Take a step on every game, each with its own action.
+        Args:
+            actions: One action per game, laid out as `Action.data`: shape choice, x and y.
+
+        Returns:
+            A tuple of the observations, rewards (points earned) and whether each game has ended. Ended games are reset.
+        """
+        self._arrays["actions"][:] = actions
+        self._run(_STEP)
+        return self._arrays["observations"].copy(), self._arrays["rewards"].copy(), self._arrays["dones"].copy()
+
+    def action_mask(self) -> Bool[np.ndarray, "N NUM_SHAPES BOARD_SIZE BOARD_SIZE"]:
+        """
+        Get the mask of legal actions of every game, as `WoodokuGameEnv.action_mask` does for one.
+        """
+        return self._arrays["action_masks"].copy()
+
+    def close(self) -> None:
+        """
+        Stop the workers and free the shared memory. The pool cannot be used afterwards.
+        """
+        for process, conn in zip(self._processes, self._conns):
+            try:
+                conn.send_bytes(_CLOSE)
+            except (BrokenPipeError, OSError):
+                pass
+            process.join(timeout=1)
+            if process.is_alive():
+                process.kill()
+                process.join()
+            conn.close()
+        self._processes, self._conns = [], []
+        self._arrays.clear()
+        for memory in self._memories:
+            memory.close()
+            memory.unlink()
+        self._memories = []
+
+    def __enter__(self) -> WoodokuWorkerPool:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def _run(self, command: bytes) -> None:
+        """
+        Send `command` to every worker and wait for all of them, restarting the ones that crash on the way.
+        """
+        crashed = []
+        for worker, conn in enumerate(self._conns):
+            try:
+                conn.send_bytes(command)
+            except (BrokenPipeError, OSError):
+                crashed.append(worker)
+        for worker, conn in enumerate(self._conns):
+            if worker in crashed:
+                continue
+            try:
+                conn.recv_bytes()
+            except (EOFError, OSError):
+                crashed.append(worker)
+        for worker in crashed:
+            self._restart_worker(worker)
+
+    def _restart_worker(self, worker: int) -> None:
+        """
+        Replace a crashed worker by a new one and report its games as done, with the first observation of new games.
+
+        Raises:
+            RuntimeError: If `_MAX_RESTARTS` new workers in a row crash before resetting their games.
+        """
+        for _ in range(_MAX_RESTARTS):
+            self._processes[worker].join(timeout=1)
+            self._conns[worker].close()
+            self._restarts += 1
+            self._processes[worker], self._conns[worker] = self._start_worker(worker)
+            try:
+                self._conns[worker].send_bytes(_RESET)
+                self._conns[worker].recv_bytes()
+            except (EOFError, OSError):
+                continue
+            games = slice(self._games[worker].start, self._games[worker].stop)
+            self._arrays["rewards"][games] = 0
+            self._arrays["dones"][games] = True
+            return
+        process = self._processes[worker]
+        process.join(timeout=1)
+        raise RuntimeError(
+            f"worker {worker} crashed again after {_MAX_RESTARTS} restarts, last with exit code {process.exitcode}"
+        )
+
+    def _start_worker(self, worker: int) -> tuple[BaseProcess, Connection]:
+        conn, worker_conn = self._context.Pipe()
+        seed = None if self._seed is None else self._seed + worker + self._restarts * len(self._games)
+        process = self._context.Process(
+            target=_worker, args=(worker_conn, self._buffers, self._games[worker], seed), daemon=True
+        )
+        process.start()
+        worker_conn.close()
+        return process, conn